@@ -0,0 +1,74 @@
+"""
+Benchmark `chunk_repository` throughput (files/sec) against worker count.
+
+Usage:
+    poetry run python -m benchmarks.chunking_benchmark --repo path/to/repo
+    poetry run python -m benchmarks.chunking_benchmark --repo . \
+        --workers 1 2 4 8 --executors thread process
+"""
+
+import argparse
+import logging
+import time
+from pathlib import Path
+
+from ingestion.chunk_code import (
+    DEFAULT_EXTENSIONS,
+    DEFAULT_IGNORED_DIRS,
+    EXECUTOR_PROCESS,
+    EXECUTOR_THREAD,
+    _is_candidate_file,
+    chunk_repository,
+)
+
+
+def _count_files(repo: Path) -> int:
+    return sum(
+        1
+        for p in repo.rglob("*")
+        if p.is_file()
+        and _is_candidate_file(
+            p.relative_to(repo), DEFAULT_EXTENSIONS, DEFAULT_IGNORED_DIRS
+        )
+    )
+
+
+def run(repo: Path, executors, workers, repeats: int) -> None:
+    n_files = _count_files(repo)
+    print(f"{n_files} files in {repo}")
+    print(f"{'executor':<10}{'workers':>8}{'best s':>10}{'files/s':>12}")
+    for executor in executors:
+        for n_workers in workers:
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                chunk_repository(
+                    str(repo), executor=executor, max_workers=n_workers
+                )
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            print(
+                f"{executor:<10}{n_workers:>8}{best:>10.3f}"
+                f"{n_files / best:>12.1f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repo", required=True, help="Repo to chunk")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument(
+        "--executors",
+        nargs="+",
+        choices=[EXECUTOR_THREAD, EXECUTOR_PROCESS],
+        default=[EXECUTOR_THREAD, EXECUTOR_PROCESS],
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    run(Path(args.repo), args.executors, args.workers, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Measure `embed_documents` throughput against embedding concurrency, using
+stub embeddings with simulated latency and rate limiting (no network).
+
+Usage:
+    poetry run python -m benchmarks.embedding_benchmark
+    poetry run python -m benchmarks.embedding_benchmark --chunks 5000 \
+        --latency 0.3 --concurrency 1 4 8 16 --max-server-concurrency 6
+"""
+
+import argparse
+import logging
+import tempfile
+import time
+
+from benchmarks.fakes import FakeEmbeddings
+from ingestion.embed_chunks_into_vectorstore import embed_documents
+from utils.constants import (
+    KEY_BASE_DIRECTORY,
+    KEY_COLLECTION,
+    KEY_CONTENT,
+    KEY_EMBEDDING_CACHE,
+    KEY_EMBEDDING_CONCURRENCY,
+    KEY_ENABLED,
+    KEY_INGESTION,
+    KEY_META,
+    KEY_PROJECT_NAME,
+    KEY_RELATIVE_PATH,
+    KEY_REPO,
+    KEY_SUBPATH,
+    KEY_VECTORSTORE,
+)
+
+
+def _docs(n_chunks: int):
+    for i in range(n_chunks):
+        yield {
+            KEY_CONTENT: f"def func_{i}(x):\n    return x * {i}\n",
+            KEY_META: {KEY_RELATIVE_PATH: f"pkg/mod_{i // 20}.py"},
+        }
+
+
+def _config(base_dir: str, concurrency: int) -> dict:
+    return {
+        KEY_REPO: {KEY_PROJECT_NAME: f"bench_c{concurrency}"},
+        KEY_VECTORSTORE: {
+            KEY_BASE_DIRECTORY: base_dir,
+            KEY_COLLECTION: "bench",
+            KEY_SUBPATH: "chroma",
+        },
+        KEY_INGESTION: {KEY_EMBEDDING_CONCURRENCY: concurrency},
+        KEY_EMBEDDING_CACHE: {KEY_ENABLED: False},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=2048)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--rate-limit-prob", type=float, default=0.0)
+    parser.add_argument(
+        "--max-server-concurrency",
+        type=int,
+        default=0,
+        help="Stub returns 429 above this many in-flight requests",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 2, 4, 8]
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    print(f"{'concurrency':>12}{'seconds':>10}{'chunks/s':>12}{'requests':>10}")
+    with tempfile.TemporaryDirectory() as base_dir:
+        for concurrency in args.concurrency:
+            embeddings = FakeEmbeddings(
+                latency=args.latency,
+                rate_limit_prob=args.rate_limit_prob,
+                max_concurrent=args.max_server_concurrency,
+            )
+            start = time.perf_counter()
+            embed_documents(
+                _docs(args.chunks),
+                _config(base_dir, concurrency),
+                batch_size=args.batch_size,
+                embeddings=embeddings,
+            )
+            elapsed = time.perf_counter() - start
+            print(
+                f"{concurrency:>12}{elapsed:>10.2f}"
+                f"{args.chunks / elapsed:>12.1f}{embeddings.requests:>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
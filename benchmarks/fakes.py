@@ -0,0 +1,180 @@
+"""Offline stand-ins for the OpenAI models, for benchmarks and local runs."""
+
+import asyncio
+import hashlib
+import math
+import random
+import re
+import time
+from threading import Lock
+from typing import Callable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import (
+    ChatGeneration,
+    ChatGenerationChunk,
+    ChatResult,
+)
+
+from utils.constants import VALUES_UTF_8
+
+
+class FakeRateLimitError(Exception):
+    """Mimics an HTTP 429 from the embeddings API."""
+
+    status_code = 429
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic embeddings derived from the SHA-256 of the text.
+
+    Args:
+        dim:             Vector dimension.
+        latency:         Simulated seconds per request.
+        rate_limit_prob: Probability that a request fails with a 429.
+        max_concurrent:  Requests above this many in flight always get a
+                         429, emulating a server-side concurrency limit.
+    """
+
+    def __init__(
+        self,
+        dim: int = 64,
+        latency: float = 0.0,
+        rate_limit_prob: float = 0.0,
+        max_concurrent: int = 0,
+    ):
+        self._dim = dim
+        self._latency = latency
+        self._rate_limit_prob = rate_limit_prob
+        self._max_concurrent = max_concurrent
+        self._lock = Lock()
+        self._in_flight = 0
+        self.requests = 0
+
+    def _vector(self, text: str) -> List[float]:
+        seed = hashlib.sha256(text.encode(VALUES_UTF_8)).digest()
+        rng = random.Random(seed)
+        return [rng.uniform(-1.0, 1.0) for _ in range(self._dim)]
+
+    def _request(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self._in_flight += 1
+            over_limit = 0 < self._max_concurrent < self._in_flight
+        try:
+            if over_limit or random.random() < self._rate_limit_prob:
+                raise FakeRateLimitError("429 Too Many Requests")
+            if self._latency:
+                time.sleep(self._latency)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._request()
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._request()
+        return self._vector(text)
+
+
+_TOKEN_RE = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+
+
+class HashingEmbeddings(FakeEmbeddings):
+    """
+    Bag-of-words embeddings by feature hashing: each word (identifiers
+    split on `_` and camelCase, lowercased) adds +-1 to one of `dim`
+    buckets, and the vector is scaled to unit length. Texts sharing words
+    get similar vectors, so rankings and near-duplicate detection behave
+    plausibly without a real model.
+    """
+
+    def __init__(self, dim: int = 256, **kwargs):
+        super().__init__(dim=dim, **kwargs)
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self._dim
+        for token in _TOKEN_RE.findall(text):
+            digest = hashlib.blake2b(
+                token.lower().encode(VALUES_UTF_8), digest_size=8
+            ).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self._dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        # Unit length, like OpenAI embeddings, so L2 ranks as cosine does
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+
+_WORD_RE = re.compile(r"\S+\s*")
+DEFAULT_FAKE_ANSWER = (
+    "This function reads the configuration, opens the index and returns "
+    "the matching chunks ordered by score. " * 4
+).strip()
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model stub that answers `reply(prompt)` (or `answer`) and, when
+    streamed, emits it word by word: the first word after
+    `first_token_latency` seconds, the rest `token_latency` apart.
+    """
+
+    answer: str = DEFAULT_FAKE_ANSWER
+    reply: Optional[Callable[[str], str]] = None
+    first_token_latency: float = 0.0
+    token_latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _words(self, messages) -> List[str]:
+        prompt = "\n".join(str(message.content) for message in messages)
+        return _WORD_RE.findall(
+            self.reply(prompt) if self.reply else self.answer
+        )
+
+    def _latency(self, n_words: int) -> float:
+        return self.first_token_latency + self.token_latency * max(
+            n_words - 1, 0
+        )
+
+    @staticmethod
+    def _result(words: List[str]) -> ChatResult:
+        message = AIMessage(content="".join(words))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        words = self._words(messages)
+        time.sleep(self._latency(len(words)))
+        return self._result(words)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        words = self._words(messages)
+        await asyncio.sleep(self._latency(len(words)))
+        return self._result(words)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_latency)
+        for i, word in enumerate(self._words(messages)):
+            if i:
+                time.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word))
+            if run_manager:
+                run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token_latency)
+        for i, word in enumerate(self._words(messages)):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word))
+            if run_manager:
+                await run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
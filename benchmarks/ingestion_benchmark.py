@@ -0,0 +1,296 @@
+"""
+Benchmark the ingestion pipeline stage by stage on a synthetic (or given)
+repository, and save the results as JSON so runs can be compared:
+
+    discover         find candidate files (`_discover_files`)
+    chunk_file       `_chunk_file` on every file, one thread
+    hash_ids         SHA-256 chunk IDs
+    dedup            drop repeated chunk IDs
+    iter_chunks      `iter_repository_chunks` end to end (worker pool)
+    embed            `embed_documents` into an empty store
+    embed_noop       `embed_documents` again with nothing changed
+
+Embeddings come from the deterministic `FakeEmbeddings`, so it runs
+offline (once tiktoken has cached its `cl100k_base` file). Each stage
+reports its best of `--repeats` runs. With `--compare`, throughput is
+checked against an earlier results file and the exit status is 1 if any
+stage got slower by more than `--tolerance`.
+
+Usage:
+    poetry run python -m benchmarks.ingestion_benchmark --output base.json
+    poetry run python -m benchmarks.ingestion_benchmark --files 5000 \
+        --mix py=6 ts=2 md=1 --compare base.json --output new.json
+    poetry run python -m benchmarks.ingestion_benchmark --repo path/to/repo
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from git import InvalidGitRepositoryError, Repo
+
+from benchmarks.fakes import FakeEmbeddings
+from benchmarks.synthetic_repo import DEFAULT_MIX, generate_repo, parse_mix
+from ingestion.chunk_code import (
+    DEFAULT_CHUNK_OVERLAP,
+    DEFAULT_CHUNK_TOKENS,
+    DEFAULT_ENCODING,
+    DEFAULT_EXTENSIONS,
+    DEFAULT_IGNORED_DIRS,
+    EXECUTOR_PROCESS,
+    EXECUTOR_THREAD,
+    _chunk_file,
+    _discover_files,
+    iter_repository_chunks,
+)
+from ingestion.embed_chunks_into_vectorstore import embed_documents
+from ingestion.syntax_chunker import SyntaxChunker
+from utils.constants import (
+    KEY_BASE_DIRECTORY,
+    KEY_COLLECTION,
+    KEY_CONTENT,
+    KEY_EMBEDDING_CACHE,
+    KEY_ENABLED,
+    KEY_ID,
+    KEY_PROJECT_NAME,
+    KEY_REPO,
+    KEY_SUBPATH,
+    KEY_TYPE,
+    KEY_VECTORSTORE,
+    VALUES_UTF_8,
+)
+
+UNIT_FILES = "files"
+UNIT_CHUNKS = "chunks"
+
+
+def _best_of(repeats: int, fn: Callable) -> Tuple[float, object]:
+    """Fastest wall time of `repeats` calls, with the last call's result."""
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _store_config(base_dir: str, vectorstore: str) -> Dict:
+    return {
+        KEY_REPO: {KEY_PROJECT_NAME: "bench"},
+        KEY_VECTORSTORE: {
+            KEY_BASE_DIRECTORY: base_dir,
+            KEY_COLLECTION: "bench",
+            KEY_SUBPATH: "store",
+            KEY_TYPE: vectorstore,
+        },
+        # Measure embedding and store writes, not the embedding cache
+        KEY_EMBEDDING_CACHE: {KEY_ENABLED: False},
+    }
+
+
+def _chunk_files(files: List[Path], root: Path) -> List[Dict]:
+    chunker = SyntaxChunker(
+        DEFAULT_CHUNK_TOKENS, DEFAULT_CHUNK_OVERLAP, DEFAULT_ENCODING
+    )
+    docs = []
+    for path in files:
+        file_docs, _ = _chunk_file(path, root, chunker, None, None)
+        docs.extend(file_docs)
+    return docs
+
+
+def _dedup(docs: List[Dict]) -> List[Dict]:
+    seen = set()
+    unique = []
+    for doc in docs:
+        if doc[KEY_ID] not in seen:
+            seen.add(doc[KEY_ID])
+            unique.append(doc)
+    return unique
+
+
+def run(root: Path, args) -> Dict:
+    """Time every stage on the repo at `root`; returns the results dict."""
+    stages: Dict[str, Dict] = {}
+
+    def record(name: str, seconds: float, items: int, unit: str) -> None:
+        stages[name] = {
+            "seconds": round(seconds, 6),
+            "items": items,
+            "unit": unit,
+            "per_second": round(items / seconds, 2) if seconds else None,
+        }
+        print(
+            f"{name:<14}{seconds:>10.3f}{items:>10}"
+            f"{items / seconds if seconds else 0:>14.1f} {unit}/s"
+        )
+
+    print(f"{'stage':<14}{'best s':>10}{'items':>10}{'throughput':>14}")
+    seconds, files = _best_of(
+        args.repeats,
+        lambda: _discover_files(root, DEFAULT_EXTENSIONS, DEFAULT_IGNORED_DIRS),
+    )
+    record("discover", seconds, len(files), UNIT_FILES)
+
+    seconds, docs = _best_of(args.repeats, lambda: _chunk_files(files, root))
+    record("chunk_file", seconds, len(files), UNIT_FILES)
+
+    texts = [doc[KEY_CONTENT].encode(VALUES_UTF_8) for doc in docs]
+    seconds, _ = _best_of(
+        args.repeats,
+        lambda: [hashlib.sha256(text).hexdigest() for text in texts],
+    )
+    record("hash_ids", seconds, len(texts), UNIT_CHUNKS)
+
+    seconds, unique = _best_of(args.repeats, lambda: _dedup(docs))
+    record("dedup", seconds, len(docs), UNIT_CHUNKS)
+
+    seconds, _ = _best_of(
+        args.repeats,
+        lambda: sum(
+            1
+            for _ in iter_repository_chunks(
+                str(root), executor=args.executor, max_workers=args.workers
+            )
+        ),
+    )
+    record("iter_chunks", seconds, len(files), UNIT_FILES)
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        cfg = _store_config(base_dir, args.vectorstore)
+        seconds, _ = _best_of(
+            args.repeats,
+            lambda: embed_documents(
+                unique,
+                cfg,
+                reset_index=True,
+                embeddings=FakeEmbeddings(dim=args.dim),
+            ),
+        )
+        record("embed", seconds, len(unique), UNIT_CHUNKS)
+        seconds, _ = _best_of(
+            args.repeats,
+            lambda: embed_documents(
+                unique, cfg, embeddings=FakeEmbeddings(dim=args.dim)
+            ),
+        )
+        record("embed_noop", seconds, len(unique), UNIT_CHUNKS)
+
+    return {
+        "corpus": {
+            "root": str(root),
+            "files": len(files),
+            "bytes": sum(p.stat().st_size for p in files),
+            "chunks": len(docs),
+            "unique_chunks": len(unique),
+        },
+        "stages": stages,
+    }
+
+
+def _code_version() -> Optional[str]:
+    """Commit of the code being benchmarked, if run from a checkout."""
+    try:
+        repo = Repo(Path(__file__).parent, search_parent_directories=True)
+        return repo.head.commit.hexsha
+    except (InvalidGitRepositoryError, ValueError):
+        return None
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float) -> List[str]:
+    """Print throughput changes per stage; return the regressed stages."""
+    regressions = []
+    print(f"\n{'stage':<14}{'before/s':>12}{'after/s':>12}{'change':>9}")
+    for name, stage in current["stages"].items():
+        before = baseline.get("stages", {}).get(name, {}).get("per_second")
+        after = stage["per_second"]
+        if not before or not after:
+            continue
+        change = after / before - 1
+        flag = ""
+        if change < -tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<14}{before:>12.1f}{after:>12.1f}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repo", help="Benchmark this repo instead")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument(
+        "--mix",
+        nargs="+",
+        default=[f"{ext}={weight}" for ext, weight in DEFAULT_MIX.items()],
+        help="ext=weight pairs for the synthetic repo",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--executor",
+        choices=[EXECUTOR_THREAD, EXECUTOR_PROCESS],
+        default=EXECUTOR_THREAD,
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--vectorstore", choices=["chroma", "faiss"], default="chroma"
+    )
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--compare", help="Earlier results JSON")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Allowed throughput drop per stage with --compare",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.repo:
+            root = Path(args.repo)
+        else:
+            root = Path(tmp_dir) / "repo"
+            generate_repo(
+                root, args.files, mix=parse_mix(args.mix), seed=args.seed
+            )
+        results = run(root, args)
+
+    results.update(
+        {
+            "benchmark": "ingestion",
+            "created": datetime.now(timezone.utc).isoformat(),
+            "commit": _code_version(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": vars(args),
+        }
+    )
+    if args.output:
+        Path(args.output).write_text(
+            json.dumps(results, indent=2), encoding=VALUES_UTF_8
+        )
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        baseline = json.loads(
+            Path(args.compare).read_text(encoding=VALUES_UTF_8)
+        )
+        if compare(baseline, results, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
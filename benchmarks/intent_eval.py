@@ -0,0 +1,113 @@
+"""
+Evaluate the local intent classifier against logged LLM labels: how
+many questions it answers without the LLM (coverage), how often it
+agrees with the LLM, and how long it takes.
+
+Uses k-fold cross-validation over the intent log that `IntentClassifier`
+writes with `[intent_classifier] log_questions = true`
+(`<vectorstore base_directory>/intent_log.jsonl` by default), so
+every logged question is scored by a model that never saw it. Keyword
+rules need no training and are scored on every question.
+
+Usage:
+    poetry run python -m benchmarks.intent_eval --log data/intent_log.jsonl
+    poetry run python -m benchmarks.intent_eval --log data/intent_log.jsonl \
+        --folds 10 --min-confidence 0.8 0.9 0.95 0.99
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from langgraph_flow.agents.local_intent_classifier import (
+    SOURCE_MODEL,
+    SOURCE_RULES,
+    LocalIntentClassifier,
+    load_intent_log,
+)
+
+
+def _evaluate(examples, folds: int, min_confidence: float, tmp_dir: str):
+    """Per-source (answered, agreed) counts and latencies in seconds."""
+    answered = Counter()
+    agreed = Counter()
+    latencies = []
+    for fold in range(folds):
+        classifier = LocalIntentClassifier(
+            Path(tmp_dir) / "empty.jsonl", min_confidence
+        )
+        test = examples[fold::folds]
+        for i, (question, label) in enumerate(examples):
+            if i % folds != fold:
+                classifier.model.update(question, label)
+        for question, label in test:
+            start = time.perf_counter()
+            prediction = classifier.classify(question)
+            latencies.append(time.perf_counter() - start)
+            if prediction:
+                intent, source = prediction
+                answered[source] += 1
+                agreed[source] += intent == label
+    return answered, agreed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--log", required=True, help="Intent log (JSONL)")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument(
+        "--min-confidence",
+        type=float,
+        nargs="+",
+        default=[0.8, 0.9, 0.95, 0.99],
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    examples = load_intent_log(Path(args.log))
+    if len(examples) < args.folds:
+        parser.error(f"need at least {args.folds} logged questions")
+    random.Random(args.seed).shuffle(examples)
+    print(
+        f"{len(examples)} questions, labels: "
+        f"{dict(Counter(label for _, label in examples))}"
+    )
+
+    print(
+        f"{'min conf':>9}{'coverage':>10}{'local acc':>11}{'rules':>13}"
+        f"{'model':>13}{'p50 us':>9}{'p95 us':>9}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for min_confidence in args.min_confidence:
+            answered, agreed, latencies = _evaluate(
+                examples, args.folds, min_confidence, tmp_dir
+            )
+            n_answered = sum(answered.values())
+            latencies.sort()
+            p50 = 1e6 * statistics.median(latencies)
+            p95 = 1e6 * latencies[int(0.95 * (len(latencies) - 1))]
+            per_source = [
+                f"{answered[source]:>5}/{agreed[source] / answered[source]:.2f}"
+                if answered[source]
+                else f"{0:>5}/ -  "
+                for source in (SOURCE_RULES, SOURCE_MODEL)
+            ]
+            print(
+                f"{min_confidence:>9.2f}"
+                f"{n_answered / len(examples):>10.1%}"
+                f"{sum(agreed.values()) / max(n_answered, 1):>11.1%}"
+                f"{per_source[0]:>13}{per_source[1]:>13}"
+                f"{p50:>9.1f}{p95:>9.1f}"
+            )
+    print(
+        "coverage: share answered without the LLM; local acc: agreement "
+        "with the LLM label on those; rules/model: answered/accuracy"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""
+Benchmark chat turns end to end: run a fixed question set through
+`build_graph()` and report where the time goes, per graph node and per
+step inside the nodes:
+
+    <node>              each graph node (classify, explain, navigate, ...)
+    <node>.prompt       prompt formatting
+    <node>.llm          the chat model call, and <node>.first_token
+    search              retrieval, either of:
+    hybrid_search       one query: BM25 and similarity_search, the
+                        vector store query including embed_query
+    multi_query_search  the question and the identifiers it names: one
+                        embed_queries request and one
+                        similarity_search_by_vectors store query
+    symbol_context      navigator symbol-index lookups
+    rerank              cutting the over-fetched candidates to top_k
+    pack_context        merging retrieved chunks into the token budget
+
+The repository is synthetic (`benchmarks.synthetic_repo`), and its chunks
+are embedded and indexed as in `ingest`. Models are the offline stubs
+from `benchmarks.fakes` with configurable latency, so runs need no
+network or API key and measure the assistant's own overhead plus the
+simulated model time. Questions name real functions of the corpus and
+cover every intent; one template in seven is left to the (stub) LLM
+intent classifier.
+
+Usage:
+    poetry run python -m benchmarks.query_benchmark
+    poetry run python -m benchmarks.query_benchmark --questions 500 \
+        --concurrency 8 --ttft-ms 0 --token-ms 0 --embed-ms 0
+    poetry run python -m benchmarks.query_benchmark --answer-cache \
+        --output query.json
+    poetry run python -m benchmarks.query_benchmark --no-query-variants
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import re
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, List
+
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+
+import langgraph_flow.agents.navigator_agent
+import utils.agent_utils
+import utils.retrieval
+from benchmarks.fakes import DEFAULT_FAKE_ANSWER, FakeChatModel, FakeEmbeddings
+from benchmarks.ingestion_benchmark import _code_version
+from benchmarks.synthetic_repo import generate_repo
+from ingestion.chunk_code import EXECUTOR_THREAD, iter_repository_chunks
+from ingestion.embed_chunks_into_vectorstore import embed_documents
+from ingestion.ingestion_util import get_symbol_index_path
+from ingestion.load_vectorstore import load_vectorstore
+from ingestion.symbol_index import SymbolIndex
+from langgraph_flow.graph_builder import build_graph
+from langgraph_flow.models.openai_model import OpenAIModel
+from utils.constants import (
+    KEY_ANSWER_CACHE,
+    KEY_BASE_DIRECTORY,
+    KEY_COLLECTION,
+    KEY_CONFIG,
+    KEY_ENABLED,
+    KEY_INTENT,
+    KEY_INTENT_CLASSIFIER,
+    KEY_LOCAL_PATH,
+    KEY_PATH,
+    KEY_PROJECT_NAME,
+    KEY_QUERY_VARIANTS,
+    KEY_QUESTION,
+    KEY_REPO,
+    KEY_RETRIEVAL,
+    KEY_SUBPATH,
+    KEY_TYPE,
+    KEY_VECTORSTORE,
+    VALUES_UTF_8,
+)
+
+STAGE_GRAPH = "graph"
+_PROJECT = "bench"
+# {name} is a function defined in the corpus; the last template matches
+# no local intent rule, so the LLM classifies it
+_QUESTION_TEMPLATES = [
+    "explain what {name} does",
+    "where is {name} used?",
+    "show me the code for {name}",
+    "how does {name} work with {word}s?",
+    "who calls {name}?",
+    "fetch {name}",
+    "{name} and the {word} handling",
+]
+_DEF_RE = re.compile(r"^def (\w+)", re.MULTILINE)
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+class StageTimer(BaseCallbackHandler):
+    """
+    Collects durations (seconds) by stage: graph nodes, prompts and chat
+    model calls from LangChain callbacks, plus any function wrapped with
+    `wrap`. Safe to share between concurrent graph runs.
+    """
+
+    def __init__(self):
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+        self._lock = Lock()
+        # run_id -> (stage, start)
+        self._runs: Dict = {}
+        self._awaiting_first_token: Dict = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.durations[stage].append(seconds)
+
+    def wrap(self, stage: str, fn: Callable) -> Callable:
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+
+        return timed
+
+    def _start(self, run_id, stage: str) -> None:
+        self._runs[run_id] = (stage, time.perf_counter())
+
+    def _end(self, run_id) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            stage, start = run
+            self.record(stage, time.perf_counter() - start)
+
+    def on_chain_start(
+        self, serialized, inputs, *, run_id, metadata=None, **kwargs
+    ):
+        node = (metadata or {}).get("langgraph_node")
+        name = kwargs.get("name")
+        if node is None:
+            return
+        if name == node:
+            self._start(run_id, node)
+        elif name == "PromptTemplate":
+            self._start(run_id, f"{node}.prompt")
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id, metadata=None, **kwargs
+    ):
+        node = (metadata or {}).get("langgraph_node", "llm")
+        self._start(run_id, f"{node}.llm")
+        self._awaiting_first_token[run_id] = node
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        node = self._awaiting_first_token.pop(run_id, None)
+        run = self._runs.get(run_id)
+        if node is not None and run is not None:
+            self.record(f"{node}.first_token", time.perf_counter() - run[1])
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._awaiting_first_token.pop(run_id, None)
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._awaiting_first_token.pop(run_id, None)
+        self._end(run_id)
+
+
+def _config(base_dir: str, args) -> Dict:
+    return {
+        KEY_REPO: {
+            KEY_PROJECT_NAME: _PROJECT,
+            KEY_LOCAL_PATH: f"{base_dir}/clones",
+        },
+        KEY_VECTORSTORE: {
+            KEY_BASE_DIRECTORY: base_dir,
+            KEY_COLLECTION: _PROJECT,
+            KEY_SUBPATH: "store",
+            KEY_TYPE: args.vectorstore,
+        },
+        KEY_ANSWER_CACHE: {KEY_ENABLED: args.answer_cache},
+        KEY_RETRIEVAL: {KEY_QUERY_VARIANTS: args.query_variants},
+        KEY_INTENT_CLASSIFIER: {KEY_PATH: f"{base_dir}/intent_log.jsonl"},
+    }
+
+
+def _fake_reply(prompt: str) -> str:
+    return "explain" if prompt.startswith("Classify") else DEFAULT_FAKE_ANSWER
+
+
+def _build_corpus(cfg: Dict, args) -> List[str]:
+    """Generate and ingest the repo; return its Python function names."""
+    repo_cfg = cfg[KEY_REPO]
+    root = Path(repo_cfg[KEY_LOCAL_PATH]) / repo_cfg[KEY_PROJECT_NAME]
+    paths = generate_repo(root, args.files, seed=args.seed)
+
+    symbol_index_path = get_symbol_index_path(cfg)
+    symbol_index_path.parent.mkdir(parents=True, exist_ok=True)
+    symbol_index = SymbolIndex(symbol_index_path)
+    try:
+        symbol_index.begin_sync()
+        docs = iter_repository_chunks(
+            str(root),
+            executor=EXECUTOR_THREAD,
+            on_symbols=symbol_index.replace_file,
+        )
+        # Same vectors as the query-time stub, without its latency
+        embed_documents(docs, cfg, embeddings=FakeEmbeddings(dim=args.dim))
+        symbol_index.end_sync()
+    finally:
+        symbol_index.close()
+
+    names = set()
+    for path in paths:
+        if path.suffix == ".py":
+            names.update(_DEF_RE.findall(path.read_text(encoding=VALUES_UTF_8)))
+    return sorted(names)
+
+
+def _questions(names: List[str], n: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    questions = []
+    for i in range(n):
+        name = rng.choice(names)
+        template = _QUESTION_TEMPLATES[i % len(_QUESTION_TEMPLATES)]
+        word = rng.choice(_WORD_RE.findall(name))
+        questions.append(template.format(name=name, word=word))
+    return questions
+
+
+def _instrument(cfg: Dict, timer: StageTimer, embeddings) -> None:
+    """Wrap the retrieval steps the callbacks can't see with timers."""
+    embeddings.embed_query = timer.wrap("embed_query", embeddings.embed_query)
+    store = load_vectorstore(cfg)
+    store.similarity_search = timer.wrap(
+        "similarity_search", store.similarity_search
+    )
+    store.similarity_search_by_vectors = timer.wrap(
+        "similarity_search_by_vectors", store.similarity_search_by_vectors
+    )
+    for module, attr, stage in (
+        (utils.agent_utils, "search", "search"),
+        (utils.retrieval, "hybrid_search", "hybrid_search"),
+        (utils.retrieval, "multi_query_search", "multi_query_search"),
+        (utils.retrieval, "_embed_queries", "embed_queries"),
+        (utils.agent_utils, "rerank", "rerank"),
+        (utils.agent_utils, "pack_context", "pack_context"),
+        (
+            langgraph_flow.agents.navigator_agent,
+            "get_symbol_context",
+            "symbol_context",
+        ),
+    ):
+        setattr(module, attr, timer.wrap(stage, getattr(module, attr)))
+
+
+def _summarize(durations: Dict[str, List[float]], n_questions: int) -> Dict:
+    stages = {}
+    for stage, values in sorted(
+        durations.items(), key=lambda item: -sum(item[1])
+    ):
+        ms = 1000 * np.asarray(values)
+        stages[stage] = {
+            "count": len(values),
+            "per_question": round(len(values) / n_questions, 3),
+            "mean_ms": round(float(ms.mean()), 3),
+            "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p90_ms": round(float(np.percentile(ms, 90)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3),
+            "max_ms": round(float(ms.max()), 3),
+        }
+    return stages
+
+
+def _print_stages(stages: Dict[str, Dict]) -> None:
+    print(
+        f"{'stage':<26}{'count':>7}{'mean ms':>10}{'p50 ms':>10}"
+        f"{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    )
+    for stage, s in stages.items():
+        print(
+            f"{stage:<26}{s['count']:>7}{s['mean_ms']:>10.2f}"
+            f"{s['p50_ms']:>10.2f}{s['p90_ms']:>10.2f}"
+            f"{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}"
+        )
+
+
+def run(cfg: Dict, questions: List[str], args) -> Dict:
+    """Answer `questions` with `--concurrency` threads; returns results."""
+    graph = build_graph(cfg)
+    timer = StageTimer()
+    intents: Dict[str, int] = defaultdict(int)
+
+    def ask(question: str, timed: bool = True) -> None:
+        inputs = {KEY_QUESTION: question, KEY_CONFIG: cfg}
+        config = {"callbacks": [timer]} if timed else {}
+        start = time.perf_counter()
+        state = graph.invoke(inputs, config=config)
+        if timed:
+            timer.record(STAGE_GRAPH, time.perf_counter() - start)
+            intents[state.get(KEY_INTENT)] += 1
+
+    # Open stores, indexes and prompt runnables before timing
+    for question in questions[: len(_QUESTION_TEMPLATES)]:
+        ask(question, timed=False)
+    _instrument(cfg, timer, OpenAIModel(cfg).embedding_model)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(ask, questions))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "questions": len(questions),
+        "concurrency": args.concurrency,
+        "seconds": round(elapsed, 3),
+        "questions_per_second": round(len(questions) / elapsed, 2),
+        "intents": dict(intents),
+        "stages": _summarize(timer.durations, len(questions)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--files", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--ttft-ms", type=float, default=200, help="Stub LLM first-token delay"
+    )
+    parser.add_argument(
+        "--token-ms", type=float, default=2, help="Stub LLM delay per word"
+    )
+    parser.add_argument(
+        "--embed-ms", type=float, default=30, help="Stub query embedding delay"
+    )
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument(
+        "--vectorstore", choices=["chroma", "faiss"], default="chroma"
+    )
+    parser.add_argument("--answer-cache", action="store_true")
+    parser.add_argument(
+        "--no-query-variants",
+        dest="query_variants",
+        action="store_false",
+        help="Retrieve with the question alone (no multi_query_search)",
+    )
+    parser.add_argument("--output", help="Write results JSON here")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    with tempfile.TemporaryDirectory() as base_dir:
+        cfg = _config(base_dir, args)
+        names = _build_corpus(cfg, args)
+        embeddings = FakeEmbeddings(dim=args.dim, latency=args.embed_ms / 1000)
+        chat_model = FakeChatModel(
+            reply=_fake_reply,
+            first_token_latency=args.ttft_ms / 1000,
+            token_latency=args.token_ms / 1000,
+        )
+        OpenAIModel(cfg).use_models(chat_model, embeddings)
+        results = run(cfg, _questions(names, args.questions, args.seed), args)
+
+    _print_stages(results["stages"])
+    print(
+        f"\n{results['questions']} questions in {results['seconds']:.2f} s "
+        f"with concurrency {args.concurrency}: "
+        f"{results['questions_per_second']:.1f} questions/s"
+    )
+    print(f"intents: {results['intents']}")
+
+    if args.output:
+        results.update(
+            {
+                "benchmark": "query",
+                "created": datetime.now(timezone.utc).isoformat(),
+                "commit": _code_version(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "params": vars(args),
+            }
+        )
+        Path(args.output).write_text(
+            json.dumps(results, indent=2), encoding=VALUES_UTF_8
+        )
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Benchmark the retrieval rerank stage: answer quality at `top_k` and
+rerank latency on CPU, per method, over a labelled question set.
+
+    none            `hybrid_search(question, top_k)`, no second stage
+    mmr@<lambda>    `hybrid_search(question, fetch_k)`, then MMR over the
+                    stored vectors with that relevance/novelty weight
+    cross_encoder   the same candidates scored by a local cross-encoder
+                    (needs `poetry install -E rerank`; skipped otherwise)
+
+Quality is measured per question against the files labelled relevant:
+
+    hit             share of questions with a relevant file in the top_k
+    mrr             mean reciprocal rank of the first relevant result
+    recall          share of a question's labelled targets covered
+    redundant       share of top_k slots repeating a file (or a near copy
+                    of one) already in the results
+
+By default the corpus is synthetic (`benchmarks.synthetic_repo`) with
+near-copied files, embedded with the bag-of-words `HashingEmbeddings`.
+Questions ask about one Python function, or compare two from different
+files; the files defining them are the labels, and near copies of a file
+count as the same target. With `--config` and `--labels`, an ingested
+repo is evaluated instead (this calls the configured embedding model);
+each labels line is `{"question": ..., "paths": [relative paths]}`.
+
+Usage:
+    poetry run python -m benchmarks.rerank_benchmark
+    poetry run python -m benchmarks.rerank_benchmark --files 1000 \
+        --near-duplicates 0.3 --top-k 3 5 --mmr-lambda 0.5 0.7 0.9
+    poetry run python -m benchmarks.rerank_benchmark \
+        --config config/settings.toml --labels labels.jsonl --top-k 3
+"""
+
+import argparse
+import json
+import logging
+import random
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from benchmarks.fakes import HashingEmbeddings
+from benchmarks.synthetic_repo import generate_repo
+from ingestion.chunk_code import EXECUTOR_THREAD, iter_repository_chunks
+from ingestion.embed_chunks_into_vectorstore import embed_documents
+from langgraph_flow.models.openai_model import OpenAIModel
+from utils.constants import (
+    KEY_BASE_DIRECTORY,
+    KEY_COLLECTION,
+    KEY_EMBEDDING_CACHE,
+    KEY_ENABLED,
+    KEY_LOCAL_PATH,
+    KEY_PROJECT_NAME,
+    KEY_RELATIVE_PATH,
+    KEY_REPO,
+    KEY_SUBPATH,
+    KEY_TYPE,
+    KEY_VECTORSTORE,
+    VALUES_UTF_8,
+)
+from utils.reranker import (
+    DEFAULT_CROSS_ENCODER_MODEL,
+    DEFAULT_FETCH_K,
+    DEFAULT_MMR_LAMBDA,
+    RERANK_CROSS_ENCODER,
+    RERANK_MMR,
+    RERANK_NONE,
+    CrossEncoder,
+    RerankSettings,
+    rerank,
+)
+from utils.retrieval import hybrid_search
+from utils.util import load_config
+
+_PROJECT = "bench"
+_DEF_RE = re.compile(r"^def (\w+)", re.MULTILINE)
+_SINGLE_TEMPLATES = [
+    "explain what {name} does",
+    "how does {words} work?",
+]
+_PAIR_TEMPLATE = "compare {name} and {other}"
+
+
+def _config(base_dir: str, args) -> Dict:
+    return {
+        KEY_REPO: {
+            KEY_PROJECT_NAME: _PROJECT,
+            KEY_LOCAL_PATH: f"{base_dir}/clones",
+        },
+        KEY_VECTORSTORE: {
+            KEY_BASE_DIRECTORY: base_dir,
+            KEY_COLLECTION: _PROJECT,
+            KEY_SUBPATH: "store",
+            KEY_TYPE: args.vectorstore,
+        },
+        KEY_EMBEDDING_CACHE: {KEY_ENABLED: False},
+    }
+
+
+def _build_corpus(cfg: Dict, args) -> Tuple[List[Dict], Callable]:
+    """
+    Generate and ingest the synthetic repo; return its labelled questions
+    and the function mapping a relative path to its target (a file and
+    its near copies share one).
+    """
+    repo_cfg = cfg[KEY_REPO]
+    root = Path(repo_cfg[KEY_LOCAL_PATH]) / repo_cfg[KEY_PROJECT_NAME]
+    paths = generate_repo(
+        root,
+        args.files,
+        near_duplicate_ratio=args.near_duplicates,
+        seed=args.seed,
+    )
+    embeddings = HashingEmbeddings(dim=args.dim)
+    docs = iter_repository_chunks(str(root), executor=EXECUTOR_THREAD)
+    embed_documents(docs, cfg, embeddings=embeddings)
+    OpenAIModel(cfg).use_models(embedding_model=embeddings)
+
+    # Near copies define the same functions as their original
+    targets: Dict[str, str] = {}
+    definitions: Dict[str, List[str]] = {}
+    for path in paths:
+        relative = path.relative_to(root).as_posix()
+        targets[relative] = relative
+        if path.suffix != ".py":
+            continue
+        names = _DEF_RE.findall(path.read_text(encoding=VALUES_UTF_8))
+        targets[relative] = " ".join(sorted(names)) or relative
+        for name in names:
+            definitions.setdefault(name, []).append(relative)
+
+    rng = random.Random(args.seed)
+    names = sorted(definitions)
+    questions = []
+    for i in range(args.questions):
+        name = rng.choice(names)
+        if i % 3 == 2:
+            other = rng.choice(names)
+            while targets[definitions[other][0]] in {
+                targets[path] for path in definitions[name]
+            }:
+                other = rng.choice(names)
+            question = _PAIR_TEMPLATE.format(name=name, other=other)
+            labels = [definitions[name], definitions[other]]
+        else:
+            template = _SINGLE_TEMPLATES[i % 3]
+            words = name.replace("_", " ")
+            question = template.format(name=name, words=words)
+            labels = [definitions[name]]
+        questions.append({"question": question, "labels": labels})
+    return questions, lambda path: targets.get(path, path)
+
+
+def _load_labels(path: str) -> List[Dict]:
+    """Labels file lines as questions with one target per labelled path."""
+    questions = []
+    for line in Path(path).read_text(encoding=VALUES_UTF_8).splitlines():
+        if line.strip():
+            item = json.loads(line)
+            questions.append(
+                {
+                    "question": item["question"],
+                    "labels": [[path] for path in item["paths"]],
+                }
+            )
+    return questions
+
+
+def _score(docs, labels: List[List[str]], target_of: Callable) -> Dict:
+    """Quality metrics of one result list against a question's labels."""
+    wanted = [{target_of(path) for path in paths} for paths in labels]
+    relevant = set().union(*wanted)
+    seen = set()
+    first_hit = None
+    redundant = 0
+    for rank, doc in enumerate(docs, start=1):
+        target = target_of(doc.metadata.get(KEY_RELATIVE_PATH))
+        if target in seen:
+            redundant += 1
+        seen.add(target)
+        if first_hit is None and target in relevant:
+            first_hit = rank
+    return {
+        "hit": float(first_hit is not None),
+        "mrr": 1 / first_hit if first_hit else 0.0,
+        "recall": sum(bool(targets & seen) for targets in wanted) / len(wanted),
+        "redundant": redundant / max(len(docs), 1),
+    }
+
+
+def _methods(args) -> List[Tuple[str, RerankSettings]]:
+    methods = [(RERANK_NONE, RerankSettings(RERANK_NONE))]
+    for mmr_lambda in args.mmr_lambda:
+        methods.append(
+            (
+                f"{RERANK_MMR}@{mmr_lambda:g}",
+                RerankSettings(RERANK_MMR, args.fetch_k, mmr_lambda),
+            )
+        )
+    if CrossEncoder is None:
+        print("sentence-transformers not installed: skipping cross_encoder")
+    elif not args.no_cross_encoder:
+        methods.append(
+            (
+                RERANK_CROSS_ENCODER,
+                RerankSettings(
+                    RERANK_CROSS_ENCODER,
+                    args.fetch_k,
+                    args.cross_encoder_lambda,
+                    args.cross_encoder_model,
+                ),
+            )
+        )
+    return methods
+
+
+def run(cfg: Dict, questions: List[Dict], target_of: Callable, args) -> Dict:
+    """Evaluate every method at every `--top-k`; returns the results."""
+    methods = _methods(args)
+    # Candidates once per question, shared by every reranking method
+    candidates = {}
+    fetch_ms = []
+    for item in questions:
+        start = time.perf_counter()
+        candidates[item["question"]] = hybrid_search(
+            cfg, item["question"], args.fetch_k
+        )
+        fetch_ms.append(1000 * (time.perf_counter() - start))
+    # Warm-up: open stores and load models before timing
+    for _, settings in methods:
+        item = questions[0]
+        rerank(cfg, item["question"], candidates[item["question"]], 1, settings)
+
+    results = []
+    for top_k in args.top_k:
+        for name, settings in methods:
+            scores, latencies = [], []
+            for item in questions:
+                question = item["question"]
+                start = time.perf_counter()
+                if settings.method == RERANK_NONE:
+                    docs = hybrid_search(cfg, question, top_k)
+                else:
+                    docs = rerank(
+                        cfg, question, candidates[question], top_k, settings
+                    )
+                latencies.append(1000 * (time.perf_counter() - start))
+                scores.append(_score(docs, item["labels"], target_of))
+            ms = np.asarray(latencies)
+            results.append(
+                {
+                    "top_k": top_k,
+                    "method": name,
+                    **{
+                        metric: round(
+                            float(np.mean([s[metric] for s in scores])), 4
+                        )
+                        for metric in scores[0]
+                    },
+                    "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                    "p95_ms": round(float(np.percentile(ms, 95)), 3),
+                }
+            )
+    return {
+        "questions": len(questions),
+        "fetch_k": args.fetch_k,
+        "fetch_p50_ms": round(float(np.percentile(fetch_ms, 50)), 3),
+        "results": results,
+    }
+
+
+def _print_results(results: Dict) -> None:
+    print(
+        f"{results['questions']} questions; hybrid_search for "
+        f"{results['fetch_k']} candidates: p50 "
+        f"{results['fetch_p50_ms']:.2f} ms (not included below; `none` "
+        f"times hybrid_search for top_k)\n"
+    )
+    print(
+        f"{'top_k':>5}  {'method':<16}{'hit':>7}{'mrr':>7}{'recall':>8}"
+        f"{'redund':>8}{'p50 ms':>9}{'p95 ms':>9}"
+    )
+    for r in results["results"]:
+        print(
+            f"{r['top_k']:>5}  {r['method']:<16}{r['hit']:>7.3f}"
+            f"{r['mrr']:>7.3f}{r['recall']:>8.3f}{r['redundant']:>8.3f}"
+            f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--config", help="Evaluate this ingested repo")
+    parser.add_argument("--labels", help="Labelled questions (JSONL)")
+    parser.add_argument("--questions", type=int, default=150)
+    parser.add_argument("--files", type=int, default=400)
+    parser.add_argument("--near-duplicates", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument(
+        "--vectorstore", choices=["chroma", "faiss"], default="chroma"
+    )
+    parser.add_argument("--top-k", type=int, nargs="+", default=[3, 5])
+    parser.add_argument("--fetch-k", type=int, default=DEFAULT_FETCH_K)
+    parser.add_argument(
+        "--mmr-lambda", type=float, nargs="+", default=[DEFAULT_MMR_LAMBDA]
+    )
+    parser.add_argument(
+        "--cross-encoder-model", default=DEFAULT_CROSS_ENCODER_MODEL
+    )
+    parser.add_argument(
+        "--cross-encoder-lambda", type=float, default=DEFAULT_MMR_LAMBDA
+    )
+    parser.add_argument("--no-cross-encoder", action="store_true")
+    parser.add_argument("--output", help="Write results JSON here")
+    args = parser.parse_args()
+    if bool(args.config) != bool(args.labels):
+        parser.error("--config and --labels go together")
+
+    logging.basicConfig(level=logging.ERROR)
+    if args.config:
+        results = run(
+            load_config(args.config),
+            _load_labels(args.labels),
+            lambda path: path,
+            args,
+        )
+    else:
+        with tempfile.TemporaryDirectory() as base_dir:
+            cfg = _config(base_dir, args)
+            questions, target_of = _build_corpus(cfg, args)
+            results = run(cfg, questions, target_of, args)
+
+    _print_results(results)
+    if args.output:
+        results["params"] = vars(args)
+        Path(args.output).write_text(
+            json.dumps(results, indent=2), encoding=VALUES_UTF_8
+        )
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
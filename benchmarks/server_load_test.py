@@ -0,0 +1,273 @@
+"""
+Load-test the chat server: latency (p50/p99) and requests/sec with many
+concurrent sessions.
+
+By default the server runs in-process over a small synthetic corpus with
+offline stub models (`benchmarks.fakes`): the chat model streams a fixed
+answer with `--ttft-ms` to its first word, so the numbers measure the
+server, graph and retrieval, not OpenAI. No network or API key needed.
+With `--url` the same load is sent to a running `main.py serve` instead.
+
+Each concurrent client is one session asking explain / navigate /
+retrieve questions in turn. `--websocket` streams answers over
+`/chat/ws` and also reports the client-side time to first token.
+
+Usage:
+    poetry run python -m benchmarks.server_load_test
+    poetry run python -m benchmarks.server_load_test --requests 1000 \
+        --concurrency 8 32 128 --ttft-ms 400 --websocket
+    poetry run python -m benchmarks.server_load_test \
+        --url http://127.0.0.1:8080 --concurrency 4 16
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+from typing import Dict, List
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.fakes import (
+    DEFAULT_FAKE_ANSWER,
+    FakeChatModel,
+    FakeEmbeddings,
+)
+from ingestion.embed_chunks_into_vectorstore import embed_documents
+from langgraph_flow.models.openai_model import OpenAIModel
+from langgraph_flow.server import DEFAULT_MAX_CONCURRENCY, create_app
+from utils.constants import (
+    KEY_ANSWER_CACHE,
+    KEY_BASE_DIRECTORY,
+    KEY_COLLECTION,
+    KEY_CONTENT,
+    KEY_ENABLED,
+    KEY_INTENT_CLASSIFIER,
+    KEY_MAX_CONCURRENCY,
+    KEY_MAX_PENDING,
+    KEY_META,
+    KEY_PATH,
+    KEY_PROJECT_NAME,
+    KEY_QUESTION,
+    KEY_RELATIVE_PATH,
+    KEY_REPO,
+    KEY_SERVER,
+    KEY_SESSION_ID,
+    KEY_SUBPATH,
+    KEY_TYPE,
+    KEY_VECTORSTORE,
+)
+
+_QUESTIONS = [
+    "explain func_{i}",
+    "where is func_{i} used?",
+    "show me the code for func_{i}",
+]
+
+
+def _docs(n_functions: int):
+    for i in range(n_functions):
+        yield {
+            KEY_CONTENT: (
+                f"def func_{i}(x):\n    return func_{max(i - 1, 0)}(x) * {i}\n"
+            ),
+            KEY_META: {KEY_RELATIVE_PATH: f"pkg/mod_{i // 20}.py"},
+        }
+
+
+def _config(base_dir: str, args) -> Dict:
+    return {
+        KEY_REPO: {KEY_PROJECT_NAME: "loadtest"},
+        KEY_VECTORSTORE: {
+            KEY_BASE_DIRECTORY: base_dir,
+            KEY_COLLECTION: "loadtest",
+            KEY_SUBPATH: "store",
+            KEY_TYPE: args.vectorstore,
+        },
+        KEY_ANSWER_CACHE: {KEY_ENABLED: args.answer_cache},
+        KEY_INTENT_CLASSIFIER: {KEY_PATH: f"{base_dir}/intent_log.jsonl"},
+        KEY_SERVER: {
+            KEY_MAX_CONCURRENCY: args.server_concurrency,
+            KEY_MAX_PENDING: args.server_pending,
+        },
+    }
+
+
+def _fake_reply(prompt: str) -> str:
+    # Questions the local classifier can't place still get an intent
+    return "explain" if prompt.startswith("Classify") else DEFAULT_FAKE_ANSWER
+
+
+async def _start_server(cfg: Dict, args) -> web.AppRunner:
+    embeddings = FakeEmbeddings()
+    chat_model = FakeChatModel(
+        reply=_fake_reply,
+        first_token_latency=args.ttft_ms / 1000,
+        token_latency=args.token_ms / 1000,
+    )
+    OpenAIModel(cfg).use_models(chat_model, embeddings)
+    await asyncio.to_thread(
+        embed_documents, _docs(args.functions), cfg, embeddings=embeddings
+    )
+    runner = web.AppRunner(create_app(cfg), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+
+async def _ask_http(http, url: str, session_id: str, question: str):
+    async with http.post(
+        f"{url}/chat", json={KEY_QUESTION: question, KEY_SESSION_ID: session_id}
+    ) as response:
+        await response.read()
+        return response.status, None
+
+
+async def _ask_websocket(ws, session_id: str, question: str, start: float):
+    await ws.send_json({KEY_QUESTION: question, KEY_SESSION_ID: session_id})
+    first_token_s = None
+    async for msg in ws:
+        message = json.loads(msg.data)
+        if message[KEY_TYPE] == "token":
+            if first_token_s is None:
+                first_token_s = time.perf_counter() - start
+            continue
+        return (200 if message[KEY_TYPE] == "answer" else 503), first_token_s
+    return 0, first_token_s
+
+
+async def _client(
+    url: str,
+    client_id: int,
+    remaining: List[int],
+    results: List,
+    use_websocket: bool,
+    n_functions: int,
+) -> None:
+    session_id = f"loadtest-{client_id}"
+    async with aiohttp.ClientSession() as http:
+        ws = await http.ws_connect(f"{url}/chat/ws") if use_websocket else None
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            n = remaining[0]
+            question = _QUESTIONS[n % len(_QUESTIONS)].format(i=n % n_functions)
+            start = time.perf_counter()
+            try:
+                if ws is None:
+                    status, ttft = await _ask_http(
+                        http, url, session_id, question
+                    )
+                else:
+                    status, ttft = await _ask_websocket(
+                        ws, session_id, question, start
+                    )
+            except aiohttp.ClientError:
+                status, ttft = 0, None
+            results.append((status, time.perf_counter() - start, ttft))
+        if ws is not None:
+            await ws.close()
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+async def _run(url: str, args) -> None:
+    header = (
+        f"{'clients':>8}{'requests':>10}{'errors':>8}{'seconds':>9}"
+        f"{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}"
+    )
+    if args.websocket:
+        header += f"{'ttft p50':>10}{'ttft p99':>10}"
+    print(header)
+    for concurrency in args.concurrency:
+        remaining = [args.requests]
+        results: List = []
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                _client(
+                    url,
+                    client_id,
+                    remaining,
+                    results,
+                    args.websocket,
+                    args.functions,
+                )
+                for client_id in range(concurrency)
+            )
+        )
+        elapsed = time.perf_counter() - start
+        ok = [latency for status, latency, _ in results if status == 200]
+        ttfts = [ttft for status, _, ttft in results if ttft is not None]
+        line = (
+            f"{concurrency:>8}{len(results):>10}"
+            f"{len(results) - len(ok):>8}{elapsed:>9.2f}"
+            f"{len(ok) / elapsed:>9.1f}"
+            f"{1000 * _percentile(ok, 0.5):>9.1f}"
+            f"{1000 * _percentile(ok, 0.99):>9.1f}"
+        )
+        if args.websocket:
+            line += (
+                f"{1000 * _percentile(ttfts, 0.5):>10.1f}"
+                f"{1000 * _percentile(ttfts, 0.99):>10.1f}"
+            )
+        print(line)
+    print("errors: non-200 answers, including 503s once the queue is full")
+
+
+async def _main(args) -> None:
+    if args.url:
+        await _run(args.url.rstrip("/"), args)
+        return
+    with tempfile.TemporaryDirectory() as base_dir:
+        runner = await _start_server(_config(base_dir, args), args)
+        try:
+            host, port = runner.addresses[0][:2]
+            await _run(f"http://{host}:{port}", args)
+        finally:
+            await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="Load-test a running server instead")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 8, 32, 64]
+    )
+    parser.add_argument("--websocket", action="store_true")
+    parser.add_argument(
+        "--ttft-ms", type=float, default=300, help="Stub LLM first-token delay"
+    )
+    parser.add_argument(
+        "--token-ms", type=float, default=5, help="Stub LLM delay per word"
+    )
+    parser.add_argument("--functions", type=int, default=500)
+    parser.add_argument(
+        "--vectorstore", choices=["chroma", "faiss"], default="chroma"
+    )
+    parser.add_argument("--answer-cache", action="store_true")
+    parser.add_argument(
+        "--server-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY
+    )
+    parser.add_argument(
+        "--server-pending",
+        type=int,
+        default=1000,
+        help="Queue depth before 503s (the server default is lower)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Benchmark the summary tier: what building and refreshing file and
+directory summaries costs in LLM calls, and how coarse-to-fine retrieval
+(summary search, then chunks of the top files only) compares with flat
+chunk search in quality and latency.
+
+    full build      every file and directory summarized
+    unchanged       a second full run: every hash matches, no LLM calls
+    incremental     `--changed` files modified; only they and their
+                    ancestor directories are summarized again
+    renamed         `--changed` files moved; their summaries are reused
+
+Retrieval is scored as in `benchmarks.rerank_benchmark`, on its synthetic
+corpus and labelled questions (hit, MRR and recall at `--top-k`). The
+stub LLM "summarizes" a file as the names it defines and a directory as
+its children's names, so the summary tier sees the vocabulary a real
+summary would; no network or API key needed.
+
+Usage:
+    poetry run python -m benchmarks.summary_benchmark
+    poetry run python -m benchmarks.summary_benchmark --files 5000 \
+        --top-files 20 50 100 --llm-ms 200
+"""
+
+import argparse
+import logging
+import re
+import tempfile
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.fakes import FakeChatModel, HashingEmbeddings
+from benchmarks.rerank_benchmark import _build_corpus, _config, _score
+from ingestion.ingestion_util import get_chunk_manifest_path
+from ingestion.manifest import ChunkManifest
+from ingestion.summarize import update_summaries
+from utils.constants import (
+    KEY_LOCAL_PATH,
+    KEY_MIN_FILES,
+    KEY_PROJECT_NAME,
+    KEY_REPO,
+    KEY_SUMMARIES,
+    KEY_TOP_DIRECTORIES,
+    KEY_TOP_FILES,
+    VALUES_UTF_8,
+)
+from utils.retrieval import hybrid_search
+from utils.summary_retrieval import get_summary_filter
+
+_HEADER_RE = re.compile(r"^(File|Directory): (\S+)", re.MULTILINE)
+_DEFINITION_RE = re.compile(
+    r"\b(?:def|function|class|interface|void|public \w+)\s+(\w+)"
+)
+_CHILD_RE = re.compile(r"^- ([^:]+):", re.MULTILINE)
+_MAX_SUMMARY_NAMES = 40
+
+
+class _StubSummarizer:
+    """Stub LLM reply naming what a file defines or a directory holds."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.calls = 0
+
+    def __call__(self, prompt: str) -> str:
+        with self._lock:
+            self.calls += 1
+        kind, path = _HEADER_RE.search(prompt).groups()
+        if kind == "File":
+            names = _DEFINITION_RE.findall(prompt)
+        else:
+            names = _CHILD_RE.findall(prompt)
+        names = list(dict.fromkeys(names))[:_MAX_SUMMARY_NAMES]
+        return f"{path} {'defines' if kind == 'File' else 'holds'} " + (
+            ", ".join(names)
+        )
+
+
+def _repo_root(cfg: Dict) -> Path:
+    return Path(cfg[KEY_REPO][KEY_LOCAL_PATH]) / cfg[KEY_REPO][KEY_PROJECT_NAME]
+
+
+def _python_files(cfg: Dict) -> List[str]:
+    manifest = ChunkManifest(get_chunk_manifest_path(cfg), read_only=True)
+    try:
+        return [path for path in manifest.paths() if path.endswith(".py")]
+    finally:
+        manifest.close()
+
+
+def _move_in_manifest(cfg: Dict, moves: Dict[str, str]) -> None:
+    # What re-ingesting the renamed files would record
+    manifest = ChunkManifest(get_chunk_manifest_path(cfg))
+    try:
+        for old, new in moves.items():
+            ids = manifest.ids_for_paths([old])
+            manifest.remove_paths([old])
+            manifest.add((id_, new) for id_ in ids)
+    finally:
+        manifest.close()
+
+
+def _summary_run(cfg: Dict, args, stub: _StubSummarizer, name: str, **kwargs):
+    """One `update_summaries` run with the stub LLM; returns its row."""
+    llm = FakeChatModel(reply=stub, first_token_latency=args.llm_ms / 1000)
+    calls = stub.calls
+    start = time.perf_counter()
+    stats = update_summaries(
+        cfg,
+        _repo_root(cfg),
+        llm=llm,
+        embeddings=HashingEmbeddings(dim=args.dim),
+        **kwargs,
+    )
+    return {
+        "run": name,
+        "seconds": time.perf_counter() - start,
+        "llm_calls": stub.calls - calls,
+        "summarized": stats.files_summarized,
+        "reused": stats.files_reused,
+        "directories": stats.directories_summarized,
+    }
+
+
+def _modify(cfg: Dict, paths: List[str]) -> None:
+    root = _repo_root(cfg)
+    for path in paths:
+        with open(root / path, "a", encoding=VALUES_UTF_8) as f:
+            f.write("\n\ndef benchmark_extra_step():\n    return None\n")
+
+
+def _rename(cfg: Dict, paths: List[str]) -> List[str]:
+    """Move `paths` under `moved/`, in the checkout and the manifest."""
+    root = _repo_root(cfg)
+    moves = {path: f"moved/{path}" for path in paths}
+    for old, new in moves.items():
+        (root / new).parent.mkdir(parents=True, exist_ok=True)
+        (root / old).rename(root / new)
+    _move_in_manifest(cfg, moves)
+    return list(moves.values())
+
+
+def _retrieval_rows(cfg: Dict, questions: List[Dict], target_of, args):
+    """Flat vs coarse-to-fine retrieval quality and latency."""
+    variants = [("flat", None)] + [
+        (f"summaries@{n}", n) for n in args.top_files
+    ]
+    rows = []
+    for name, top_files in variants:
+        cfg[KEY_SUMMARIES][KEY_TOP_FILES] = top_files
+        scores, latencies = [], []
+        for item in questions:
+            question = item["question"]
+            start = time.perf_counter()
+            scope = get_summary_filter(cfg, question) if top_files else None
+            docs = hybrid_search(cfg, question, args.top_k, filter=scope)
+            if scope and not docs:
+                docs = hybrid_search(cfg, question, args.top_k)
+            latencies.append(1000 * (time.perf_counter() - start))
+            scores.append(_score(docs, item["labels"], target_of))
+        ms = np.asarray(latencies)
+        rows.append(
+            {
+                "method": name,
+                **{
+                    metric: float(np.mean([s[metric] for s in scores]))
+                    for metric in ("hit", "mrr", "recall")
+                },
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p95_ms": float(np.percentile(ms, 95)),
+            }
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=150)
+    parser.add_argument("--near-duplicates", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument(
+        "--vectorstore", choices=["chroma", "faiss"], default="chroma"
+    )
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--top-files", type=int, nargs="+", default=[50])
+    parser.add_argument("--top-directories", type=int, default=2)
+    parser.add_argument("--changed", type=int, default=20)
+    parser.add_argument(
+        "--llm-ms", type=float, default=0.0, help="Stub LLM latency per call"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    with tempfile.TemporaryDirectory() as base_dir:
+        cfg = _config(base_dir, args)
+        cfg[KEY_SUMMARIES] = {
+            KEY_MIN_FILES: 0,
+            KEY_TOP_DIRECTORIES: args.top_directories,
+        }
+        questions, target_of = _build_corpus(cfg, args)
+        stub = _StubSummarizer()
+        changed = _python_files(cfg)[: args.changed]
+        build_rows = [
+            _summary_run(cfg, args, stub, "full build"),
+            _summary_run(cfg, args, stub, "unchanged"),
+        ]
+        _modify(cfg, changed)
+        build_rows.append(
+            _summary_run(cfg, args, stub, "incremental", changed=changed)
+        )
+        retrieval_rows = _retrieval_rows(cfg, questions, target_of, args)
+        # Last: the store still has the chunks under their old paths
+        moved = _rename(cfg, changed)
+        build_rows.append(
+            _summary_run(cfg, args, stub, "renamed", changed=moved)
+        )
+
+    print(
+        f"{'run':<14}{'seconds':>9}{'llm calls':>11}{'summarized':>12}"
+        f"{'reused':>8}{'dirs':>7}"
+    )
+    for r in build_rows:
+        print(
+            f"{r['run']:<14}{r['seconds']:>9.2f}{r['llm_calls']:>11}"
+            f"{r['summarized']:>12}{r['reused']:>8}{r['directories']:>7}"
+        )
+    print(
+        f"\n{len(questions)} questions, top_k {args.top_k}\n"
+        f"{'method':<16}{'hit':>7}{'mrr':>7}{'recall':>8}"
+        f"{'p50 ms':>9}{'p95 ms':>9}"
+    )
+    for r in retrieval_rows:
+        print(
+            f"{r['method']:<16}{r['hit']:>7.3f}{r['mrr']:>7.3f}"
+            f"{r['recall']:>8.3f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Generate a synthetic repository for benchmarks: a package tree of Python,
+JavaScript, TypeScript, Java and Markdown files (the chunker's
+`DEFAULT_EXTENSIONS`) with plausible, cross-referencing code.
+
+Output is deterministic for a given seed. A share of files are exact
+copies of others, so chunk deduplication has work to do, and optionally
+a share are near copies (an extra comment line), like vendored or
+versioned files, that only retrieval can tell apart.
+
+Usage:
+    poetry run python -m benchmarks.synthetic_repo /tmp/synth --files 2000
+    poetry run python -m benchmarks.synthetic_repo /tmp/synth --files 500 \
+        --mix py=6 ts=2 js=1 java=1 md=1 --functions 12 --git
+"""
+
+import argparse
+import random
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from git import Repo
+
+from utils.constants import VALUES_UTF_8
+
+# Relative weight of each extension in the generated repo
+DEFAULT_MIX = {"py": 5, "ts": 2, "js": 2, "java": 1, "md": 1}
+DEFAULT_FUNCTIONS_PER_FILE = 8
+DEFAULT_DUPLICATE_RATIO = 0.05
+_COMMENT_PREFIX = {"py": "# ", "md": "<!-- "}
+_COMMENT_SUFFIX = {"md": " -->"}
+_FILES_PER_DIR = 25
+_WORDS = (
+    "account batch buffer cache client config cursor document embedding "
+    "event file graph index item job key manifest message model node "
+    "order parser path query record repo request result session store "
+    "stream task token user vector worker"
+).split()
+_VERBS = "build load parse update fetch merge resolve render validate".split()
+
+
+def _name(rng: random.Random, parts: int = 2) -> List[str]:
+    return [rng.choice(_VERBS)] + rng.sample(_WORDS, parts - 1)
+
+
+def _snake(words: List[str]) -> str:
+    return "_".join(words)
+
+
+def _camel(words: List[str]) -> str:
+    return words[0] + "".join(w.title() for w in words[1:])
+
+
+def _pascal(words: List[str]) -> str:
+    return "".join(w.title() for w in words)
+
+
+def _python(rng: random.Random, n_functions: int, module: str) -> str:
+    lines = [
+        f'"""Synthetic {module} module."""',
+        "",
+        "import logging",
+        "from typing import Dict, List, Optional",
+        "",
+        "logger = logging.getLogger(__name__)",
+        "",
+    ]
+    names = [_snake(_name(rng, 3)) for _ in range(n_functions)]
+    class_name = _pascal(rng.sample(_WORDS, 2))
+    for i, name in enumerate(names):
+        callee = names[i - 1] if i else None
+        lines += [
+            "",
+            f"def {name}(items: List[Dict], limit: Optional[int] = None):",
+            f'    """{name.replace("_", " ").capitalize()} for each item."""',
+            "    results = []",
+            "    for item in items[:limit]:",
+            f'        if item.get("{rng.choice(_WORDS)}"):',
+            f'            logger.debug("Skipping %s", item.get("{rng.choice(_WORDS)}"))',
+            "            continue",
+            f'        value = item.get("{rng.choice(_WORDS)}", {rng.randint(0, 99)})',
+            f"        results.append(value * {rng.randint(2, 9)})",
+        ]
+        if callee:
+            lines.append(f"    results.extend({callee}(items, limit))")
+        lines += ["    return results", ""]
+    lines += [
+        "",
+        f"class {class_name}:",
+        f'    """Holds {rng.choice(_WORDS)} state."""',
+        "",
+        "    def __init__(self, size: int = 10):",
+        "        self._size = size",
+        "        self._items: List[Dict] = []",
+        "",
+        "    def add(self, item: Dict) -> None:",
+        "        self._items.append(item)",
+        "",
+        "    def run(self) -> List:",
+        f"        return {names[-1]}(self._items, self._size)",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _javascript(rng: random.Random, n_functions: int, typed: bool) -> str:
+    lines = []
+    names = [_camel(_name(rng, 3)) for _ in range(n_functions)]
+    arg = "items: Array<Record<string, number>>" if typed else "items"
+    ret = ": number[]" if typed else ""
+    for i, name in enumerate(names):
+        lines += [
+            f"export function {name}({arg}){ret} {{",
+            "  const results = [];",
+            "  for (const item of items) {",
+            f"    if (!item.{rng.choice(_WORDS)}) continue;",
+            f"    results.push(item.{rng.choice(_WORDS)} * {rng.randint(2, 9)});",
+            "  }",
+        ]
+        if i:
+            lines.append(f"  results.push(...{names[i - 1]}(items));")
+        lines += ["  return results;", "}", ""]
+    return "\n".join(lines)
+
+
+def _java(rng: random.Random, n_functions: int, class_name: str) -> str:
+    lines = [
+        "package synthetic;",
+        "",
+        "import java.util.ArrayList;",
+        "import java.util.List;",
+        "import java.util.Map;",
+        "",
+        f"public class {class_name} {{",
+    ]
+    names = [_camel(_name(rng, 3)) for _ in range(n_functions)]
+    for i, name in enumerate(names):
+        lines += [
+            "",
+            f"    public List<Integer> {name}(List<Map<String, Integer>> items) {{",
+            "        List<Integer> results = new ArrayList<>();",
+            "        for (Map<String, Integer> item : items) {",
+            f'            Integer value = item.getOrDefault("{rng.choice(_WORDS)}", {rng.randint(0, 99)});',
+            f"            results.add(value * {rng.randint(2, 9)});",
+            "        }",
+        ]
+        if i:
+            lines.append(f"        results.addAll({names[i - 1]}(items));")
+        lines += ["        return results;", "    }"]
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _markdown(rng: random.Random, n_sections: int, title: str) -> str:
+    lines = [f"# {title}", ""]
+    for _ in range(n_sections):
+        words = rng.sample(_WORDS, 4)
+        lines += [
+            f"## {' '.join(words).capitalize()}",
+            "",
+            " ".join(rng.choice(_WORDS) for _ in range(rng.randint(40, 90)))
+            + ".",
+            "",
+            "```python",
+            f"{_snake(_name(rng, 3))}(items, limit={rng.randint(1, 50)})",
+            "```",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def _render(ext: str, rng: random.Random, n_functions: int, stem: str) -> str:
+    if ext == "py":
+        return _python(rng, n_functions, stem)
+    if ext in ("js", "ts"):
+        return _javascript(rng, n_functions, typed=ext == "ts")
+    if ext == "java":
+        return _java(rng, n_functions, _pascal(stem.split("_")))
+    return _markdown(rng, max(1, n_functions // 2), stem.replace("_", " "))
+
+
+def _near_copy(ext: str, text: str, stem: str) -> str:
+    comment = (
+        f"{_COMMENT_PREFIX.get(ext, '// ')}Copied to {stem}"
+        f"{_COMMENT_SUFFIX.get(ext, '')}"
+    )
+    return f"{comment}\n{text}"
+
+
+def generate_repo(
+    root: Path,
+    n_files: int,
+    *,
+    mix: Optional[Dict[str, float]] = None,
+    functions_per_file: int = DEFAULT_FUNCTIONS_PER_FILE,
+    duplicate_ratio: float = DEFAULT_DUPLICATE_RATIO,
+    near_duplicate_ratio: float = 0.0,
+    seed: int = 0,
+    git: bool = False,
+) -> List[Path]:
+    """
+    Write `n_files` synthetic source files under `root` (replacing its
+    contents) and return their paths.
+
+    Args:
+        mix:               Relative weight per extension (default
+                           `DEFAULT_MIX`).
+        functions_per_file: Functions (or Markdown sections x2) per file,
+                           varied +/-50% per file.
+        duplicate_ratio:   Share of files that copy an earlier file.
+        near_duplicate_ratio: Share of files that copy an earlier file
+                           with a comment line added at the top.
+        git:               Also `git init` and commit the tree, with an
+                           `origin` remote, like a real checkout.
+    """
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(seed)
+    root = Path(root)
+    if root.exists():
+        shutil.rmtree(root)
+    extensions = list(mix)
+    weights = [mix[ext] for ext in extensions]
+    paths: List[Path] = []
+    texts: Dict[str, List[str]] = {ext: [] for ext in extensions}
+    for i in range(n_files):
+        ext = rng.choices(extensions, weights)[0]
+        stem = f"{_snake(rng.sample(_WORDS, 2))}_{i}"
+        path = root / f"pkg_{i // _FILES_PER_DIR}" / f"{stem}.{ext}"
+        # No draw until there is a text to copy
+        draw = rng.random() if texts[ext] else 1.0
+        if draw < duplicate_ratio:
+            text = rng.choice(texts[ext])
+        elif draw < duplicate_ratio + near_duplicate_ratio:
+            text = _near_copy(ext, rng.choice(texts[ext]), stem)
+        else:
+            n_functions = max(
+                1,
+                int(functions_per_file * rng.uniform(0.5, 1.5)),
+            )
+            text = _render(ext, rng, n_functions, stem)
+            texts[ext].append(text)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding=VALUES_UTF_8)
+        paths.append(path)
+
+    if git:
+        repo = Repo.init(root)
+        repo.index.add([str(p.relative_to(root)) for p in paths])
+        with repo.config_writer() as config:
+            config.set_value("user", "name", "benchmark")
+            config.set_value("user", "email", "benchmark@example.com")
+        repo.index.commit("Synthetic repository")
+        repo.create_remote("origin", f"file://{root}")
+    return paths
+
+
+def parse_mix(values: List[str]) -> Dict[str, float]:
+    """`["py=5", "md=1"]` -> `{"py": 5.0, "md": 1.0}`."""
+    mix = {}
+    for value in values:
+        ext, _, weight = value.partition("=")
+        mix[ext.lstrip(".")] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("root", help="Directory to (re)create")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument(
+        "--mix",
+        nargs="+",
+        default=[f"{ext}={weight}" for ext, weight in DEFAULT_MIX.items()],
+        help="ext=weight pairs",
+    )
+    parser.add_argument(
+        "--functions", type=int, default=DEFAULT_FUNCTIONS_PER_FILE
+    )
+    parser.add_argument(
+        "--duplicates", type=float, default=DEFAULT_DUPLICATE_RATIO
+    )
+    parser.add_argument("--near-duplicates", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--git", action="store_true")
+    args = parser.parse_args()
+
+    paths = generate_repo(
+        Path(args.root),
+        args.files,
+        mix=parse_mix(args.mix),
+        functions_per_file=args.functions,
+        duplicate_ratio=args.duplicates,
+        near_duplicate_ratio=args.near_duplicates,
+        seed=args.seed,
+        git=args.git,
+    )
+    size = sum(p.stat().st_size for p in paths)
+    print(f"Wrote {len(paths)} files ({size / 1e6:.1f} MB) to {args.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Microbenchmark the tokenizer work of chunking, on the files of a
+synthetic (or given) repository, against the token splitter it replaces:
+
+    split_text       `TokenTextSplitter.split_text` on each file: encode,
+                     slice token windows, decode each back, hash it
+    per_line         encode every line separately (line token counts)
+    single_pass      encode each file once and map token byte offsets to
+                     lines, as `SyntaxChunker` does
+    chunk            `SyntaxChunker.chunk` end to end, hashing IDs
+    pack_encode      `pack_context` over chunks without a stored count,
+                     encoding every block
+    pack_stored      `pack_context` over the same chunks with their
+                     ingestion `token_count`
+
+Each row is the best of `--repeats` runs, one thread. Also prints how
+far the stored counts are from encoding each chunk alone.
+
+Usage:
+    poetry run python -m benchmarks.tokenization_benchmark
+    poetry run python -m benchmarks.tokenization_benchmark --repo . \
+        --chunk-tokens 800
+"""
+
+import argparse
+import ast
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+import tiktoken
+from langchain.schema import Document
+from langchain.text_splitter import TokenTextSplitter
+
+from benchmarks.ingestion_benchmark import _best_of
+from benchmarks.synthetic_repo import DEFAULT_MIX, generate_repo, parse_mix
+from ingestion.chunk_code import (
+    DEFAULT_CHUNK_OVERLAP,
+    DEFAULT_ENCODING,
+    DEFAULT_EXTENSIONS,
+    DEFAULT_IGNORED_DIRS,
+    _discover_files,
+)
+from ingestion.syntax_chunker import (
+    _LINE_RE,
+    SyntaxChunker,
+    _FileChunks,
+    _no_units,
+)
+from utils.constants import (
+    KEY_CHUNK_INDEX,
+    KEY_CODE_LANGUAGE,
+    KEY_RELATIVE_PATH,
+    KEY_TOKEN_COUNT,
+    VALUES_UTF_8,
+)
+from utils.context_packer import pack_context
+
+# Retrieved chunks per packed context, as a query's top_k would give
+_DOCS_PER_CONTEXT = 8
+
+
+def _load(root: Path) -> List[Tuple[str, str, str]]:
+    """`(relative path, language, text)` of every file to chunk."""
+    return [
+        (
+            str(path.relative_to(root)),
+            path.suffix.lstrip("."),
+            path.read_text(encoding=VALUES_UTF_8, errors="ignore"),
+        )
+        for path in _discover_files(
+            root, DEFAULT_EXTENSIONS, DEFAULT_IGNORED_DIRS
+        )
+    ]
+
+
+def _split_text(files, splitter: TokenTextSplitter) -> int:
+    n = 0
+    for _, _, text in files:
+        for chunk in splitter.split_text(text):
+            hashlib.sha256(chunk.encode(VALUES_UTF_8)).hexdigest()
+            n += 1
+    return n
+
+
+def _per_line(files, encoding) -> int:
+    return sum(
+        len(encoding.encode_ordinary(line))
+        for _, _, text in files
+        for line in _LINE_RE.findall(text)
+    )
+
+
+def _single_pass(files, encoding, chunk_tokens: int) -> int:
+    # What `SyntaxChunker.chunk` does before packing: one encode per file
+    for _, _, text in files:
+        _FileChunks(
+            text,
+            _LINE_RE.findall(text),
+            encoding,
+            chunk_tokens,
+            DEFAULT_CHUNK_OVERLAP,
+            _no_units,
+        )
+    return len(files)
+
+
+def _chunk(files, chunker: SyntaxChunker, trees) -> List[Document]:
+    docs = []
+    for (path, lang, text), tree in zip(files, trees, strict=True):
+        for idx, chunk in enumerate(chunker.chunk(text, lang, tree)):
+            hashlib.sha256(chunk.text.encode(VALUES_UTF_8)).hexdigest()
+            docs.append(
+                Document(
+                    page_content=chunk.text,
+                    metadata={
+                        KEY_RELATIVE_PATH: path,
+                        KEY_CHUNK_INDEX: idx,
+                        KEY_CODE_LANGUAGE: lang,
+                        KEY_TOKEN_COUNT: chunk.tokens,
+                    },
+                )
+            )
+    return docs
+
+
+def _pack(contexts: List[List[Document]], max_tokens: int) -> int:
+    return sum(pack_context(docs, max_tokens).tokens for docs in contexts)
+
+
+def _contexts(docs: List[Document], rng) -> List[List[Document]]:
+    order = rng.permutation(len(docs))
+    return [
+        [docs[i] for i in order[start : start + _DOCS_PER_CONTEXT]]
+        for start in range(0, len(docs), _DOCS_PER_CONTEXT)
+    ]
+
+
+def _without_counts(contexts: List[List[Document]]) -> List[List[Document]]:
+    return [
+        [
+            Document(
+                page_content=doc.page_content,
+                metadata={
+                    key: value
+                    for key, value in doc.metadata.items()
+                    if key != KEY_TOKEN_COUNT
+                },
+            )
+            for doc in docs
+        ]
+        for docs in contexts
+    ]
+
+
+def run(root: Path, args) -> None:
+    files = _load(root)
+    n_bytes = sum(len(text.encode(VALUES_UTF_8)) for _, _, text in files)
+    encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+    splitter = TokenTextSplitter(
+        encoding_name=DEFAULT_ENCODING,
+        chunk_size=args.chunk_tokens,
+        chunk_overlap=DEFAULT_CHUNK_OVERLAP,
+    )
+    chunker = SyntaxChunker(
+        args.chunk_tokens, DEFAULT_CHUNK_OVERLAP, DEFAULT_ENCODING
+    )
+    # The chunker gets the ast tree `_chunk_file` parses for symbols anyway
+    trees = []
+    for _, lang, text in files:
+        try:
+            trees.append(ast.parse(text) if lang == "py" else None)
+        except SyntaxError:
+            trees.append(None)
+
+    rows = []
+    for name, fn in (
+        ("split_text", lambda: _split_text(files, splitter)),
+        ("per_line", lambda: _per_line(files, encoding)),
+        (
+            "single_pass",
+            lambda: _single_pass(files, encoding, args.chunk_tokens),
+        ),
+    ):
+        seconds, _ = _best_of(args.repeats, fn)
+        rows.append((name, seconds, len(files), "files"))
+    seconds, docs = _best_of(
+        args.repeats, lambda: _chunk(files, chunker, trees)
+    )
+    rows.append(("chunk", seconds, len(files), "files"))
+
+    contexts = _contexts(docs, np.random.default_rng(args.seed))
+    bare = _without_counts(contexts)
+    for name, variant in (("pack_encode", bare), ("pack_stored", contexts)):
+        seconds, _ = _best_of(
+            args.repeats, lambda v=variant: _pack(v, args.max_tokens)
+        )
+        rows.append((name, seconds, len(variant), "contexts"))
+
+    print(f"{len(files)} files, {n_bytes / 1e6:.1f} MB in {root}")
+    print(
+        f"{'stage':<14}{'best s':>9}{'items':>9}{'MB/s':>9}{'throughput':>22}"
+    )
+    for name, seconds, items, unit in rows:
+        rate = (
+            f"{n_bytes / 1e6 / seconds:>9.1f}" if unit == "files" else " " * 9
+        )
+        print(
+            f"{name:<14}{seconds:>9.3f}{items:>9}{rate}"
+            f"{items / seconds:>13.1f} {unit}/s"
+        )
+
+    errors = np.array(
+        [
+            doc.metadata[KEY_TOKEN_COUNT]
+            - len(encoding.encode_ordinary(doc.page_content))
+            for doc in docs
+        ]
+    )
+    print(
+        f"\n{len(docs)} chunks; stored token count minus encoding the "
+        f"chunk alone: exact {np.mean(errors == 0):.1%}, "
+        f"min {errors.min()}, max {errors.max()}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repo", help="Benchmark this repo instead")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument(
+        "--mix",
+        nargs="+",
+        default=[f"{ext}={weight}" for ext, weight in DEFAULT_MIX.items()],
+        help="ext=weight pairs for the synthetic repo",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--chunk-tokens", type=int, default=500)
+    parser.add_argument("--max-tokens", type=int, default=3000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.repo:
+            root = Path(args.repo)
+        else:
+            root = Path(tmp_dir) / "repo"
+            generate_repo(
+                root, args.files, mix=parse_mix(args.mix), seed=args.seed
+            )
+        run(root, args)
+
+
+if __name__ == "__main__":
+    main()
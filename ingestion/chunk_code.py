@@ -1,21 +1,37 @@
 import ast
 import hashlib
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Set
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 
 from git import InvalidGitRepositoryError, Repo
-from langchain.text_splitter import TokenTextSplitter
 
+from ingestion.ingestion_util import bounded_ordered_map
+from ingestion.symbol_index import Symbol, extract_python_symbols
+from ingestion.syntax_chunker import SyntaxChunker
 from utils.constants import (
     KEY_CHUNK_INDEX,
     KEY_CODE_LANGUAGE,
     KEY_COMMIT_HASH,
     KEY_CONTENT,
+    KEY_END_LINE,
+    KEY_ID,
     KEY_META,
     KEY_RELATIVE_PATH,
     KEY_REPO_URL,
+    KEY_START_LINE,
+    KEY_TOKEN_COUNT,
 )
 
 logger = logging.getLogger(__name__)
@@ -34,109 +50,218 @@ DEFAULT_CHUNK_TOKENS = 500
 DEFAULT_CHUNK_OVERLAP = 50
 # Encoding for tiktoken (OpenAI embeddings)
 DEFAULT_ENCODING = "cl100k_base"
+EXECUTOR_THREAD = "thread"
+EXECUTOR_PROCESS = "process"
+DEFAULT_THREAD_WORKERS = 4
+DEFAULT_FILES_PER_BATCH = 16
+# Batches submitted ahead of the consumer per worker (bounds memory)
+MAX_BATCHES_IN_FLIGHT_PER_WORKER = 2
 
 
-def _extract_python_blocks(text: str) -> List[str]:
-    """Return a list of top-level function/class source segments, or the whole text if none."""
+def _parse_python(text: str) -> Optional[ast.Module]:
     try:
-        tree = ast.parse(text)
-        blocks = [
-            ast.get_source_segment(text, node)
-            for node in tree.body
-            if isinstance(
-                node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
-            )
-            and ast.get_source_segment(text, node)
-        ]
-        return blocks or [text]
+        return ast.parse(text)
     except Exception:
-        return [text]
+        return None
+
+
+def _is_candidate_file(
+    relative_path: Path, extensions: Set[str], ignored_dirs: Set[str]
+) -> bool:
+    """True if a repo-relative path should be chunked."""
+    return relative_path.suffix in extensions and not any(
+        part in ignored_dirs for part in relative_path.parts
+    )
+
+
+def _discover_files(
+    root: Path,
+    extensions: Set[str],
+    ignored_dirs: Set[str],
+    paths: Optional[Iterable[str]] = None,
+) -> List[Path]:
+    """Files to chunk under `root` (or among `paths`), in sorted order."""
+    if paths is None:
+        return sorted(
+            p
+            for p in root.rglob("*")
+            if p.is_file()
+            and _is_candidate_file(
+                p.relative_to(root), extensions, ignored_dirs
+            )
+        )
+    return [
+        root / p
+        for p in sorted(paths)
+        if _is_candidate_file(Path(p), extensions, ignored_dirs)
+        and (root / p).is_file()
+    ]
 
 
 def _chunk_file(
     path: Path,
     repo_root: Path,
-    splitter: TokenTextSplitter,
-    seen_hashes: Set[str],
+    chunker: SyntaxChunker,
     repo_url: Optional[str],
     commit_hash: Optional[str],
-) -> List[Dict]:
-    """Read a file, split into semantically‑aware text segments, then tokens‑split & dedupe."""
+    collect_symbols: bool = False,
+) -> Tuple[List[Dict], Optional[List[Symbol]]]:
+    """
+    Read a file and split it into chunks on syntax boundaries (see
+    `SyntaxChunker`), each with its line span and token count.
+
+    Returns:
+        The chunk docs, and (Python files, with `collect_symbols`) the
+        file's symbols from the same AST pass; None otherwise.
+    """
     lang = path.suffix.lstrip(".")
+    relative_path = str(path.relative_to(repo_root))
+    symbols = [] if collect_symbols and lang == "py" else None
     try:
         text = path.read_text(encoding="utf-8", errors="ignore")
     except Exception as e:
         logger.error("Failed to read %s: %s", path, e)
-        return []
+        return [], symbols
 
     if not text.strip():
         logger.debug("Skipping empty file %s", path)
-        return []
+        return [], symbols
 
-    # Language‑aware pre‑splitting
-    segments = _extract_python_blocks(text) if lang == "py" else [text]
+    tree = None
+    if lang == "py":
+        tree = _parse_python(text)
+        if symbols is not None and tree is not None:
+            symbols = extract_python_symbols(tree, relative_path)
 
     docs: List[Dict] = []
-    for seg in segments:
-        # Token‑aware splitting with overlap
-        chunks = splitter.split_text(seg)
-        for idx, chunk in enumerate(chunks):
-            # Deduplication by SHA‑256
-            h = hashlib.sha256(chunk.encode("utf-8")).hexdigest()
-            if h in seen_hashes:
-                continue
-            seen_hashes.add(h)
-
-            docs.append(
-                {
-                    KEY_CONTENT: chunk,
-                    KEY_META: {
-                        KEY_RELATIVE_PATH: str(path.relative_to(repo_root)),
-                        KEY_CHUNK_INDEX: idx,
-                        KEY_CODE_LANGUAGE: lang,
-                        **({KEY_REPO_URL: repo_url} if repo_url else {}),
-                        **(
-                            {KEY_COMMIT_HASH: commit_hash}
-                            if commit_hash
-                            else {}
-                        ),
-                    },
-                }
-            )
+    for idx, chunk in enumerate(chunker.chunk(text, lang, tree)):
+        docs.append(
+            {
+                # Stable ID / dedup key = SHA‑256 of the chunk text
+                KEY_ID: hashlib.sha256(chunk.text.encode("utf-8")).hexdigest(),
+                KEY_CONTENT: chunk.text,
+                KEY_META: {
+                    KEY_RELATIVE_PATH: relative_path,
+                    KEY_CHUNK_INDEX: idx,
+                    KEY_START_LINE: chunk.start_line,
+                    KEY_END_LINE: chunk.end_line,
+                    KEY_TOKEN_COUNT: chunk.tokens,
+                    KEY_CODE_LANGUAGE: lang,
+                    **({KEY_REPO_URL: repo_url} if repo_url else {}),
+                    **({KEY_COMMIT_HASH: commit_hash} if commit_hash else {}),
+                },
+            }
+        )
 
     logger.debug("Chunked %s into %d pieces", path, len(docs))
-    return docs
+    return docs, symbols
+
+
+# One chunker (tiktoken encoder, parsers) per worker process, built by
+# `_init_worker`; thread pools pass theirs to `_chunk_file_batch` instead
+_WORKER_CHUNKER: Optional[SyntaxChunker] = None
+
+
+def _init_worker(chunk_tokens: int, chunk_overlap: int) -> None:
+    global _WORKER_CHUNKER
+    _WORKER_CHUNKER = SyntaxChunker(
+        chunk_tokens, chunk_overlap, DEFAULT_ENCODING
+    )
 
 
-def chunk_repository(
+def _chunk_file_batch(
+    paths: List[Path],
+    repo_root: Path,
+    repo_url: Optional[str],
+    commit_hash: Optional[str],
+    collect_symbols: bool,
+    chunker: Optional[SyntaxChunker] = None,
+) -> Tuple[List[Dict], List[Tuple[str, List[Symbol]]]]:
+    """
+    Chunk a batch of files with `chunker`, or this worker process's.
+
+    Returns:
+        The batch's chunk docs, and `(relative path, symbols)` for each
+        Python file when `collect_symbols` is set.
+    """
+    docs: List[Dict] = []
+    file_symbols = []
+    for path in paths:
+        try:
+            file_docs, symbols = _chunk_file(
+                path,
+                repo_root,
+                chunker or _WORKER_CHUNKER,
+                repo_url,
+                commit_hash,
+                collect_symbols,
+            )
+        except Exception as e:
+            logger.error("Error chunking %s: %s", path, e, exc_info=True)
+            continue
+        docs.extend(file_docs)
+        if symbols is not None:
+            file_symbols.append((str(path.relative_to(repo_root)), symbols))
+    return docs, file_symbols
+
+
+def iter_repository_chunks(
     repo_path: str,
     *,
     extensions: Optional[List[str]] = None,
     ignored_dirs: Optional[List[str]] = None,
     chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
     chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
-    max_workers: int = 4,
-) -> List[Dict]:
+    max_workers: Optional[int] = None,
+    paths: Optional[Iterable[str]] = None,
+    executor: str = EXECUTOR_THREAD,
+    files_per_batch: int = DEFAULT_FILES_PER_BATCH,
+    on_symbols: Optional[Callable[[str, List[Symbol]], None]] = None,
+    dedup: bool = True,
+) -> Iterator[Dict]:
     """
-    Walk a Git repo, split code/docs into token‑aware chunks, and return docs for vector DB.
+    Walk a Git repo and lazily yield token‑aware chunks for the vector DB.
+
+    Files are chunked by a worker pool a bounded number of batches ahead
+    of the consumer, so memory stays flat regardless of repo size and the
+    caller can embed early chunks while later files are still being read.
 
     Args:
         repo_path:      Path to local repo.
         extensions:     File extensions to include (default common code + markdown).
         ignored_dirs:   Directory names to skip (default .git, node_modules, etc.).
         chunk_tokens:   Approximate max tokens per chunk.
-        chunk_overlap:  Token overlap between chunks.
-        max_workers:    Threads for parallel file processing.
+        chunk_overlap:  Token overlap between the pieces of a single line
+                        too long for one chunk; chunks on syntax
+                        boundaries do not overlap.
+        max_workers:    Workers for parallel file processing (default 4
+                        threads, or one process per core).
+        paths:          Optional repo-relative paths to restrict chunking to
+                        (incremental ingestion); missing files are skipped.
+        executor:       "thread" or "process". Chunking is CPU-bound
+                        (ast + tiktoken), so "process" scales with cores.
+        files_per_batch: Files sent to a worker per task, to keep IPC low.
+        on_symbols:     Optional callback receiving `(relative path,
+                        symbols)` for every Python file, extracted from
+                        the AST the chunker parses anyway (see
+                        `ingestion.symbol_index`).
+        dedup:          Drop chunks whose content hash was already
+                        yielded (the first occurrence in file order wins).
+                        Ingestion turns this off so `embed_documents`
+                        records every file a shared chunk appears in.
 
-    Returns:
-        List of {"content": str, "meta": {...}} ready for ingestion.
+    Yields:
+        {"id": str, "content": str, "meta": {...}} dicts, in file order.
 
     Raises:
         RuntimeError if `repo_path` isn’t a directory.
+        ValueError if `executor` is unknown.
     """
     root = Path(repo_path)
     if not root.is_dir():
         raise RuntimeError(f"Invalid repository path: {repo_path}")
+    if executor not in (EXECUTOR_THREAD, EXECUTOR_PROCESS):
+        raise ValueError(f"Unknown chunking executor: {executor}")
 
     extensions = set(extensions or DEFAULT_EXTENSIONS)
     ignored_dirs = set(ignored_dirs or DEFAULT_IGNORED_DIRS)
@@ -153,49 +278,78 @@ def chunk_repository(
             "%s is not a Git repo; skipping repo metadata", repo_path
         )
 
-    # Prepare a token‑based splitter (uses tiktoken under the hood)
-    splitter = TokenTextSplitter(
-        encoding_name=DEFAULT_ENCODING,
-        chunk_size=chunk_tokens,
-        chunk_overlap=chunk_overlap,
-    )
+    all_files = _discover_files(root, extensions, ignored_dirs, paths)
+    logger.info("Found %d files to chunk in %s", len(all_files), repo_path)
 
-    # Gather all files to process
-    all_files = [
-        p
-        for p in root.rglob("*")
-        if p.is_file()
-        and p.suffix in extensions
-        and not any(part in ignored_dirs for part in p.parts)
+    batches = [
+        all_files[i : i + files_per_batch]
+        for i in range(0, len(all_files), files_per_batch)
     ]
-    logger.info("Found %d files to chunk in %s", len(all_files), repo_path)
+    if not batches:
+        # Don't start (or fork) a pool for nothing, e.g. an incremental
+        # run that touched no candidate files
+        return
+    if executor == EXECUTOR_PROCESS:
+        pool_cls = ProcessPoolExecutor
+        max_workers = max_workers or os.cpu_count() or 1
+        pool_kwargs = {
+            "initializer": _init_worker,
+            "initargs": (chunk_tokens, chunk_overlap),
+        }
+        chunker = None
+    else:
+        pool_cls = ThreadPoolExecutor
+        max_workers = max_workers or DEFAULT_THREAD_WORKERS
+        pool_kwargs = {}
+        # Threads share this call's chunker; the module global would be
+        # shared with concurrent calls using other chunk sizes
+        chunker = SyntaxChunker(chunk_tokens, chunk_overlap, DEFAULT_ENCODING)
+    max_workers = min(max_workers, len(batches))
 
-    docs: List[Dict] = []
+    # Parallelize file chunking. Results come back in file order, so the
+    # dedup below deterministically keeps the first copy of a chunk.
     seen_hashes: Set[str] = set()
+    n_docs = 0
+    with pool_cls(max_workers=max_workers, **pool_kwargs) as pool:
+        for batch_docs, file_symbols in bounded_ordered_map(
+            pool,
+            _chunk_file_batch,
+            batches,
+            max_workers * MAX_BATCHES_IN_FLIGHT_PER_WORKER,
+            root,
+            repo_url,
+            commit_hash,
+            on_symbols is not None,
+            chunker,
+        ):
+            for relative_path, symbols in file_symbols:
+                on_symbols(relative_path, symbols)
+            for doc in batch_docs:
+                if dedup:
+                    if doc[KEY_ID] in seen_hashes:
+                        continue
+                    seen_hashes.add(doc[KEY_ID])
+                n_docs += 1
+                yield doc
+
+    logger.info(
+        "Generated %d chunks from %d files with %d %s workers",
+        n_docs,
+        len(all_files),
+        max_workers,
+        executor,
+    )
 
-    # Parallelize file chunking
-    with ThreadPoolExecutor(max_workers=max_workers) as pool:
-        futures = {
-            pool.submit(
-                _chunk_file,
-                path,
-                root,
-                splitter,
-                seen_hashes,
-                repo_url,
-                commit_hash,
-            ): path
-            for path in all_files
-        }
 
-        for future in as_completed(futures):
-            file_path = futures[future]
-            try:
-                docs.extend(future.result())
-            except Exception as e:
-                logger.error(
-                    "Error chunking %s: %s", file_path, e, exc_info=True
-                )
-
-    logger.info("Generated %d chunks from %d files", len(docs), len(all_files))
-    return docs
+def chunk_repository(repo_path: str, **kwargs) -> List[Dict]:
+    """
+    Walk a Git repo, split code/docs into token‑aware chunks, and return docs for vector DB.
+
+    Eager wrapper around `iter_repository_chunks`, which documents the
+    keyword arguments. Prefer the generator for large repos.
+
+    Returns:
+        List of {"id": str, "content": str, "meta": {...}} ready for
+        ingestion, deduplicated by content hash.
+    """
+    return list(iter_repository_chunks(repo_path, **kwargs))
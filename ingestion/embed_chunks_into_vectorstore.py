@@ -1,125 +1,329 @@
 import hashlib
 import logging
-from typing import Dict, List
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
-from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
 
+from ingestion.embedding_cache import (
+    CachedEmbeddings,
+    get_ingestion_embedding_model,
+)
+from ingestion.embedding_pipeline import (
+    DEFAULT_EMBEDDING_CONCURRENCY,
+    ConcurrentEmbedder,
+)
 from ingestion.ingestion_util import (
+    get_chunk_manifest_path,
+    get_lexical_index_path,
     get_persist_dir_and_collection_name_from_config,
 )
-from langgraph_flow.models.openai_model import OpenAIModel
-from utils.constants import KEY_CONTENT, KEY_META
+from ingestion.lexical_index import LexicalIndex
+from ingestion.manifest import ChunkManifest
+from ingestion.vectorstore_backends import (
+    VectorStoreBackend,
+    open_vectorstore_backend,
+)
+from utils.constants import (
+    KEY_CONTENT,
+    KEY_EMBEDDING_CONCURRENCY,
+    KEY_ID,
+    KEY_INGESTION,
+    KEY_META,
+    KEY_RELATIVE_PATH,
+)
 
 logger = logging.getLogger(__name__)
 
+_DELETE_BATCH_SIZE = 500
+
+
+def _batched(docs: Iterable[Dict], batch_size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _delete_ids(
+    store: VectorStoreBackend, lexical: LexicalIndex, ids: List[str]
+) -> None:
+    """Delete chunks the manifest no longer lists for any path."""
+    for i in range(0, len(ids), _DELETE_BATCH_SIZE):
+        store.delete(ids[i : i + _DELETE_BATCH_SIZE])
+    lexical.delete(ids)
+
+
+def _update_metadata(
+    store: VectorStoreBackend,
+    lexical: LexicalIndex,
+    updates: List[Tuple[str, Dict]],
+) -> None:
+    """Write the metadata of chunks that moved or changed file."""
+    for i in range(0, len(updates), _DELETE_BATCH_SIZE):
+        ids, metadatas = zip(*updates[i : i + _DELETE_BATCH_SIZE], strict=True)
+        store.update_metadata(list(ids), list(metadatas))
+        lexical.update_metadata(list(ids), list(metadatas))
+
+
+def _open_manifest(cfg: Dict, store: VectorStoreBackend) -> ChunkManifest:
+    manifest = ChunkManifest(get_chunk_manifest_path(cfg))
+    if not manifest.is_initialized:
+        logger.info("No chunk manifest yet; building it from the store")
+        manifest.bootstrap_from_store(store)
+    return manifest
+
+
+def _doc_id(doc: Dict) -> str:
+    # stable ID = SHA256 of the chunk text (precomputed by the chunker)
+    return (
+        doc.get(KEY_ID)
+        or hashlib.sha256(doc[KEY_CONTENT].encode("utf-8")).hexdigest()
+    )
+
+
+def _write_to_store(
+    store: VectorStoreBackend,
+    manifest: ChunkManifest,
+    lexical: LexicalIndex,
+    embedder: ConcurrentEmbedder,
+    docs: Iterable[Dict],
+    *,
+    reset_index: bool,
+    batch_size: int,
+    stale_paths: Optional[Set[str]],
+) -> int:
+    """Stream `docs` into `store` batch by batch; returns the chunk count."""
+    full_sync = stale_paths is None and not reset_index
+    if reset_index:
+        logger.info("Rebuilding vectorstore index from scratch")
+        store.reset()
+        lexical.reset()
+        manifest.clear()
+    elif full_sync:
+        manifest.begin_sync()
+    else:
+        # Targeted delete of the changed files only; a chunk another file
+        # still has stays in the store
+        stale_ids = manifest.remove_paths(stale_paths)
+        logger.info(
+            "Deleting %d chunks of %d changed/removed files",
+            len(stale_ids),
+            len(stale_paths),
+        )
+        _delete_ids(store, lexical, stale_ids)
+
+    n_docs = 0
+    # Paths and metadata of chunks queued for embedding, recorded once
+    # they are stored; the first is what the store holds
+    queued: Dict[str, List[Tuple[str, Dict]]] = {}
+    # A file's chunks arrive together; a chunk repeated within one file
+    # keeps the span of its first copy
+    file_path, file_ids = None, set()
+
+    def _new_chunk_batches() -> Iterator[Tuple]:
+        nonlocal n_docs, file_path, file_ids
+        for batch in _batched(docs, batch_size):
+            ids = [_doc_id(d) for d in batch]
+            n_docs += len(batch)
+            chunks = []
+            for d, id_ in zip(batch, ids, strict=True):
+                path = d[KEY_META][KEY_RELATIVE_PATH]
+                if path != file_path:
+                    file_path, file_ids = path, set()
+                if id_ not in file_ids:
+                    file_ids.add(id_)
+                    chunks.append((d, id_, path))
+            if full_sync:
+                manifest.mark_seen((id_, path) for _, id_, path in chunks)
+
+            # Filter for only new ID's; a chunk repeated in several files
+            # is embedded once and recorded for each of them. Stored
+            # chunks whose code moved get their new line span.
+            known_ids = manifest.existing(ids)
+            moved = manifest.update(
+                (id_, path, d[KEY_META])
+                for d, id_, path in chunks
+                if id_ in known_ids
+            )
+            if moved:
+                _update_metadata(store, lexical, moved)
+            to_add = []
+            for d, id_, path in chunks:
+                if id_ in known_ids:
+                    continue
+                if id_ in queued:
+                    queued[id_].append((path, d[KEY_META]))
+                    continue
+                queued[id_] = [(path, d[KEY_META])]
+                to_add.append((d, id_))
 
-def _filter_new_ids_only(texts, metadatas, ids, existing_ids):
-    to_add_texts = []
-    to_add_meta = []
-    to_add_ids = []
-    for text, meta, id_ in zip(texts, metadatas, ids):
-        if id_ not in existing_ids:
-            to_add_texts.append(text)
-            to_add_meta.append(meta)
-            to_add_ids.append(id_)
-    return to_add_texts, to_add_meta, to_add_ids
+            # Backfill stored chunks the lexical index doesn't have yet
+            # (stores ingested before it existed); no embedding needed.
+            if known_ids:
+                lexical.add(
+                    (id_, d[KEY_CONTENT], d[KEY_META])
+                    for d, id_ in zip(batch, ids, strict=True)
+                    if id_ in known_ids
+                )
+            if to_add:
+                yield (
+                    [d[KEY_CONTENT] for d, _ in to_add],
+                    [id_ for _, id_ in to_add],
+                    [d[KEY_META] for d, _ in to_add],
+                )
 
+    # Embedding requests run concurrently; upserts stay in input order
+    n_added = 0
+    for (texts, ids, metadatas), vectors in embedder.embed_batches(
+        _new_chunk_batches()
+    ):
+        store.upsert(ids, vectors, texts, metadatas)
+        lexical.add(zip(ids, texts, metadatas, strict=True))
+        files = [queued.pop(id_) for id_ in ids]
+        manifest.record(
+            (
+                (id_, *chunk_files[0])
+                for id_, chunk_files in zip(ids, files, strict=True)
+            ),
+            stored=True,
+        )
+        manifest.record(
+            (id_, *chunk_file)
+            for id_, chunk_files in zip(ids, files, strict=True)
+            for chunk_file in chunk_files[1:]
+        )
+        logger.info("Upserted new chunks %d–%d", n_added, n_added + len(ids))
+        n_added += len(ids)
 
-def _delete_stale_ids(store, ids):
-    existing = store.get()
-    existing_ids = set(existing["ids"])
-    new_ids_set = set(ids)
-    stale_ids = existing_ids - new_ids_set
-    if stale_ids:
-        logger.info("Deleting %d stale chunks", len(stale_ids))
-        store.delete(ids=list(stale_ids))
-    return existing_ids
+    if not n_added:
+        logger.info("No new chunks to add; skipping upsert.")
+
+    # Full sync: any file/chunk pair that wasn't produced this run is
+    # stale, and chunks left with no file are deleted. Deleting last keeps
+    # the old chunks searchable meanwhile.
+    if full_sync and n_docs:
+        stale_ids = manifest.remove_unseen()
+        if stale_ids:
+            logger.info("Deleting %d stale chunks", len(stale_ids))
+            _delete_ids(store, lexical, stale_ids)
+
+    # Chunks still in other files than the one their metadata names
+    repointed = manifest.repoint_stored()
+    if repointed:
+        logger.info("Re-pointing %d chunks to another file", len(repointed))
+        _update_metadata(store, lexical, repointed)
+    return n_docs
 
 
 def embed_documents(
-    docs: List[Dict],
+    docs: Iterable[Dict],
     cfg: Dict,
     *,
     reset_index: bool = False,
     batch_size: int = 256,
+    stale_paths: Optional[Iterable[str]] = None,
+    embeddings: Optional[Embeddings] = None,
 ) -> None:
     """
-    Embed and persist documents into a Chroma collection, with:
+    Embed and persist documents into the configured vectorstore backend
+    (`[vectorstore] type`, Chroma by default), with:
       - stale‐ID deletion
       - upsert of only new IDs
       - stable chunk IDs via content hashing
+      - in-place metadata updates for stored chunks whose code moved
+
+    Which IDs are stored, and for which files, is tracked in a sidecar
+    `ChunkManifest` next to the store, so neither step reads documents
+    back out of the store. A chunk repeated in several files (license
+    headers, copied code) is stored once and deleted only when no file
+    has it any more; pass every file's copy (`iter_repository_chunks`
+    with `dedup=False`) so the manifest knows them all. A BM25
+    `LexicalIndex` over the same chunks is kept in step for hybrid
+    retrieval.
+
+    `docs` may be a generator (see `iter_repository_chunks`): it is
+    consumed in bounded batches that are embedded by up to
+    `[ingestion] embedding_concurrency` concurrent requests and upserted in
+    order, so memory stays flat and early chunks are searchable before the
+    run finishes.
 
     Args:
-        docs: List of {"content": str, "meta": dict} items.
+        docs: Iterable of {"id": str, "content": str, "meta": dict} items;
+            "id" is optional and defaults to the SHA-256 of the content.
         cfg:  Your settings.toml dict.
         reset_index: If True, drop and rebuild the index from scratch.
         batch_size: Chunk count per embedding/API call.
+        stale_paths: Incremental mode. Relative paths whose stored chunks
+            are outdated (modified, renamed or deleted files); only their
+            chunks are deleted and `docs` is treated as a partial update
+            instead of the full content of the repo.
+        embeddings: Embedding model override (e.g. a stub for benchmarks),
+            used without the embedding cache; defaults to the configured
+            OpenAI model.
     """
-    if not docs:
-        logger.warning("No documents to embed; skipping.")
-        return
+    if stale_paths is not None:
+        if reset_index:
+            raise ValueError("reset_index can't be combined with stale_paths")
+        stale_paths = set(stale_paths)
 
     persist_dir, collection_name = (
         get_persist_dir_and_collection_name_from_config(cfg)
     )
     persist_dir.mkdir(parents=True, exist_ok=True)
 
-    # Prepare data
-    embeddings = OpenAIModel(cfg).embedding_model
-    texts = [d[KEY_CONTENT] for d in docs]
-    metadatas = [d[KEY_META] for d in docs]
-
-    # stable ID = SHA256 of the chunk text
-    ids = [hashlib.sha256(text.encode("utf-8")).hexdigest() for text in texts]
-
-    logger.info("Embedding %d chunks into Chroma", len(texts))
-
-    # Full rebuild
-    if reset_index:
-        logger.info("Rebuilding Chroma index from scratch")
-        store = Chroma.from_texts(
-            texts=texts,
-            embedding=embeddings,
-            metadatas=metadatas,
-            ids=ids,
-            persist_directory=str(persist_dir),
-            collection_name=collection_name,
-        )
-
-    # Incremental upsert
-    else:
-        logger.info("Loading existing Chroma index (or creating new)")
-        store = Chroma(
-            persist_directory=str(persist_dir),
-            embedding_function=embeddings,
-            collection_name=collection_name,
-        )
-
-        # Delete Stale ID's
-        existing_ids = _delete_stale_ids(store, ids)
+    embeddings = get_ingestion_embedding_model(cfg, embeddings)
+    embedder = ConcurrentEmbedder(
+        embeddings,
+        cfg.get(KEY_INGESTION, {}).get(
+            KEY_EMBEDDING_CONCURRENCY, DEFAULT_EMBEDDING_CONCURRENCY
+        ),
+    )
+    store = open_vectorstore_backend(cfg, embeddings)
 
-        # Filter for only new ID's
-        to_add_texts, to_add_meta, to_add_ids = _filter_new_ids_only(
-            texts, metadatas, ids, existing_ids
+    manifest = _open_manifest(cfg, store)
+    lexical = LexicalIndex(get_lexical_index_path(cfg))
+    start = time.perf_counter()
+    try:
+        n_docs = _write_to_store(
+            store,
+            manifest,
+            lexical,
+            embedder,
+            docs,
+            reset_index=reset_index,
+            batch_size=batch_size,
+            stale_paths=stale_paths,
         )
+        store.persist()
+    finally:
+        manifest.close()
+        lexical.close()
+        store.close()
+        if isinstance(embeddings, CachedEmbeddings):
+            embeddings.log_stats()
+            embeddings.close()
 
-        if not to_add_ids:
-            logger.info("No new chunks to add; skipping upsert.")
-            return
-
-            # Batch‑upsert only new chunks
-        else:
-            for i in range(0, len(to_add_texts), batch_size):
-                batch_texts = to_add_texts[i : i + batch_size]
-                batch_meta = to_add_meta[i : i + batch_size]
-                batch_ids = to_add_ids[i : i + batch_size]
-                store.add_texts(
-                    texts=batch_texts,
-                    metadatas=batch_meta,
-                    ids=batch_ids,
-                )
-                logger.info(
-                    "Upserted new chunks %d–%d", i, i + len(batch_texts)
-                )
+    elapsed = time.perf_counter() - start
+    logger.info(
+        "Embedded %d chunks in %.1fs (%.1f chunks/s, %d retries, "
+        "final concurrency %d)",
+        embedder.embedded,
+        elapsed,
+        embedder.embedded / elapsed if elapsed else 0.0,
+        embedder.retries,
+        embedder.concurrency,
+    )
 
-    logger.info("Chroma index updated successfully at %s", persist_dir)
+    if not n_docs and not stale_paths:
+        logger.warning("No documents to embed; skipping.")
+        return
+    logger.info(
+        "Vectorstore with %d chunks updated successfully at %s",
+        n_docs,
+        persist_dir,
+    )
@@ -0,0 +1,384 @@
+"""Persistent, content-addressed cache in front of the embedding model."""
+
+import hashlib
+import logging
+import sqlite3
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from langgraph_flow.models.openai_model import OpenAIModel
+from utils.constants import (
+    DEFAULT_EMBEDDING_CACHE_MAX_MB,
+    FILE_EMBEDDING_CACHE,
+    KEY_BASE_DIRECTORY,
+    KEY_EMBEDDING_CACHE,
+    KEY_EMBEDDING_MODEL,
+    KEY_ENABLED,
+    KEY_MAX_SIZE_MB,
+    KEY_OPENAI,
+    KEY_PATH,
+    KEY_QUERY_CACHE_SIZE,
+    KEY_RETRIEVAL,
+    KEY_VECTORSTORE,
+    MODEL_EMBEDDING_OPEN_AI,
+    VALUES_UTF_8,
+)
+from utils.resource_pool import ResourcePool
+
+logger = logging.getLogger(__name__)
+
+# Fraction of `max_bytes` to shrink to once the limit is exceeded, so that
+# eviction doesn't run again on the very next insert.
+_EVICT_TARGET_RATIO = 0.9
+# Query vectors kept in memory per embedding model
+DEFAULT_QUERY_CACHE_SIZE = 1024
+# Query vectors are stored apart from chunk vectors of the same text
+_QUERY_MODEL_SUFFIX = ":query"
+
+# Query embedding wrappers kept per process, one per (disk cache, model).
+# Not closed on eviction: stores opened with one may still embed through
+# it, and its SQLite connection closes once the last of them lets go.
+_MAX_QUERY_MODELS = 32
+_QUERY_EMBEDDINGS = ResourcePool("query embedding model", _MAX_QUERY_MODELS)
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode(VALUES_UTF_8)).hexdigest()
+
+
+def normalize_query(text: str) -> str:
+    """Query cache key text: surrounding and repeated whitespace removed."""
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """
+    SQLite store of float32 vectors keyed by (model name, sha256 of text).
+
+    Entries are evicted least-recently-used first once the total vector
+    payload grows beyond `max_bytes`, counted over every connection to
+    the file. Safe to share between threads.
+    """
+
+    def __init__(self, path: Path, max_bytes: int):
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self._lock = Lock()
+        self._conn = sqlite3.connect(str(self._path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Total vector payload, kept by triggers in the same transaction as
+        # every write, so all connections to the file (threads, processes)
+        # see the real size
+        self._conn.executescript(
+            """
+            BEGIN IMMEDIATE;
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            );
+            CREATE INDEX IF NOT EXISTS idx_embeddings_last_used
+                ON embeddings (last_used);
+            CREATE TABLE IF NOT EXISTS cache_size (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                total_bytes INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO cache_size
+                SELECT 0, COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings;
+            CREATE TRIGGER IF NOT EXISTS embeddings_insert
+            AFTER INSERT ON embeddings BEGIN
+                UPDATE cache_size
+                SET total_bytes = total_bytes + LENGTH(NEW.vector);
+            END;
+            CREATE TRIGGER IF NOT EXISTS embeddings_update
+            AFTER UPDATE OF vector ON embeddings BEGIN
+                UPDATE cache_size SET total_bytes =
+                    total_bytes + LENGTH(NEW.vector) - LENGTH(OLD.vector);
+            END;
+            CREATE TRIGGER IF NOT EXISTS embeddings_delete
+            AFTER DELETE ON embeddings BEGIN
+                UPDATE cache_size
+                SET total_bytes = total_bytes - LENGTH(OLD.vector);
+            END;
+            COMMIT;
+            """
+        )
+
+    def _total_bytes(self) -> int:
+        (total,) = self._conn.execute(
+            "SELECT total_bytes FROM cache_size"
+        ).fetchone()
+        return total
+
+    def get_many(self, model: str, text_hashes: List[str]) -> Dict:
+        """Return {text_hash: vector} for the hashes present in the cache."""
+        found = {}
+        now = time.time()
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(text_hashes), 500):
+                batch = text_hashes[i : i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[text_hash] = vector.tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? "
+                    "WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, List[float]]) -> None:
+        """Store {text_hash: vector} and evict old entries if over budget."""
+        now = time.time()
+        rows = [
+            (model, text_hash, array("f", vector).tobytes(), now)
+            for text_hash, vector in vectors.items()
+        ]
+        with self._lock:
+            # An upsert, not INSERT OR REPLACE: a replaced row must fire
+            # the update trigger that keeps `cache_size` right
+            self._conn.executemany(
+                "INSERT INTO embeddings "
+                "(model, text_hash, vector, last_used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (model, text_hash) DO UPDATE "
+                "SET vector = excluded.vector, last_used = excluded.last_used",
+                rows,
+            )
+            total_bytes = self._total_bytes()
+            if total_bytes > self._max_bytes:
+                self._evict(total_bytes)
+            self._conn.commit()
+
+    def _evict(self, total_bytes: int) -> None:
+        to_free = total_bytes - int(self._max_bytes * _EVICT_TARGET_RATIO)
+        doomed = []
+        freed = 0
+        cursor = self._conn.execute(
+            "SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used"
+        )
+        for rowid, size in cursor:
+            if freed >= to_free:
+                break
+            doomed.append((rowid,))
+            freed += size
+        cursor.close()
+        self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", doomed)
+        logger.info(
+            "Evicted %d cached embeddings (%.1f MB)", len(doomed), freed / 1e6
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that only sends never-seen texts to `embeddings`.
+
+    Documents are looked up in `cache` by content hash. Queries are
+    keyed by (model, normalized text): up to `query_cache_size` are kept
+    in memory, least recently used first out, in front of `cache`.
+
+    Keeps hit/miss counters so callers can report cache effectiveness.
+    Safe to call from several embedding threads at once.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: Optional[EmbeddingCache],
+        model_name: str,
+        query_cache_size: int = 0,
+    ):
+        self._embeddings = embeddings
+        self._cache = cache
+        self._model_name = model_name
+        self._query_model_name = model_name + _QUERY_MODEL_SUFFIX
+        self._query_cache_size = query_cache_size
+        self._queries: OrderedDict = OrderedDict()
+        self._stats_lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self._cache is None:
+            return self._embeddings.embed_documents(texts)
+        hashes = [_text_hash(text) for text in texts]
+        vectors = self._cache.get_many(self._model_name, hashes)
+
+        # Embed each distinct missing text once
+        missing = {}
+        for text_hash, text in zip(hashes, texts, strict=True):
+            if text_hash not in vectors:
+                missing.setdefault(text_hash, text)
+        with self._stats_lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            new_vectors = self._embeddings.embed_documents(
+                list(missing.values())
+            )
+            fresh = dict(zip(missing.keys(), new_vectors, strict=True))
+            self._cache.put_many(self._model_name, fresh)
+            vectors.update(fresh)
+
+        return [vectors[text_hash] for text_hash in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Vectors for several queries, embedding all uncached ones in a
+        single request (OpenAI embeds queries and documents alike).
+        """
+        keys = [normalize_query(text) for text in texts]
+        vectors = {}
+        with self._stats_lock:
+            for key in keys:
+                if key in self._queries:
+                    self._queries.move_to_end(key)
+                    vectors[key] = self._queries[key]
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+
+        if missing and self._cache is not None:
+            hashes = {_text_hash(key): key for key in missing}
+            found = self._cache.get_many(self._query_model_name, list(hashes))
+            vectors.update((hashes[h], vector) for h, vector in found.items())
+            missing = [key for key in missing if key not in vectors]
+
+        if missing:
+            if len(missing) == 1:
+                fresh = [self._embeddings.embed_query(missing[0])]
+            else:
+                fresh = self._embeddings.embed_documents(missing)
+            fresh = dict(zip(missing, fresh, strict=True))
+            if self._cache is not None:
+                self._cache.put_many(
+                    self._query_model_name,
+                    {_text_hash(key): vector for key, vector in fresh.items()},
+                )
+            vectors.update(fresh)
+
+        with self._stats_lock:
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+            for key in keys:
+                self._queries[key] = vectors[key]
+                self._queries.move_to_end(key)
+            while len(self._queries) > self._query_cache_size:
+                self._queries.popitem(last=False)
+        return [vectors[key] for key in keys]
+
+    def wraps(self, embeddings: Embeddings) -> bool:
+        """True if this wrapper embeds with `embeddings` itself."""
+        return self._embeddings is embeddings
+
+    def log_stats(self) -> None:
+        total = self.hits + self.misses
+        logger.info(
+            "Embedding cache: %d hits, %d misses (%.1f%% hit rate)",
+            self.hits,
+            self.misses,
+            100.0 * self.hits / total if total else 0.0,
+        )
+
+    def close(self) -> None:
+        if self._cache is not None:
+            self._cache.close()
+
+
+def get_ingestion_embedding_model(
+    cfg: Dict, embeddings: Optional[Embeddings] = None
+) -> Embeddings:
+    """
+    Return the embedding model used for ingestion: `embeddings` as is,
+    or the configured OpenAI model wrapped in the on-disk cache unless
+    `[embedding_cache] enabled = false`.
+
+    The cache lives under the vector store's base directory by default so
+    that every ingested repo shares it. Its entries are keyed by the
+    configured model name, so an override is never cached: its vectors
+    would be served to later ingests with the real model.
+    """
+    if embeddings is not None:
+        return embeddings
+    embeddings = OpenAIModel(cfg).embedding_model
+    cache_cfg = cfg.get(KEY_EMBEDDING_CACHE, {})
+    if not cache_cfg.get(KEY_ENABLED, True):
+        return embeddings
+
+    cache_path = cache_cfg.get(KEY_PATH) or (
+        Path(cfg[KEY_VECTORSTORE][KEY_BASE_DIRECTORY]) / FILE_EMBEDDING_CACHE
+    )
+    max_bytes = (
+        cache_cfg.get(KEY_MAX_SIZE_MB, DEFAULT_EMBEDDING_CACHE_MAX_MB) * 1e6
+    )
+    model_name = cfg.get(KEY_OPENAI, {}).get(
+        KEY_EMBEDDING_MODEL, MODEL_EMBEDDING_OPEN_AI
+    )
+    logger.info("Using embedding cache at %s", cache_path)
+    return CachedEmbeddings(
+        embeddings, EmbeddingCache(cache_path, int(max_bytes)), model_name
+    )
+
+
+def get_query_embedding_model(cfg: Dict) -> CachedEmbeddings:
+    """
+    The embedding model for questions, shared by every store and cache of
+    the process that uses the same model: the configured model behind an
+    in-memory LRU of `[retrieval] query_cache_size` query vectors and,
+    unless `[embedding_cache] enabled = false`, the on-disk cache.
+    """
+    embeddings = OpenAIModel(cfg).embedding_model
+    cache_cfg = cfg.get(KEY_EMBEDDING_CACHE, {})
+    use_disk = cache_cfg.get(KEY_ENABLED, True)
+    cache_path = cache_cfg.get(KEY_PATH) or (
+        Path(cfg[KEY_VECTORSTORE][KEY_BASE_DIRECTORY]) / FILE_EMBEDDING_CACHE
+    )
+    model_name = cfg.get(KEY_OPENAI, {}).get(
+        KEY_EMBEDDING_MODEL, MODEL_EMBEDDING_OPEN_AI
+    )
+    key = (str(cache_path) if use_disk else None, model_name)
+
+    def open_wrapper() -> CachedEmbeddings:
+        max_bytes = (
+            cache_cfg.get(KEY_MAX_SIZE_MB, DEFAULT_EMBEDDING_CACHE_MAX_MB) * 1e6
+        )
+        return CachedEmbeddings(
+            embeddings,
+            EmbeddingCache(cache_path, int(max_bytes)) if use_disk else None,
+            model_name,
+            cfg.get(KEY_RETRIEVAL, {}).get(
+                KEY_QUERY_CACHE_SIZE, DEFAULT_QUERY_CACHE_SIZE
+            ),
+        )
+
+    # Rebuilt when the pooled model changed (`OpenAIModel.use_models`, or
+    # evicted and reopened), so no vector of another model is served
+    wrapper = _QUERY_EMBEDDINGS.get(key, open_wrapper)
+    if not wrapper.wraps(embeddings):
+        wrapper = open_wrapper()
+        _QUERY_EMBEDDINGS.put(key, wrapper)
+    return wrapper
@@ -0,0 +1,140 @@
+"""Concurrent embedding stage with rate-limit-aware backpressure."""
+
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition
+from typing import Iterable, Iterator, List, Tuple
+
+import openai
+from langchain_core.embeddings import Embeddings
+
+from ingestion.ingestion_util import bounded_ordered_map
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_BASE_DELAY_S = 1.0
+DEFAULT_MAX_DELAY_S = 60.0
+
+
+def _is_rate_limit_error(exc: Exception) -> bool:
+    return (
+        isinstance(exc, openai.RateLimitError)
+        or getattr(exc, "status_code", None) == 429
+    )
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on in-flight requests: the limit grows by one for every
+    `limit` successful requests and halves on each rate-limit error.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self._max_limit = max_limit
+        self._min_limit = min_limit
+        self._limit = float(max_limit)
+        self._in_flight = 0
+        self._cond = Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, rate_limited: bool = False) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if rate_limited:
+                self._limit = max(self._min_limit, self._limit / 2)
+                logger.warning(
+                    "Rate limited; embedding concurrency down to %d",
+                    int(self._limit),
+                )
+            else:
+                self._limit = min(
+                    self._max_limit, self._limit + 1 / self._limit
+                )
+            self._cond.notify_all()
+
+
+class ConcurrentEmbedder:
+    """
+    Keep up to `max_concurrency` embedding requests in flight while
+    handing results back in submission order.
+
+    Rate-limit errors (HTTP 429) shrink the concurrency limit and are
+    retried with exponential backoff and full jitter; other errors are
+    raised to the caller.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_concurrency: int = DEFAULT_EMBEDDING_CONCURRENCY,
+        *,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = DEFAULT_BASE_DELAY_S,
+        max_delay: float = DEFAULT_MAX_DELAY_S,
+    ):
+        self._embeddings = embeddings
+        self._max_concurrency = max(1, max_concurrency)
+        self._limiter = AdaptiveConcurrencyLimiter(self._max_concurrency)
+        self._max_retries = max_retries
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self.retries = 0
+        self.embedded = 0
+
+    @property
+    def concurrency(self) -> int:
+        return self._limiter.limit
+
+    def _embed_with_retry(
+        self, texts: List[str]
+    ) -> Tuple[List[List[float]], int]:
+        """The vectors of `texts`, and how many retries they took."""
+        for attempt in range(self._max_retries + 1):
+            self._limiter.acquire()
+            try:
+                vectors = self._embeddings.embed_documents(texts)
+            except Exception as e:
+                rate_limited = _is_rate_limit_error(e)
+                self._limiter.release(rate_limited=rate_limited)
+                if not rate_limited or attempt == self._max_retries:
+                    raise
+                cap = min(self._max_delay, self._base_delay * 2**attempt)
+                time.sleep(random.uniform(0, cap))
+                continue
+            self._limiter.release()
+            return vectors, attempt
+
+    def embed_batches(
+        self, batches: Iterable[Tuple]
+    ) -> Iterator[Tuple[Tuple, List[List[float]]]]:
+        """
+        Embed `(texts, *payload)` tuples concurrently.
+
+        Yields:
+            `(batch, vectors)` pairs in the same order as `batches`.
+        """
+
+        def _embed(batch):
+            return batch, *self._embed_with_retry(batch[0])
+
+        with ThreadPoolExecutor(max_workers=self._max_concurrency) as pool:
+            for batch, vectors, retries in bounded_ordered_map(
+                pool, _embed, batches, 2 * self._max_concurrency
+            ):
+                # Counted here, on the consumer's thread, not by workers
+                self.retries += retries
+                self.embedded += len(batch[0])
+                yield batch, vectors
@@ -1,6 +1,7 @@
 import logging
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, Optional, Set, Tuple
 from urllib.parse import urlparse
 
 from git import GitCommandError, InvalidGitRepositoryError, Repo
@@ -10,6 +11,15 @@ from utils.constants import KEY_LOCAL_PATH, KEY_PROJECT_NAME, KEY_REPO, KEY_URL
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class RepoChanges:
+    """Paths (relative to the repo root) touched since a previous commit."""
+
+    head_commit: str
+    changed: Set[str] = field(default_factory=set)
+    deleted: Set[str] = field(default_factory=set)
+
+
 def _get_repo_params_from_config(cfg: Dict) -> Tuple:
     """Unpacks to config to return repo url, path, and name."""
     repo_cfg = cfg.get(KEY_REPO)
@@ -108,3 +118,67 @@ def get_project_name_from_url(repo_url: str) -> str:
         name = name[:-4]
 
     return name
+
+
+def get_head_commit(repo_path) -> Optional[str]:
+    """Return the HEAD commit hash of `repo_path`, or None if not a Git repo."""
+    try:
+        return Repo(repo_path).head.commit.hexsha
+    except (InvalidGitRepositoryError, ValueError):
+        logger.warning("%s has no readable HEAD commit", repo_path)
+        return None
+
+
+def get_changed_paths(repo_path, since_commit: str) -> Optional[RepoChanges]:
+    """
+    Ask Git which files changed between `since_commit` and HEAD.
+
+    Added, modified and renamed-to paths are reported as `changed`;
+    deleted and renamed-from paths are reported as `deleted`.
+
+    Args:
+        repo_path:    Path to the local repo.
+        since_commit: Commit hash of the last ingestion.
+
+    Returns:
+        A RepoChanges instance, or None when the diff can't be computed
+        (e.g. the old commit is gone after a force-push) and the caller
+        should fall back to a full ingestion.
+    """
+    try:
+        repo = Repo(repo_path)
+        head_commit = repo.head.commit.hexsha
+        if head_commit == since_commit:
+            return RepoChanges(head_commit=head_commit)
+        raw = repo.git.diff(
+            "--name-status", "-z", "-M", since_commit, head_commit
+        )
+    except (InvalidGitRepositoryError, GitCommandError, ValueError) as e:
+        logger.warning(
+            "Could not diff %s against %s: %s", repo_path, since_commit, e
+        )
+        return None
+
+    changes = RepoChanges(head_commit=head_commit)
+    # -z output: "<status>\0<path>\0" or "R<score>\0<old>\0<new>\0"
+    tokens = iter(raw.split("\0"))
+    for status in tokens:
+        if not status:
+            continue
+        if status[0] in ("R", "C"):
+            old_path, new_path = next(tokens), next(tokens)
+            if status[0] == "R":
+                changes.deleted.add(old_path)
+            changes.changed.add(new_path)
+        elif status[0] == "D":
+            changes.deleted.add(next(tokens))
+        else:
+            changes.changed.add(next(tokens))
+
+    logger.info(
+        "%d changed and %d deleted paths since %s",
+        len(changes.changed),
+        len(changes.deleted),
+        since_commit,
+    )
+    return changes
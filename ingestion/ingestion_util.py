@@ -1,17 +1,29 @@
 """utils for ingestion flow."""
 
+import json
+import logging
+from collections import deque
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
 
 from utils.constants import (
+    FILE_CHUNK_MANIFEST,
+    FILE_INGEST_STATE,
+    FILE_LEXICAL_INDEX,
+    FILE_SUMMARY_INDEX,
+    FILE_SYMBOL_INDEX,
     KEY_BASE_DIRECTORY,
     KEY_COLLECTION,
+    KEY_LAST_COMMIT,
     KEY_PROJECT_NAME,
     KEY_REPO,
     KEY_SUBPATH,
     KEY_VECTORSTORE,
+    VALUES_UTF_8,
 )
 
+logger = logging.getLogger(__name__)
+
 
 def get_persist_dir_and_collection_name_from_config(cfg: Dict) -> Tuple:
     repo_name = cfg[KEY_REPO][KEY_PROJECT_NAME]
@@ -21,3 +33,75 @@ def get_persist_dir_and_collection_name_from_config(cfg: Dict) -> Tuple:
         Path(store_cfg[KEY_BASE_DIRECTORY]) / repo_name / store_cfg[KEY_SUBPATH]
     )
     return persist_dir, collection_name
+
+
+def get_ingest_state_path(cfg: Dict) -> Path:
+    """Path of the JSON file recording what the last ingestion covered."""
+    persist_dir, _ = get_persist_dir_and_collection_name_from_config(cfg)
+    return persist_dir / FILE_INGEST_STATE
+
+
+def get_chunk_manifest_path(cfg: Dict) -> Path:
+    """Path of the SQLite manifest of chunk IDs per file."""
+    persist_dir, _ = get_persist_dir_and_collection_name_from_config(cfg)
+    return persist_dir / FILE_CHUNK_MANIFEST
+
+
+def get_lexical_index_path(cfg: Dict) -> Path:
+    """Path of the SQLite BM25 index over chunk tokens."""
+    persist_dir, _ = get_persist_dir_and_collection_name_from_config(cfg)
+    return persist_dir / FILE_LEXICAL_INDEX
+
+
+def get_symbol_index_path(cfg: Dict) -> Path:
+    """Path of the SQLite symbol / cross-reference index."""
+    persist_dir, _ = get_persist_dir_and_collection_name_from_config(cfg)
+    return persist_dir / FILE_SYMBOL_INDEX
+
+
+def get_summary_index_path(cfg: Dict) -> Path:
+    """Path of the SQLite index of file and directory summaries."""
+    persist_dir, _ = get_persist_dir_and_collection_name_from_config(cfg)
+    return persist_dir / FILE_SUMMARY_INDEX
+
+
+def load_last_ingested_commit(cfg: Dict) -> Optional[str]:
+    """Return the commit hash recorded by the last successful ingestion."""
+    state_path = get_ingest_state_path(cfg)
+    if not state_path.exists():
+        return None
+    try:
+        state = json.loads(state_path.read_text(encoding=VALUES_UTF_8))
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable ingest state %s: %s", state_path, e)
+        return None
+    return state.get(KEY_LAST_COMMIT)
+
+
+def save_last_ingested_commit(cfg: Dict, commit_hash: str) -> None:
+    """Record `commit_hash` as the last successfully ingested commit."""
+    state_path = get_ingest_state_path(cfg)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = state_path.with_suffix(".tmp")
+    tmp_path.write_text(
+        json.dumps({KEY_LAST_COMMIT: commit_hash}), encoding=VALUES_UTF_8
+    )
+    tmp_path.replace(state_path)
+    logger.info("Recorded ingested commit %s", commit_hash)
+
+
+def bounded_ordered_map(
+    pool, fn: Callable, items: Iterable, max_in_flight: int, *args
+) -> Iterator:
+    """
+    Like `pool.map(fn, items, ...)` but submits at most `max_in_flight`
+    tasks ahead of the consumer, so neither `items` nor the results pile
+    up in memory. Results are yielded in submission order.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item, *args))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
@@ -0,0 +1,273 @@
+"""Persistent BM25 inverted index over code identifiers."""
+
+import heapq
+import json
+import logging
+import math
+import re
+import sqlite3
+from collections import Counter, defaultdict
+from operator import itemgetter
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from langchain.schema import Document
+
+from ingestion.manifest import PathScope
+from ingestion.metadata_filter import INDEXED_KEYS, filter_clauses, json_field
+
+logger = logging.getLogger(__name__)
+
+# Standard BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Terms in more than this fraction of chunks carry almost no BM25 weight
+# (idf -> 0) but have the longest posting lists; skip them at query time.
+_MAX_DOC_FREQ_RATIO = 0.5
+# Rows per SQL statement; well below SQLite's parameter limit
+_PAGE_SIZE = 500
+
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+# "HTTPServerError2" -> HTTP, Server, Error, 2
+_WORD_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased code tokens: every identifier as a whole, plus its
+    camelCase / snake_case parts when it has more than one.
+
+    `getChangedPaths` -> getchangedpaths, get, changed, paths
+    """
+    tokens = []
+    for identifier in _IDENTIFIER_RE.findall(text):
+        if len(identifier) > 1:
+            tokens.append(identifier.lower())
+        parts = [
+            word.lower()
+            for piece in identifier.split("_")
+            for word in _WORD_RE.findall(piece)
+        ]
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if len(part) > 1)
+    return tokens
+
+
+def _pages(items: List, size: int = _PAGE_SIZE) -> Iterator[List]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+class LexicalIndex:
+    """
+    SQLite inverted index (term -> chunk ID, term frequency) with BM25
+    scoring. Stores the chunk text and metadata too, so lexical hits can
+    be returned without touching the vector store.
+
+    Kept next to the vector store in `persist_dir` and updated by
+    ingestion alongside it. Path filters are resolved through the chunk
+    manifest at `manifest_path`, if given. Safe to share between threads.
+    """
+
+    def __init__(self, path: Path, manifest_path: Optional[Path] = None):
+        self._lock = Lock()
+        self._scope = PathScope(manifest_path) if manifest_path else None
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                id TEXT PRIMARY KEY,
+                length INTEGER NOT NULL,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_postings_id ON postings (id);
+            CREATE TABLE IF NOT EXISTS stats (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO stats VALUES ('n_docs', 0);
+            INSERT OR IGNORE INTO stats VALUES ('total_length', 0);
+            """
+        )
+        for key in INDEXED_KEYS:
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_docs_{key} "
+                f"ON docs ({json_field(key)})"
+            )
+        self._conn.commit()
+
+    def _stats(self) -> Tuple[int, int]:
+        stats = dict(self._conn.execute("SELECT key, value FROM stats"))
+        return stats["n_docs"], stats["total_length"]
+
+    def _bump_stats(self, n_docs: int, total_length: int) -> None:
+        self._conn.executemany(
+            "UPDATE stats SET value = value + ? WHERE key = ?",
+            [(n_docs, "n_docs"), (total_length, "total_length")],
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._stats()[0]
+
+    def existing(self, ids: List[str]) -> Set[str]:
+        """Subset of `ids` already indexed."""
+        found = set()
+        with self._lock:
+            for page in _pages(ids):
+                placeholders = ",".join("?" * len(page))
+                found.update(
+                    row[0]
+                    for row in self._conn.execute(
+                        f"SELECT id FROM docs WHERE id IN ({placeholders})",
+                        page,
+                    )
+                )
+        return found
+
+    def add(self, docs: Iterable[Tuple[str, str, Dict]]) -> None:
+        """Index `(id, text, metadata)` chunks; known IDs are skipped."""
+        docs = list(docs)
+        known = self.existing([id_ for id_, _, _ in docs])
+        doc_rows = []
+        posting_rows = []
+        for id_, text, metadata in docs:
+            if id_ in known:
+                continue
+            known.add(id_)
+            terms = Counter(tokenize(text))
+            length = sum(terms.values())
+            doc_rows.append((id_, length, text, json.dumps(metadata)))
+            posting_rows.extend((term, id_, tf) for term, tf in terms.items())
+        if not doc_rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO docs VALUES (?, ?, ?, ?)", doc_rows
+            )
+            self._conn.executemany(
+                "INSERT INTO postings VALUES (?, ?, ?)", posting_rows
+            )
+            self._bump_stats(len(doc_rows), sum(row[1] for row in doc_rows))
+            self._conn.commit()
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]) -> None:
+        """Replace the metadata of indexed chunks; unknown IDs are ignored."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE docs SET metadata = ? WHERE id = ?",
+                (
+                    (json.dumps(meta), id_)
+                    for id_, meta in zip(ids, metadatas, strict=True)
+                ),
+            )
+            self._conn.commit()
+
+    def delete(self, ids: List[str]) -> None:
+        with self._lock:
+            for page in _pages(ids):
+                placeholders = ",".join("?" * len(page))
+                n_docs, total_length = self._conn.execute(
+                    f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs "
+                    f"WHERE id IN ({placeholders})",
+                    page,
+                ).fetchone()
+                self._conn.execute(
+                    f"DELETE FROM postings WHERE id IN ({placeholders})", page
+                )
+                self._conn.execute(
+                    f"DELETE FROM docs WHERE id IN ({placeholders})", page
+                )
+                self._bump_stats(-n_docs, -total_length)
+            self._conn.commit()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM docs")
+            self._conn.execute("UPDATE stats SET value = 0")
+            self._conn.commit()
+
+    def search(
+        self, query: str, k: int, filter: Optional[Dict] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Top `k` `(chunk ID, BM25 score)` pairs for `query`, optionally only
+        among chunks matching a Chroma-style metadata `filter`. Term
+        statistics stay collection-wide.
+        """
+        terms = set(tokenize(query))
+        scores = defaultdict(float)
+        # Unfiltered, walk the term's postings; filtered by path, probe
+        # them for the files' chunks (per the manifest, which knows every
+        # file of a shared chunk); otherwise for the docs the metadata
+        # indexes match
+        join = "postings p JOIN docs d"
+        scopes = [("p.term = ?", [])]
+        ids = self._scope.ids(filter) if self._scope else None
+        if ids is not None:
+            scopes = [
+                (f"p.term = ? AND p.id IN ({','.join('?' * len(page))})", page)
+                for page in _pages(ids)
+            ]
+        elif filter:
+            clauses, params = ["p.term = ?"], []
+            filter_clauses(filter, clauses, params, column="d.metadata")
+            scopes = [(" AND ".join(clauses), params)]
+            join = "docs d CROSS JOIN postings p"
+        with self._lock:
+            n_docs, total_length = self._stats()
+            if not n_docs or not terms:
+                return []
+            avg_length = total_length / n_docs
+            for term in terms:
+                (doc_freq,) = self._conn.execute(
+                    "SELECT COUNT(*) FROM postings WHERE term = ?", (term,)
+                ).fetchone()
+                if not doc_freq or doc_freq > _MAX_DOC_FREQ_RATIO * n_docs:
+                    continue
+                idf = math.log(1 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+                for where, params in scopes:
+                    for id_, tf, length in self._conn.execute(
+                        f"SELECT p.id, p.tf, d.length FROM {join} "
+                        f"ON d.id = p.id WHERE {where}",
+                        (term, *params),
+                    ):
+                        norm = BM25_K1 * (
+                            1 - BM25_B + BM25_B * length / avg_length
+                        )
+                        scores[id_] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=itemgetter(1))
+
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """Stored chunks for `ids`, in the same order; unknown IDs dropped."""
+        found = {}
+        with self._lock:
+            for page in _pages(ids):
+                placeholders = ",".join("?" * len(page))
+                for id_, document, metadata in self._conn.execute(
+                    f"SELECT id, document, metadata FROM docs "
+                    f"WHERE id IN ({placeholders})",
+                    page,
+                ):
+                    found[id_] = Document(
+                        id=id_,
+                        page_content=document,
+                        metadata=json.loads(metadata),
+                    )
+        return [found[id_] for id_ in ids if id_ in found]
+
+    def close(self) -> None:
+        if self._scope is not None:
+            self._scope.close()
+        with self._lock:
+            self._conn.close()
@@ -1,38 +1,128 @@
 import logging
-from typing import Dict
-
-from langchain_chroma import Chroma
+from typing import Dict, Optional
 
+from ingestion.embedding_cache import get_query_embedding_model
 from ingestion.ingestion_util import (
+    get_chunk_manifest_path,
+    get_lexical_index_path,
     get_persist_dir_and_collection_name_from_config,
+    get_summary_index_path,
+    get_symbol_index_path,
+    load_last_ingested_commit,
 )
-from langgraph_flow.models.openai_model import OpenAIModel
+from ingestion.lexical_index import LexicalIndex
+from ingestion.manifest import ChunkManifest
+from ingestion.path_index import PathIndex
+from ingestion.summary_index import SummaryIndex
+from ingestion.symbol_index import SymbolIndex
+from ingestion.vectorstore_backends import open_vectorstore_backend
+from utils.constants import KEY_VECTORSTORE
+from utils.resource_pool import ResourcePool
 
 logger = logging.getLogger(__name__)
 
-# Cache the loaded vectorstore so we don’t re-open it on every call
-_VECTORSTORE = None
+# Vector stores, lexical, symbol, path and summary indexes of every repo
+# queried by this process, kept open so we don’t re-open them on every
+# call. Up to five per ingested repo, so this keeps a couple of dozen repos
+# open.
+MAX_OPEN_STORES = 96
+STORE_IDLE_TTL_S = 60 * 60
+_KEY_LEXICAL = "lexical"
+_KEY_SYMBOL = "symbol"
+_KEY_PATHS = "paths"
+_KEY_SUMMARIES = "summaries"
+_STORES = ResourcePool(
+    "store",
+    MAX_OPEN_STORES,
+    idle_ttl_s=STORE_IDLE_TTL_S,
+    close=lambda store: store.close(),
+)
 
 
 def load_vectorstore(cfg: Dict):
-    global _VECTORSTORE
-    if _VECTORSTORE:
-        return _VECTORSTORE
-
+    """The configured repo's vector store, opened once per process."""
     persist_dir, collection_name = (
         get_persist_dir_and_collection_name_from_config(cfg)
     )
-    embeddings = OpenAIModel(cfg).embedding_model
-    try:
-        logger.info("Loading Chroma vectorstore from '%s'", persist_dir)
-        _VECTORSTORE = Chroma(
-            persist_directory=persist_dir,
-            embedding_function=embeddings,
-            collection_name=collection_name,
-        )
+
+    def open_store():
+        store = open_vectorstore_backend(cfg, get_query_embedding_model(cfg))
         logger.info("Vectorstore loaded successfully")
-        return _VECTORSTORE
+        return store
 
+    try:
+        return _STORES.get(
+            (KEY_VECTORSTORE, str(persist_dir), collection_name), open_store
+        )
     except Exception as e:
         logger.error("Failed to load vectorstore: %s", e, exc_info=True)
         raise
+
+
+def load_lexical_index(cfg: Dict) -> Optional[LexicalIndex]:
+    """Open the BM25 index built by ingestion, or None if there is none."""
+    path = get_lexical_index_path(cfg)
+    key = (_KEY_LEXICAL, str(path))
+    if key not in _STORES and not path.exists():
+        logger.warning("No lexical index at '%s'; vector search only", path)
+        return None
+
+    def open_index():
+        logger.info("Loading lexical index from '%s'", path)
+        return LexicalIndex(path, get_chunk_manifest_path(cfg))
+
+    return _STORES.get(key, open_index)
+
+
+def load_symbol_index(cfg: Dict) -> Optional[SymbolIndex]:
+    """Open the symbol index built by ingestion, or None if there is none."""
+    path = get_symbol_index_path(cfg)
+    key = (_KEY_SYMBOL, str(path))
+    if key not in _STORES and not path.exists():
+        logger.warning("No symbol index at '%s'", path)
+        return None
+
+    def open_index():
+        logger.info("Loading symbol index from '%s'", path)
+        return SymbolIndex(path)
+
+    return _STORES.get(key, open_index)
+
+
+def load_path_index(cfg: Dict) -> Optional[PathIndex]:
+    """
+    Index of the ingested file paths, read from the chunk manifest once
+    per ingested commit; None before the first ingestion.
+    """
+    path = get_chunk_manifest_path(cfg)
+    if not path.exists():
+        return None
+
+    def open_index():
+        manifest = ChunkManifest(path, read_only=True)
+        try:
+            index = PathIndex(manifest.paths())
+        finally:
+            manifest.close()
+        logger.info("Loaded path index of %d files", len(index))
+        return index
+
+    key = (_KEY_PATHS, str(path), load_last_ingested_commit(cfg))
+    return _STORES.get(key, open_index)
+
+
+def load_summary_index(cfg: Dict) -> Optional[SummaryIndex]:
+    """
+    The file and directory summaries built by ingestion, reopened once
+    per ingested commit; None when summaries were never built.
+    """
+    path = get_summary_index_path(cfg)
+    if not path.exists():
+        return None
+
+    def open_index():
+        logger.info("Loading summary index from '%s'", path)
+        return SummaryIndex(path)
+
+    key = (_KEY_SUMMARIES, str(path), load_last_ingested_commit(cfg))
+    return _STORES.get(key, open_index)
@@ -0,0 +1,553 @@
+"""
+Embedded vector index: memory-mapped float32 vectors, chunk text and
+metadata in SQLite, and an optional FAISS IVF/HNSW index for large
+collections.
+
+Layout of the collection directory:
+    docs.sqlite          chunk rows (row number, id, text, metadata)
+    vectors.<gen>.f32    row-major float32 matrix, L2-normalized
+    ann.<gen>.faiss      optional ANN index over the rows at build time
+"""
+
+import json
+import logging
+import math
+import sqlite3
+from pathlib import Path
+from threading import RLock
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain.schema import Document
+
+from ingestion.manifest import PathScope
+from ingestion.metadata_filter import INDEXED_KEYS, filter_clauses, json_field
+from ingestion.vectorstore_backends import VectorStoreBackend
+from utils.constants import (
+    KEY_ANN_THRESHOLD,
+    KEY_EF_SEARCH,
+    KEY_INDEX,
+    KEY_NPROBE,
+)
+
+try:
+    import faiss
+except ImportError:  # optional: `poetry install -E faiss`
+    faiss = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_AUTO = "auto"
+INDEX_FLAT = "flat"
+INDEX_IVF = "ivf"
+INDEX_HNSW = "hnsw"
+# `auto` switches from exact search to HNSW above this many chunks
+DEFAULT_ANN_THRESHOLD = 50_000
+DEFAULT_IVF_NPROBE = 16
+DEFAULT_HNSW_M = 32
+DEFAULT_HNSW_EF_SEARCH = 64
+# Rewrite the vector file once this fraction of rows are tombstones
+_COMPACT_RATIO = 0.25
+# ANN candidates fetched per requested result, to survive tombstones
+_ANN_OVERFETCH = 4
+_IVF_MAX_TRAIN_ROWS = 100_000
+# faiss warns (and clusters poorly) below ~39 training rows per list
+_IVF_MIN_ROWS_PER_LIST = 39
+_PAGE_SIZE = 500
+
+_FILE_DOCS = "docs.sqlite"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _remove_quietly(path: Path) -> None:
+    try:
+        path.unlink()
+    except OSError:
+        # Still mapped by a reader on some platforms; harmless leftover
+        pass
+
+
+class LocalVectorStore(VectorStoreBackend):
+    """
+    Single-directory vector index that other processes can open without
+    loading it: vectors are memory-mapped and the ANN index (if any) is
+    read with FAISS's mmap flag.
+
+    Search is exact (one matrix-vector product) for small collections or
+    filtered queries, and goes through the IVF or HNSW index otherwise.
+    Writes append to the vector file and tombstone replaced rows;
+    `persist()` compacts and rebuilds the ANN index.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        embeddings,
+        store_cfg: Dict,
+        manifest_path: Optional[Path] = None,
+    ):
+        super().__init__(embeddings)
+        self._dir = Path(directory)
+        # Path filters go through the chunk manifest, which knows every
+        # file of a shared chunk
+        self._scope = PathScope(manifest_path) if manifest_path else None
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._index_type = store_cfg.get(KEY_INDEX, INDEX_AUTO)
+        self._ann_threshold = store_cfg.get(
+            KEY_ANN_THRESHOLD, DEFAULT_ANN_THRESHOLD
+        )
+        self._nprobe = store_cfg.get(KEY_NPROBE, DEFAULT_IVF_NPROBE)
+        self._ef_search = store_cfg.get(KEY_EF_SEARCH, DEFAULT_HNSW_EF_SEARCH)
+
+        self._lock = RLock()
+        self._conn = sqlite3.connect(
+            str(self._dir / _FILE_DOCS), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chunks_id ON chunks (id)"
+        )
+        # Scoped searches read only the matching rows
+        for key in INDEXED_KEYS:
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_chunks_{key} "
+                f"ON chunks ({json_field(key)})"
+            )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value)"
+        )
+        self._conn.commit()
+
+        # Read-side state, refreshed when another writer bumps `generation`
+        self._loaded_generation = None
+        self._vectors: Optional[np.ndarray] = None
+        self._deleted: Optional[np.ndarray] = None
+        self._ann = None
+        self._ann_rows = 0
+
+    # --- bookkeeping -----------------------------------------------------
+
+    def _info(self, key: str, default=None):
+        row = self._conn.execute(
+            "SELECT value FROM info WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else default
+
+    def _set_info(self, **values) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)",
+            values.items(),
+        )
+
+    def _bump_generation(self) -> None:
+        self._set_info(generation=int(self._info("generation", 0)) + 1)
+
+    def _n_rows(self) -> int:
+        (n_rows,) = self._conn.execute(
+            "SELECT COALESCE(MAX(row) + 1, 0) FROM chunks"
+        ).fetchone()
+        return n_rows
+
+    def _vectors_path(self) -> Path:
+        return self._dir / self._info("vectors_file", "vectors.0.f32")
+
+    def _refresh(self) -> None:
+        """(Re)map vectors, tombstones and ANN index if the store changed."""
+        generation = self._info("generation", 0)
+        if generation == self._loaded_generation:
+            return
+        n_rows, dim = self._n_rows(), self._info("dim")
+        self._vectors = (
+            np.memmap(
+                self._vectors_path(),
+                dtype=np.float32,
+                mode="r",
+                shape=(n_rows, int(dim)),
+            )
+            if n_rows
+            else None
+        )
+        self._deleted = np.zeros(n_rows, dtype=bool)
+        deleted_rows = [
+            row
+            for (row,) in self._conn.execute(
+                "SELECT row FROM chunks WHERE deleted = 1"
+            )
+        ]
+        self._deleted[deleted_rows] = True
+
+        self._ann, self._ann_rows = None, 0
+        ann_file = self._info("ann_file")
+        if ann_file and faiss is not None:
+            self._ann = self._read_ann(self._dir / ann_file)
+            self._ann_rows = int(self._info("ann_rows", 0))
+        self._loaded_generation = generation
+
+    # --- writes ----------------------------------------------------------
+
+    def upsert(self, ids, vectors, texts, metadatas) -> None:
+        matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            dim = self._info("dim")
+            if dim is None:
+                self._set_info(dim=matrix.shape[1])
+            elif int(dim) != matrix.shape[1]:
+                raise ValueError(
+                    f"Vector dimension {matrix.shape[1]} != index dim {dim}"
+                )
+            self._tombstone(ids)
+            start = self._n_rows()
+            vectors_path = self._vectors_path()
+            with open(vectors_path, "ab") as f:
+                # Drop bytes of rows a crashed writer never committed
+                f.truncate(start * matrix.shape[1] * 4)
+                f.write(matrix.tobytes())
+            self._conn.executemany(
+                "INSERT INTO chunks (row, id, document, metadata) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    (start + i, id_, text, json.dumps(meta))
+                    for i, (id_, text, meta) in enumerate(
+                        zip(ids, texts, metadatas, strict=True)
+                    )
+                ),
+            )
+            self._bump_generation()
+            self._conn.commit()
+
+    def update_metadata(self, ids, metadatas) -> None:
+        # Searches read metadata from SQLite; vectors and index are as is
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE chunks SET metadata = ? WHERE deleted = 0 AND id = ?",
+                (
+                    (json.dumps(meta), id_)
+                    for id_, meta in zip(ids, metadatas, strict=True)
+                ),
+            )
+            self._conn.commit()
+
+    def _tombstone(self, ids: List[str]) -> None:
+        for i in range(0, len(ids), _PAGE_SIZE):
+            page = ids[i : i + _PAGE_SIZE]
+            placeholders = ",".join("?" * len(page))
+            self._conn.execute(
+                f"UPDATE chunks SET deleted = 1 "
+                f"WHERE deleted = 0 AND id IN ({placeholders})",
+                page,
+            )
+
+    def delete(self, ids: List[str]) -> None:
+        with self._lock:
+            self._tombstone(ids)
+            self._bump_generation()
+            self._conn.commit()
+
+    def reset(self) -> None:
+        with self._lock:
+            old_files = [self._vectors_path().name, self._info("ann_file")]
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM info WHERE key != 'generation'")
+            self._bump_generation()
+            self._conn.commit()
+            for name in filter(None, old_files):
+                _remove_quietly(self._dir / name)
+
+    def persist(self) -> None:
+        """Compact tombstoned rows and rebuild the ANN index."""
+        with self._lock:
+            self._refresh()
+            if self._vectors is None:
+                return
+            n_rows = len(self._deleted)
+            n_deleted = int(self._deleted.sum())
+            if n_deleted and n_deleted >= _COMPACT_RATIO * n_rows:
+                self._compact()
+                self._refresh()
+            self._build_ann()
+
+    def _compact(self) -> None:
+        generation = int(self._info("generation", 0)) + 1
+        live_rows = np.flatnonzero(~self._deleted)
+        new_name = f"vectors.{generation}.f32"
+        with open(self._dir / new_name, "wb") as f:
+            for i in range(0, len(live_rows), _PAGE_SIZE):
+                f.write(self._vectors[live_rows[i : i + _PAGE_SIZE]].tobytes())
+
+        old_name = self._vectors_path().name
+        rows = self._conn.execute(
+            "SELECT id, document, metadata FROM chunks "
+            "WHERE deleted = 0 ORDER BY row"
+        ).fetchall()
+        # One transaction switches rows and vector file together
+        self._conn.execute("DELETE FROM chunks")
+        self._conn.executemany(
+            "INSERT INTO chunks (row, id, document, metadata) "
+            "VALUES (?, ?, ?, ?)",
+            ((i, *row) for i, row in enumerate(rows)),
+        )
+        self._set_info(vectors_file=new_name)
+        self._bump_generation()
+        self._conn.commit()
+        _remove_quietly(self._dir / old_name)
+        logger.info("Compacted local vectorstore to %d rows", len(rows))
+
+    def _resolve_index_type(self, n_live: int) -> str:
+        if self._index_type != INDEX_AUTO:
+            return self._index_type
+        return INDEX_HNSW if n_live >= self._ann_threshold else INDEX_FLAT
+
+    def _build_ann(self) -> None:
+        live_rows = np.flatnonzero(~self._deleted)
+        index_type = self._resolve_index_type(len(live_rows))
+        old_name = self._info("ann_file")
+        if index_type == INDEX_FLAT or not len(live_rows):
+            new_name = None
+        elif faiss is None:
+            logger.warning(
+                "faiss is not installed; using exact search instead of %s",
+                index_type,
+            )
+            new_name = None
+        else:
+            data = np.ascontiguousarray(self._vectors[live_rows])
+            index = self._new_ann_index(index_type, data)
+            index.add_with_ids(data, live_rows.astype(np.int64))
+            generation = int(self._info("generation", 0)) + 1
+            new_name = f"ann.{generation}.faiss"
+            faiss.write_index(index, str(self._dir / new_name))
+            logger.info(
+                "Built %s index over %d vectors", index_type, len(live_rows)
+            )
+
+        self._set_info(ann_file=new_name, ann_rows=len(self._deleted))
+        self._bump_generation()
+        self._conn.commit()
+        if old_name and old_name != new_name:
+            _remove_quietly(self._dir / old_name)
+
+    @staticmethod
+    def _new_ann_index(index_type: str, data: np.ndarray):
+        dim = data.shape[1]
+        if index_type == INDEX_IVF:
+            n_lists = max(
+                1,
+                min(
+                    int(4 * math.sqrt(len(data))),
+                    len(data) // _IVF_MIN_ROWS_PER_LIST,
+                ),
+            )
+            quantizer = faiss.IndexFlatIP(dim)
+            index = faiss.IndexIVFFlat(
+                quantizer, dim, n_lists, faiss.METRIC_INNER_PRODUCT
+            )
+            sample = data
+            if len(data) > _IVF_MAX_TRAIN_ROWS:
+                rng = np.random.default_rng(0)
+                sample = data[
+                    rng.choice(len(data), _IVF_MAX_TRAIN_ROWS, replace=False)
+                ]
+            index.train(sample)
+            return index
+        if index_type == INDEX_HNSW:
+            return faiss.IndexIDMap(
+                faiss.IndexHNSWFlat(
+                    dim, DEFAULT_HNSW_M, faiss.METRIC_INNER_PRODUCT
+                )
+            )
+        raise ValueError(f"Unknown local index type: {index_type}")
+
+    def _read_ann(self, path: Path):
+        try:
+            index = faiss.read_index(
+                str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+            )
+        except RuntimeError:
+            # Not every index type supports mmap; fall back to loading it
+            index = faiss.read_index(str(path))
+        if isinstance(index, faiss.IndexIVF):
+            index.nprobe = self._nprobe
+        elif isinstance(index, faiss.IndexIDMap):
+            faiss.downcast_index(index.index).hnsw.efSearch = max(
+                self._ef_search, 1
+            )
+        return index
+
+    # --- reads -----------------------------------------------------------
+
+    def iter_metadata(self, page_size: int):
+        last_row = -1
+        while True:
+            rows = self._conn.execute(
+                "SELECT row, id, metadata FROM chunks "
+                "WHERE deleted = 0 AND row > ? ORDER BY row LIMIT ?",
+                (last_row, page_size),
+            ).fetchall()
+            if not rows:
+                return
+            yield [r[1] for r in rows], [json.loads(r[2]) for r in rows]
+            last_row = rows[-1][0]
+
+    def get_vectors(self, ids: List[str]) -> Dict[str, List[float]]:
+        """Stored (L2-normalized) vectors by chunk ID."""
+        vectors = {}
+        with self._lock:
+            self._refresh()
+            if self._vectors is None:
+                return vectors
+            for i in range(0, len(ids), _PAGE_SIZE):
+                page = ids[i : i + _PAGE_SIZE]
+                placeholders = ",".join("?" * len(page))
+                vectors.update(
+                    (id_, self._vectors[row].tolist())
+                    for id_, row in self._conn.execute(
+                        f"SELECT id, row FROM chunks "
+                        f"WHERE deleted = 0 AND id IN ({placeholders})",
+                        page,
+                    )
+                )
+        return vectors
+
+    def _filter_rows(self, filter: Dict) -> np.ndarray:
+        """
+        Live rows matching a Chroma-style filter (`{key: value}`, `$eq`,
+        `$in`, and `$and` of those).
+        """
+        ids = self._scope.ids(filter) if self._scope else None
+        if ids is not None:
+            rows = []
+            for i in range(0, len(ids), _PAGE_SIZE):
+                page = ids[i : i + _PAGE_SIZE]
+                placeholders = ",".join("?" * len(page))
+                rows.extend(
+                    self._conn.execute(
+                        f"SELECT row FROM chunks "
+                        f"WHERE deleted = 0 AND id IN ({placeholders})",
+                        page,
+                    )
+                )
+        else:
+            clauses, params = ["deleted = 0"], []
+            filter_clauses(filter, clauses, params)
+            rows = self._conn.execute(
+                f"SELECT row FROM chunks WHERE {' AND '.join(clauses)}",
+                params,
+            ).fetchall()
+        return np.array([r[0] for r in rows], dtype=np.int64)
+
+    @staticmethod
+    def _top_k(rows: np.ndarray, scores: np.ndarray, k: int):
+        if len(rows) > k:
+            best = np.argpartition(-scores, k)[:k]
+            rows, scores = rows[best], scores[best]
+        order = np.argsort(-scores)
+        return rows[order], scores[order]
+
+    def _search_rows(self, query: np.ndarray, k: int, filter):
+        if filter:
+            rows = self._filter_rows(filter)
+            return self._top_k(rows, self._vectors[rows] @ query, k)
+
+        if self._ann is None:
+            rows = np.flatnonzero(~self._deleted)
+            return self._top_k(rows, self._vectors[rows] @ query, k)
+
+        scores, rows = self._ann.search(query[None, :], k * _ANN_OVERFETCH)
+        rows, scores = rows[0], scores[0]
+        keep = (rows >= 0) & ~self._deleted[np.maximum(rows, 0)]
+        rows, scores = rows[keep], scores[keep]
+        # Rows appended since the ANN index was built: search them exactly
+        tail = np.arange(self._ann_rows, len(self._deleted))
+        tail = tail[~self._deleted[tail]]
+        if len(tail):
+            rows = np.concatenate([rows, tail])
+            scores = np.concatenate([scores, self._vectors[tail] @ query])
+        return self._top_k(rows, scores, k)
+
+    def _search_many_rows(self, queries: np.ndarray, k: int, filter):
+        if filter or self._ann is not None:
+            return [self._search_rows(query, k, filter) for query in queries]
+        # Exact search: score every query in one matrix product
+        rows = np.flatnonzero(~self._deleted)
+        scores = self._vectors[rows] @ queries.T
+        return [self._top_k(rows, scores[:, i], k) for i in range(len(queries))]
+
+    def similarity_search_by_vectors_with_score(self, vectors, k, filter=None):
+        """`similarity_search_by_vector_with_score` for several vectors."""
+        queries = _normalize(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            self._refresh()
+            if self._vectors is None:
+                return [[] for _ in vectors]
+            hits = self._search_many_rows(queries, k, filter)
+            all_rows = sorted({int(r) for rows, _ in hits for r in rows})
+            found = {}
+            for i in range(0, len(all_rows), _PAGE_SIZE):
+                page = all_rows[i : i + _PAGE_SIZE]
+                placeholders = ",".join("?" * len(page))
+                found.update(
+                    (row, (id_, document, metadata))
+                    for row, id_, document, metadata in self._conn.execute(
+                        f"SELECT row, id, document, metadata FROM chunks "
+                        f"WHERE row IN ({placeholders})",
+                        page,
+                    )
+                )
+        docs: Dict[int, Document] = {}
+        results = []
+        for rows, scores in hits:
+            query_results = []
+            for row, score in zip(rows.tolist(), scores.tolist(), strict=True):
+                if row not in docs:
+                    id_, document, metadata = found[row]
+                    docs[row] = Document(
+                        id=id_,
+                        page_content=document,
+                        metadata=json.loads(metadata),
+                    )
+                query_results.append((docs[row], score))
+            results.append(query_results)
+        return results
+
+    def similarity_search_by_vector_with_score(self, vector, k, filter=None):
+        return self.similarity_search_by_vectors_with_score(
+            [vector], k, filter
+        )[0]
+
+    def similarity_search_by_vectors(self, vectors, k, filter=None):
+        return [
+            [doc for doc, _ in results]
+            for results in self.similarity_search_by_vectors_with_score(
+                vectors, k, filter
+            )
+        ]
+
+    def similarity_search_by_vector(self, vector, k, filter=None):
+        return [
+            doc
+            for doc, _ in self.similarity_search_by_vector_with_score(
+                vector, k, filter
+            )
+        ]
+
+    def close(self) -> None:
+        if self._scope is not None:
+            self._scope.close()
+        with self._lock:
+            self._conn.close()
+            self._vectors = self._ann = None
@@ -0,0 +1,346 @@
+"""Sidecar manifest of the chunk IDs each file contributed to the store."""
+
+import json
+import logging
+import sqlite3
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from ingestion.metadata_filter import scoped_paths
+from utils.constants import (
+    KEY_CHUNK_INDEX,
+    KEY_END_LINE,
+    KEY_RELATIVE_PATH,
+    KEY_START_LINE,
+)
+
+logger = logging.getLogger(__name__)
+
+# Rows per SQL statement / store page; well below SQLite's parameter limit
+_PAGE_SIZE = 500
+
+
+def _pages(items: List, size: int = _PAGE_SIZE) -> Iterator[List]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _span(metadata: Dict) -> str:
+    """Where a chunk sits in its file; what a move without edits changes."""
+    return json.dumps(
+        [
+            metadata.get(key)
+            for key in (KEY_START_LINE, KEY_END_LINE, KEY_CHUNK_INDEX)
+        ]
+    )
+
+
+class ChunkManifest:
+    """
+    SQLite table of `(chunk ID, relative path)` pairs: every file a chunk
+    (keyed by the SHA-256 of its text) appears in. The store holds one
+    copy of a chunk shared by several files, and it stays there until
+    the last of them no longer produces it.
+
+    Each pair keeps the chunk's metadata in that file, and one pair per
+    chunk is marked as the one whose metadata the store holds, so line
+    spans can be kept current in the store when code moves unchanged.
+
+    Lets ingestion filter already-stored chunks, find a file's chunks and
+    compute stale IDs without reading documents back out of the vector
+    store. Kept next to the store in `persist_dir`.
+
+    With `read_only`, the connection may be shared between threads
+    (queries serialize on a lock) and the file must already exist.
+    """
+
+    def __init__(self, path: Path, read_only: bool = False):
+        self._lock = Lock()
+        if read_only:
+            self._conn = sqlite3.connect(
+                f"{Path(path).resolve().as_uri()}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+            )
+            return
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks "
+            "(id TEXT NOT NULL, path TEXT NOT NULL, PRIMARY KEY (id, path))"
+        )
+        self._add_metadata_columns()
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chunks_path ON chunks (path)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS manifest_info "
+            "(key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._conn.commit()
+
+    def _add_metadata_columns(self) -> None:
+        # Pairs recorded before metadata was kept have none (and aren't
+        # marked stored); the next sync of their files fills it in
+        columns = {
+            row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")
+        }
+        for column, definition in (
+            ("span", "TEXT"),
+            ("metadata", "TEXT"),
+            ("stored", "INTEGER NOT NULL DEFAULT 0"),
+        ):
+            if column not in columns:
+                self._conn.execute(
+                    f"ALTER TABLE chunks ADD COLUMN {column} {definition}"
+                )
+
+    @property
+    def is_initialized(self) -> bool:
+        row = self._conn.execute(
+            "SELECT value FROM manifest_info WHERE key = 'initialized'"
+        ).fetchone()
+        return row is not None
+
+    def _mark_initialized(self) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO manifest_info VALUES ('initialized', '1')"
+        )
+        self._conn.commit()
+
+    def bootstrap_from_store(self, store) -> None:
+        """
+        Build the manifest from an existing vectorstore backend with a paged
+        scan of IDs and metadata only (no documents or embeddings).
+        """
+        n_chunks = 0
+        for ids, metadatas in store.iter_metadata(_PAGE_SIZE):
+            self.record(
+                (
+                    (id_, (meta or {}).get(KEY_RELATIVE_PATH, ""), meta or {})
+                    for id_, meta in zip(ids, metadatas, strict=True)
+                ),
+                stored=True,
+            )
+            n_chunks += len(ids)
+        logger.info("Bootstrapped chunk manifest with %d chunks", n_chunks)
+        self._mark_initialized()
+
+    def clear(self) -> None:
+        self._conn.execute("DELETE FROM chunks")
+        self._conn.commit()
+        self._mark_initialized()
+
+    def existing(self, ids: List[str]) -> Set[str]:
+        """Subset of `ids` already recorded (for any path)."""
+        found = set()
+        for page in _pages(ids):
+            placeholders = ",".join("?" * len(page))
+            found.update(
+                row[0]
+                for row in self._conn.execute(
+                    f"SELECT DISTINCT id FROM chunks "
+                    f"WHERE id IN ({placeholders})",
+                    page,
+                )
+            )
+        return found
+
+    def add(self, id_paths: Iterable[Tuple[str, str]]) -> None:
+        """Record `(id, path)` pairs; known pairs are skipped."""
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO chunks (id, path) VALUES (?, ?)", id_paths
+        )
+        self._conn.commit()
+
+    def record(
+        self, chunks: Iterable[Tuple[str, str, Dict]], stored: bool = False
+    ) -> None:
+        """
+        Record `(id, path, metadata)` chunks, replacing the metadata of
+        known pairs. With `stored`, it is the metadata the store holds.
+        """
+        self._conn.executemany(
+            "INSERT INTO chunks (id, path, span, metadata, stored) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT (id, path) DO UPDATE SET "
+            "span = excluded.span, metadata = excluded.metadata, "
+            "stored = MAX(stored, excluded.stored)",
+            (
+                (id_, path, _span(meta), json.dumps(meta), int(stored))
+                for id_, path, meta in chunks
+            ),
+        )
+        self._conn.commit()
+
+    def update(
+        self, chunks: Iterable[Tuple[str, str, Dict]]
+    ) -> List[Tuple[str, Dict]]:
+        """
+        Record `(id, path, metadata)` chunks of IDs already stored: new
+        pairs are added, and pairs whose line span moved get the new
+        metadata.
+
+        Returns:
+            `(id, metadata)` of the moved pairs whose metadata the store
+            holds, which is to be updated in the store.
+        """
+        chunks = list(chunks)
+        recorded = {}
+        for page in _pages(sorted({id_ for id_, _, _ in chunks})):
+            placeholders = ",".join("?" * len(page))
+            for id_, path, span, stored in self._conn.execute(
+                f"SELECT id, path, span, stored FROM chunks "
+                f"WHERE id IN ({placeholders})",
+                page,
+            ):
+                recorded[(id_, path)] = (span, stored)
+        changed = [
+            (id_, path, meta)
+            for id_, path, meta in chunks
+            if recorded.get((id_, path), (None,))[0] != _span(meta)
+        ]
+        if changed:
+            self.record(changed)
+        return [
+            (id_, meta)
+            for id_, path, meta in changed
+            if recorded.get((id_, path), (None, 0))[1]
+        ]
+
+    def repoint_stored(self) -> List[Tuple[str, Dict]]:
+        """
+        For chunks whose stored pair was removed while other files still
+        have them, mark the pair of the first such path as stored.
+
+        Returns:
+            `(id, metadata)` of the newly stored pairs, which is to be
+            written to the store.
+        """
+        # SQLite takes the bare `metadata` from the row MIN(path) picks
+        rows = self._conn.execute(
+            "SELECT id, MIN(path), metadata FROM chunks "
+            "WHERE metadata IS NOT NULL GROUP BY id HAVING MAX(stored) = 0"
+        ).fetchall()
+        self._conn.executemany(
+            "UPDATE chunks SET stored = 1 WHERE id = ? AND path = ?",
+            ((id_, path) for id_, path, _ in rows),
+        )
+        self._conn.commit()
+        return [(id_, json.loads(metadata)) for id_, _, metadata in rows]
+
+    def _orphans(self, ids: Iterable[str]) -> List[str]:
+        """Those of `ids` no longer recorded for any path."""
+        ids = sorted(set(ids))
+        remaining = self.existing(ids)
+        return [id_ for id_ in ids if id_ not in remaining]
+
+    def ids_for_paths(self, paths: Iterable[str]) -> List[str]:
+        ids = []
+        with self._lock:
+            for page in _pages(sorted(paths)):
+                placeholders = ",".join("?" * len(page))
+                ids.extend(
+                    row[0]
+                    for row in self._conn.execute(
+                        f"SELECT id FROM chunks WHERE path IN ({placeholders})",
+                        page,
+                    )
+                )
+        return sorted(set(ids))
+
+    def remove_paths(self, paths: Iterable[str]) -> List[str]:
+        """
+        Forget `paths`; returns the IDs of their chunks that no other path
+        produces, which are to be deleted from the store.
+        """
+        ids = self.ids_for_paths(paths)
+        for page in _pages(sorted(paths)):
+            placeholders = ",".join("?" * len(page))
+            self._conn.execute(
+                f"DELETE FROM chunks WHERE path IN ({placeholders})", page
+            )
+        self._conn.commit()
+        return self._orphans(ids)
+
+    def paths(self) -> List[str]:
+        """Every file with chunks in the store, sorted."""
+        with self._lock:
+            return [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT DISTINCT path FROM chunks ORDER BY path"
+                )
+            ]
+
+    # Full-sync bookkeeping: mark every (id, path) pair produced by this
+    # run, then whatever is left unmarked is stale.
+    def begin_sync(self) -> None:
+        self._conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS seen "
+            "(id TEXT, path TEXT, PRIMARY KEY (id, path))"
+        )
+        self._conn.execute("DELETE FROM seen")
+
+    def mark_seen(self, id_paths: Iterable[Tuple[str, str]]) -> None:
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO seen (id, path) VALUES (?, ?)", id_paths
+        )
+
+    def remove_unseen(self) -> List[str]:
+        """
+        Forget the pairs not marked this sync; returns the IDs left with
+        no path, which are to be deleted from the store.
+        """
+        ids = [
+            row[0]
+            for row in self._conn.execute(
+                "SELECT DISTINCT id FROM chunks WHERE NOT EXISTS "
+                "(SELECT 1 FROM seen "
+                "WHERE seen.id = chunks.id AND seen.path = chunks.path)"
+            )
+        ]
+        self._conn.execute(
+            "DELETE FROM chunks WHERE NOT EXISTS "
+            "(SELECT 1 FROM seen "
+            "WHERE seen.id = chunks.id AND seen.path = chunks.path)"
+        )
+        self._conn.commit()
+        return self._orphans(ids)
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class PathScope:
+    """
+    Chunk IDs for filters on `relative_path` alone, from the manifest at
+    `path` (opened read-only on first use). A chunk several files share
+    names one of them in its metadata; the manifest lists them all.
+    """
+
+    def __init__(self, path: Path):
+        self._path = Path(path)
+        self._lock = Lock()
+        self._manifest: Optional[ChunkManifest] = None
+
+    def ids(self, filter: Optional[Dict]) -> Optional[List[str]]:
+        """
+        The IDs of the chunks of the files `filter` selects; None when it
+        isn't a path filter or there is no manifest (filter on metadata).
+        """
+        paths = scoped_paths(filter)
+        if paths is None:
+            return None
+        with self._lock:
+            if self._manifest is None:
+                if not self._path.exists():
+                    return None
+                self._manifest = ChunkManifest(self._path, read_only=True)
+        return self._manifest.ids_for_paths(paths)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._manifest is not None:
+                self._manifest.close()
+                self._manifest = None
@@ -0,0 +1,61 @@
+"""Chroma-style metadata filters as SQL over a JSON metadata column."""
+
+from typing import Dict, List, Optional
+
+from utils.constants import KEY_RELATIVE_PATH
+
+# Metadata keys the SQLite indexes keep an expression index on, for
+# scoped (path / language filtered) retrieval
+INDEXED_KEYS = ("relative_path", "language")
+
+
+def json_field(key: str, column: str = "metadata") -> str:
+    """SQL for metadata field `key`; matches the expression indexes."""
+    if not key.isidentifier():
+        raise ValueError(f"Unsupported metadata filter key: {key}")
+    return f"json_extract({column}, '$.{key}')"
+
+
+def filter_clauses(
+    filter: Dict, clauses: List, params: List, column: str = "metadata"
+) -> None:
+    """
+    Append SQL conditions (ANDed) and their parameters for a Chroma-style
+    filter: `{key: value}`, `$eq`, `$in`, and `$and` of those.
+
+    Raises:
+        ValueError: on a key that isn't a plain identifier.
+    """
+    for key, value in filter.items():
+        if key == "$and":
+            for sub_filter in value:
+                filter_clauses(sub_filter, clauses, params, column)
+            continue
+        field = json_field(key, column)
+        if isinstance(value, dict) and "$in" in value:
+            values = list(value["$in"])
+            clauses.append(f"{field} IN ({','.join('?' * len(values))})")
+            params.extend(values)
+        elif isinstance(value, dict) and "$eq" in value:
+            clauses.append(f"{field} = ?")
+            params.append(value["$eq"])
+        else:
+            clauses.append(f"{field} = ?")
+            params.append(value)
+
+
+def scoped_paths(filter: Optional[Dict]) -> Optional[List[str]]:
+    """
+    The paths a filter on `relative_path` alone selects (`{key: path}`,
+    `$eq` or `$in`); None for any other filter.
+    """
+    if not filter or list(filter) != [KEY_RELATIVE_PATH]:
+        return None
+    value = filter[KEY_RELATIVE_PATH]
+    if not isinstance(value, dict):
+        return [value]
+    if list(value) == ["$in"]:
+        return list(value["$in"])
+    if list(value) == ["$eq"]:
+        return [value["$eq"]]
+    return None
@@ -0,0 +1,74 @@
+"""In-memory index of the ingested file paths, for scoped retrieval."""
+
+import bisect
+import logging
+from pathlib import PurePosixPath
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def path_language(path: str) -> str:
+    """The `language` metadata ingestion gives a file: its extension."""
+    return PurePosixPath(path).suffix.lstrip(".")
+
+
+class PathIndex:
+    """
+    Sorted relative paths of every ingested file, with lookups from
+    partial paths ("api", "src/api", "retrieval.py") to the directories
+    or files they name. Prefix scans are binary searches, so resolving a
+    scope costs O(log n + matches) however large the repo.
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        self._paths = sorted(set(paths))
+        # Trailing path components ("api", "src/api") -> full paths,
+        # directories with a trailing slash
+        self._by_suffix: Dict[str, Set[str]] = {}
+        dirs = set()
+        for path in self._paths:
+            parts = path.split("/")
+            self._add_suffixes(parts, path)
+            for depth in range(1, len(parts)):
+                dirs.add("/".join(parts[:depth]))
+        for dir_ in dirs:
+            self._add_suffixes(dir_.split("/"), dir_ + "/")
+        self.languages = {path_language(path) for path in self._paths}
+
+    def _add_suffixes(self, parts: List[str], target: str) -> None:
+        for start in range(len(parts)):
+            suffix = "/".join(parts[start:])
+            self._by_suffix.setdefault(suffix, set()).add(target)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def resolve(self, hint: str) -> List[str]:
+        """
+        Directories (ending in "/") and files that `hint` names, matched
+        on whole trailing path components; empty if none.
+        """
+        hint = hint.strip("/")
+        if hint.startswith("./"):
+            hint = hint[2:]
+        return sorted(self._by_suffix.get(hint, ()))
+
+    def files_under(
+        self, prefixes: Iterable[str], languages: Optional[Set[str]] = None
+    ) -> List[str]:
+        """Files equal to or under any of `prefixes`, in `languages`."""
+        files = []
+        for prefix in sorted(set(prefixes)):
+            i = bisect.bisect_left(self._paths, prefix)
+            while i < len(self._paths) and self._paths[i].startswith(prefix):
+                path = self._paths[i]
+                if (prefix.endswith("/") or path == prefix) and (
+                    not languages or path_language(path) in languages
+                ):
+                    files.append(path)
+                i += 1
+        return sorted(set(files))
+
+    def close(self) -> None:
+        """Nothing to release; lets the store pool evict it."""
@@ -0,0 +1,331 @@
+"""Build and refresh the summary tier: LLM summaries of files and folders."""
+
+import hashlib
+import logging
+import posixpath
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import tiktoken
+from langchain_core.embeddings import Embeddings
+
+from ingestion.chunk_code import DEFAULT_ENCODING
+from ingestion.embedding_cache import (
+    CachedEmbeddings,
+    get_ingestion_embedding_model,
+)
+from ingestion.ingestion_util import (
+    get_chunk_manifest_path,
+    get_summary_index_path,
+)
+from ingestion.manifest import ChunkManifest
+from ingestion.summary_index import KIND_DIRECTORY, KIND_FILE, SummaryIndex
+from langgraph_flow.models.openai_model import OpenAIModel
+from utils.agent_utils import PromptTemplateFile, run_llm
+from utils.constants import (
+    KEY_CODE,
+    KEY_CONCURRENCY,
+    KEY_ENABLED,
+    KEY_INFERENCE_MODEL,
+    KEY_MAX_FILE_TOKENS,
+    KEY_MODEL,
+    KEY_OPENAI,
+    KEY_PATH,
+    KEY_SUMMARIES,
+    VALUES_UTF_8,
+)
+
+logger = logging.getLogger(__name__)
+
+FILE_SUMMARY_PROMPT = "file_summary_prompt.txt"
+DIRECTORY_SUMMARY_PROMPT = "directory_summary_prompt.txt"
+DEFAULT_SUMMARY_CONCURRENCY = 8
+# Source (or child summaries) beyond this is cut before summarizing
+DEFAULT_MAX_FILE_TOKENS = 3000
+_KEY_SUMMARIES_INPUT = "summaries"
+# Files summarized, embedded and stored per step
+_BATCH_SIZE = 64
+
+
+@dataclass
+class SummaryUpdate:
+    """What one `update_summaries` run did."""
+
+    files_summarized: int = 0
+    files_reused: int = 0
+    files_unchanged: int = 0
+    directories_summarized: int = 0
+    directories_unchanged: int = 0
+    removed: int = 0
+    failed: int = 0
+
+
+def summaries_enabled(cfg: Dict) -> bool:
+    """Whether ingestion builds the summary tier (`[summaries] enabled`)."""
+    return cfg.get(KEY_SUMMARIES, {}).get(KEY_ENABLED, False)
+
+
+def _summary_llm(cfg: Dict):
+    # `[summaries] model` overrides the inference model, e.g. a cheaper one
+    model = cfg.get(KEY_SUMMARIES, {}).get(KEY_MODEL)
+    if model:
+        openai_cfg = {**cfg.get(KEY_OPENAI, {}), KEY_INFERENCE_MODEL: model}
+        cfg = {**cfg, KEY_OPENAI: openai_cfg}
+    return OpenAIModel(cfg).inference_model
+
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _directory_children(files: Iterable[str]) -> Dict[str, List[str]]:
+    """Direct children (files and subdirectories) of every directory."""
+    children: Dict[str, set] = {}
+    for path in files:
+        child, parent = path, posixpath.dirname(path)
+        while parent:
+            children.setdefault(parent, set()).add(child)
+            child, parent = parent, posixpath.dirname(parent)
+    return {directory: sorted(paths) for directory, paths in children.items()}
+
+
+class _Summarizer:
+    """Concurrent LLM summaries, embedded and stored batch by batch."""
+
+    def __init__(self, cfg, index, llm, embeddings, stats: SummaryUpdate):
+        summaries_cfg = cfg.get(KEY_SUMMARIES, {})
+        self._index = index
+        self._llm = llm
+        self._embeddings = embeddings
+        self._stats = stats
+        self._max_tokens = summaries_cfg.get(
+            KEY_MAX_FILE_TOKENS, DEFAULT_MAX_FILE_TOKENS
+        )
+        self._concurrency = summaries_cfg.get(
+            KEY_CONCURRENCY, DEFAULT_SUMMARY_CONCURRENCY
+        )
+        self._encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+        self._prompts = {
+            KIND_FILE: PromptTemplateFile(
+                FILE_SUMMARY_PROMPT, [KEY_PATH, KEY_CODE]
+            ),
+            KIND_DIRECTORY: PromptTemplateFile(
+                DIRECTORY_SUMMARY_PROMPT, [KEY_PATH, _KEY_SUMMARIES_INPUT]
+            ),
+        }
+
+    def _truncate(self, text: str) -> str:
+        ids = self._encoding.encode_ordinary(text)
+        if len(ids) <= self._max_tokens:
+            return text
+        return self._encoding.decode(ids[: self._max_tokens]) + "\n..."
+
+    def _summarize(self, kind: str, path: str, text: str) -> Optional[str]:
+        key = KEY_CODE if kind == KIND_FILE else _KEY_SUMMARIES_INPUT
+        try:
+            return run_llm(
+                self._prompts[kind].runnable(self._llm),
+                {KEY_PATH: path, key: self._truncate(text)},
+            ).strip()
+        except Exception as e:
+            logger.warning("Could not summarize %s %s: %s", kind, path, e)
+            return None
+
+    def run(self, kind: str, items: List[Tuple[str, str, str]]) -> List[str]:
+        """
+        Summarize `(path, content hash, text)` items of `kind` and store
+        them; returns the paths that got a summary.
+        """
+        done = []
+        with ThreadPoolExecutor(max_workers=self._concurrency) as pool:
+            for i in range(0, len(items), _BATCH_SIZE):
+                batch = items[i : i + _BATCH_SIZE]
+                summaries = list(
+                    pool.map(
+                        lambda item: self._summarize(kind, item[0], item[2]),
+                        batch,
+                    )
+                )
+                rows = [
+                    (path, hash_, summary)
+                    for (path, hash_, _), summary in zip(
+                        batch, summaries, strict=True
+                    )
+                    if summary
+                ]
+                self._stats.failed += len(batch) - len(rows)
+                if not rows:
+                    continue
+                vectors = self._embeddings.embed_documents(
+                    [summary for _, _, summary in rows]
+                )
+                self._index.put(
+                    (path, kind, hash_, summary, vector)
+                    for (path, hash_, summary), vector in zip(
+                        rows, vectors, strict=True
+                    )
+                )
+                done.extend(path for path, _, _ in rows)
+        return done
+
+
+def _update_files(
+    index: SummaryIndex,
+    summarizer: _Summarizer,
+    root: Path,
+    candidates: List[str],
+    stats: SummaryUpdate,
+) -> None:
+    stored = index.hashes(KIND_FILE)
+    pending: List[Tuple[str, str, str]] = []
+    for path in candidates:
+        try:
+            data = (root / path).read_bytes()
+        except OSError as e:
+            logger.warning("Skipping summary of %s: %s", path, e)
+            continue
+        hash_ = _content_hash(data)
+        if stored.get(path) == hash_:
+            stats.files_unchanged += 1
+            continue
+        pending.append(
+            (path, hash_, data.decode(VALUES_UTF_8, errors="ignore"))
+        )
+
+    # Copies and renames of summarized files keep their summary
+    reusable = index.by_hash(KIND_FILE, (hash_ for _, hash_, _ in pending))
+    index.put(
+        (path, KIND_FILE, hash_, *reusable[hash_])
+        for path, hash_, _ in pending
+        if hash_ in reusable
+    )
+    stats.files_reused = sum(hash_ in reusable for _, hash_, _ in pending)
+    pending = [item for item in pending if item[1] not in reusable]
+    stats.files_summarized = len(summarizer.run(KIND_FILE, pending))
+
+
+def _update_directories(
+    index: SummaryIndex,
+    summarizer: _Summarizer,
+    files: List[str],
+    stats: SummaryUpdate,
+) -> None:
+    """
+    Summarize directories bottom-up from their children's summaries. A
+    directory's hash covers its children's paths and hashes, so only the
+    ancestors of changed files are summarized again.
+    """
+    children = _directory_children(files)
+    stored = index.hashes(KIND_DIRECTORY)
+    stale = set(stored) - set(children)
+    if stale:
+        index.delete_paths(stale)
+        stats.removed += len(stale)
+
+    hashes = index.hashes(KIND_FILE)
+    by_depth: Dict[int, List[str]] = {}
+    for directory in children:
+        by_depth.setdefault(directory.count("/"), []).append(directory)
+    for depth in sorted(by_depth, reverse=True):
+        pending = []
+        for directory in sorted(by_depth[depth]):
+            summarized = [c for c in children[directory] if c in hashes]
+            if not summarized:
+                continue
+            hash_ = _content_hash(
+                "\n".join(f"{c} {hashes[c]}" for c in summarized).encode(
+                    VALUES_UTF_8
+                )
+            )
+            if stored.get(directory) == hash_:
+                hashes[directory] = hash_
+                stats.directories_unchanged += 1
+                continue
+            summaries = index.summaries(summarized)
+            contents = "\n".join(
+                f"- {posixpath.basename(c)}"
+                f"{'/' if c in children else ''}: {summaries[c]}"
+                for c in summarized
+                if c in summaries
+            )
+            pending.append((directory, hash_, contents))
+        done = set(summarizer.run(KIND_DIRECTORY, pending))
+        hashes.update(
+            (directory, hash_)
+            for directory, hash_, _ in pending
+            if directory in done
+        )
+        stats.directories_summarized += len(done)
+
+
+def update_summaries(
+    cfg: Dict,
+    repo_path,
+    *,
+    changed: Optional[Iterable[str]] = None,
+    llm=None,
+    embeddings: Optional[Embeddings] = None,
+) -> SummaryUpdate:
+    """
+    Bring the summary tier in line with the ingested files (the paths in
+    the chunk manifest): summarize new and modified files with the LLM,
+    then their directories from the file summaries, and embed every new
+    summary for `SummaryIndex.search`.
+
+    Summaries are keyed by content hash, so unchanged files are never
+    summarized twice, and copied or renamed ones reuse the summary of the
+    same content. Runs after `embed_documents`.
+
+    Args:
+        cfg:        Your settings.toml dict; see `[summaries]`.
+        repo_path:  The ingested checkout.
+        changed:    Incremental mode. Only these files (plus any without
+                    a summary yet) are re-read; by default every file is
+                    hashed.
+        llm:        Chat model override (e.g. a stub for benchmarks);
+                    defaults to `[summaries] model` or the inference model.
+        embeddings: Embedding model override, as in `embed_documents`.
+    """
+    start = time.perf_counter()
+    stats = SummaryUpdate()
+    manifest = ChunkManifest(get_chunk_manifest_path(cfg), read_only=True)
+    try:
+        files = manifest.paths()
+    finally:
+        manifest.close()
+
+    index = SummaryIndex(get_summary_index_path(cfg))
+    embeddings = get_ingestion_embedding_model(cfg, embeddings)
+    try:
+        file_set = set(files)
+        summarized = set(index.hashes(KIND_FILE))
+        if changed is None:
+            candidates = files
+        else:
+            candidates = sorted(
+                (set(changed) & file_set) | (file_set - summarized)
+            )
+        summarizer = _Summarizer(
+            cfg, index, llm or _summary_llm(cfg), embeddings, stats
+        )
+        _update_files(index, summarizer, Path(repo_path), candidates, stats)
+        # Only now, so renamed files could reuse their old summaries
+        stale = summarized - file_set
+        if stale:
+            index.delete_paths(stale)
+            stats.removed += len(stale)
+        _update_directories(index, summarizer, files, stats)
+    finally:
+        index.close()
+        if isinstance(embeddings, CachedEmbeddings):
+            embeddings.close()
+
+    logger.info(
+        "Summaries updated in %.1fs: %s",
+        time.perf_counter() - start,
+        stats,
+    )
+    return stats
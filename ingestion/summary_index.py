@@ -0,0 +1,224 @@
+"""Persistent file and directory summaries, searched before the chunks."""
+
+import logging
+import math
+import sqlite3
+from collections import Counter, defaultdict
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from ingestion.lexical_index import BM25_B, BM25_K1, tokenize
+
+logger = logging.getLogger(__name__)
+
+KIND_FILE = "file"
+KIND_DIRECTORY = "directory"
+# Rows per SQL statement; well below SQLite's parameter limit
+_PAGE_SIZE = 500
+
+
+class SummaryHit(NamedTuple):
+    path: str
+    kind: str
+    score: float
+
+
+def _pages(items: List, size: int = _PAGE_SIZE) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _to_blob(vector) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+class _Loaded:
+    """Every summary's path, kind, normalized vector and BM25 postings."""
+
+    def __init__(self, rows: List[Tuple]):
+        self.paths = [row[0] for row in rows]
+        self.kinds = np.array([row[1] for row in rows])
+        self.vectors = np.array(
+            [np.frombuffer(row[3], dtype=np.float32) for row in rows]
+        )
+        if rows:
+            norms = np.linalg.norm(self.vectors, axis=1, keepdims=True)
+            self.vectors /= np.where(norms == 0, 1, norms)
+        # term -> {row: term frequency}
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.lengths = []
+        for i, row in enumerate(rows):
+            tokens = tokenize(f"{row[0]} {row[2]}")
+            self.lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                self.postings[term][i] = tf
+        self.avg_len = sum(self.lengths) / len(rows) if rows else 1.0
+
+    def top(self, scores: np.ndarray, k: int, kind: str) -> List[SummaryHit]:
+        """The `k` best-scoring rows of `kind`; -inf scores never match."""
+        scores = np.where(self.kinds == kind, scores, -np.inf)
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [
+            SummaryHit(self.paths[i], kind, float(scores[i]))
+            for i in sorted(top, key=lambda i: -scores[i])
+        ]
+
+
+class SummaryIndex:
+    """
+    SQLite table of one summary per file and directory, with the content
+    hash it was generated from and its embedding.
+
+    Search is brute force over vectors and BM25 postings loaded into
+    memory on first use: a repo has a few files per hundred chunks, so the
+    whole tier fits in a small matrix. Open a new instance to see later
+    writes. Safe to share between threads.
+    """
+
+    def __init__(self, path: Path):
+        self._lock = Lock()
+        # `_Loaded` summaries for the searches
+        self._loaded: Optional[_Loaded] = None
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS summaries (
+                path TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                vector BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_summaries_hash
+                ON summaries (content_hash);
+            """
+        )
+        self._conn.commit()
+
+    def hashes(self, kind: str) -> Dict[str, str]:
+        """Content hash per summarized path of `kind`."""
+        with self._lock:
+            return dict(
+                self._conn.execute(
+                    "SELECT path, content_hash FROM summaries WHERE kind = ?",
+                    (kind,),
+                )
+            )
+
+    def by_hash(self, kind: str, hashes: Iterable[str]) -> Dict[str, Tuple]:
+        """
+        `(summary, vector blob)` of any path of `kind` summarized from
+        each of `hashes`, so copied and renamed files are not summarized
+        again.
+        """
+        found = {}
+        with self._lock:
+            for page in _pages(sorted(set(hashes))):
+                placeholders = ",".join("?" * len(page))
+                found.update(
+                    (hash_, (summary, vector))
+                    for hash_, summary, vector in self._conn.execute(
+                        f"SELECT content_hash, summary, vector FROM summaries "
+                        f"WHERE kind = ? AND content_hash IN ({placeholders})",
+                        [kind, *page],
+                    )
+                )
+        return found
+
+    def put(self, rows: Iterable[Tuple]) -> None:
+        """
+        Insert or replace `(path, kind, content hash, summary, vector)`
+        rows; the vector may be a float list or a blob from `by_hash`.
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?)",
+                (
+                    (
+                        path,
+                        kind,
+                        hash_,
+                        summary,
+                        vector
+                        if isinstance(vector, bytes)
+                        else _to_blob(vector),
+                    )
+                    for path, kind, hash_, summary, vector in rows
+                ),
+            )
+            self._conn.commit()
+
+    def delete_paths(self, paths: Iterable[str]) -> None:
+        with self._lock:
+            for page in _pages(sorted(paths)):
+                placeholders = ",".join("?" * len(page))
+                self._conn.execute(
+                    f"DELETE FROM summaries WHERE path IN ({placeholders})",
+                    page,
+                )
+            self._conn.commit()
+
+    def summaries(self, paths: Iterable[str]) -> Dict[str, str]:
+        """Summary per path, for those of `paths` that have one."""
+        found = {}
+        with self._lock:
+            for page in _pages(sorted(set(paths))):
+                placeholders = ",".join("?" * len(page))
+                found.update(
+                    self._conn.execute(
+                        f"SELECT path, summary FROM summaries "
+                        f"WHERE path IN ({placeholders})",
+                        page,
+                    )
+                )
+        return found
+
+    def _load(self) -> _Loaded:
+        with self._lock:
+            if self._loaded is None:
+                rows = self._conn.execute(
+                    "SELECT path, kind, summary, vector FROM summaries "
+                    "ORDER BY path"
+                ).fetchall()
+                self._loaded = _Loaded(rows)
+                logger.info("Loaded %d summaries", len(rows))
+            return self._loaded
+
+    def search(self, vector: List[float], k: int, kind: str) -> List:
+        """The `k` summaries of `kind` most cosine-similar to `vector`."""
+        loaded = self._load()
+        if not loaded.paths:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        scores = loaded.vectors @ (query / (np.linalg.norm(query) or 1))
+        return loaded.top(scores, k, kind)
+
+    def lexical_search(self, query: str, k: int, kind: str) -> List:
+        """The `k` summaries of `kind` with the best BM25 score for `query`."""
+        loaded = self._load()
+        scores = np.zeros(len(loaded.paths))
+        for term in set(tokenize(query)):
+            postings = loaded.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(
+                1
+                + (len(loaded.paths) - len(postings) + 0.5)
+                / (len(postings) + 0.5)
+            )
+            for i, tf in postings.items():
+                norm = 1 - BM25_B + BM25_B * loaded.lengths[i] / loaded.avg_len
+                scores[i] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+        scores[scores == 0] = -np.inf
+        return loaded.top(scores, k, kind)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,305 @@
+"""Persistent symbol table and cross-reference index for Python sources."""
+
+import ast
+import logging
+import sqlite3
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+KIND_CLASS = "class"
+KIND_FUNCTION = "function"
+KIND_METHOD = "method"
+KIND_IMPORT = "import"
+KIND_CALL = "call"
+KIND_ATTRIBUTE = "attribute"
+# Load of an imported or module-level name (type hints, callbacks, ...)
+KIND_NAME = "name"
+DEFINITION_KINDS = (KIND_CLASS, KIND_FUNCTION, KIND_METHOD)
+REFERENCE_KINDS = (KIND_IMPORT, KIND_CALL, KIND_ATTRIBUTE, KIND_NAME)
+
+_SELF_NAMES = {"self", "cls"}
+# Rows per SQL statement; well below SQLite's parameter limit
+_PAGE_SIZE = 500
+
+
+class Symbol(NamedTuple):
+    """One definition or reference found in a file."""
+
+    kind: str
+    name: str  # qualified where resolvable, e.g. "ingestion.manifest.add"
+    scope: str  # qualified name of the enclosing def, or the module
+    line: int
+    end_line: int
+
+
+class SymbolHit(NamedTuple):
+    path: str
+    kind: str
+    name: str
+    scope: str
+    line: int
+    end_line: int
+
+
+def module_name(relative_path: str) -> str:
+    """`pkg/mod.py` -> `pkg.mod`, `pkg/__init__.py` -> `pkg`."""
+    parts = list(Path(relative_path).with_suffix("").parts)
+    if parts and parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts)
+
+
+class _SymbolVisitor(ast.NodeVisitor):
+    """Collect definitions and references, resolving imported names."""
+
+    def __init__(self, relative_path: str):
+        self._module = module_name(relative_path)
+        self._package = self._module.split(".")
+        if Path(relative_path).stem != "__init__":
+            self._package = self._package[:-1]
+        # (qualified name, is_class) of the enclosing definitions
+        self._scopes = [(self._module, False)]
+        # Local name -> qualified name (imports and module-level defs)
+        self._aliases: Dict[str, str] = {}
+        self.symbols: List[Symbol] = []
+
+    def _add(self, kind: str, name: str, node: ast.AST) -> None:
+        self.symbols.append(
+            Symbol(
+                kind,
+                name,
+                self._scopes[-1][0],
+                node.lineno,
+                getattr(node, "end_lineno", None) or node.lineno,
+            )
+        )
+
+    def _enclosing_class(self) -> Optional[str]:
+        for qualname, is_class in reversed(self._scopes):
+            if is_class:
+                return qualname
+        return None
+
+    def _resolve_name(self, name: str) -> str:
+        if name in _SELF_NAMES:
+            return self._enclosing_class() or name
+        return self._aliases.get(name, name)
+
+    def _dotted(self, node: ast.AST) -> Optional[str]:
+        if isinstance(node, ast.Name):
+            return self._resolve_name(node.id)
+        if isinstance(node, ast.Attribute):
+            base = self._dotted(node.value)
+            return f"{base}.{node.attr}" if base else node.attr
+        return None
+
+    def _visit_chain_base(self, node: ast.AST) -> None:
+        # Visit whatever an attribute chain hangs off (e.g. a call result)
+        # without recording every prefix of the chain again.
+        while isinstance(node, ast.Attribute):
+            node = node.value
+        if not isinstance(node, ast.Name):
+            self.visit(node)
+
+    def _visit_def(self, node: ast.AST, kind: str) -> None:
+        qualname = f"{self._scopes[-1][0]}.{node.name}"
+        self._add(kind, qualname, node)
+        if len(self._scopes) == 1:
+            self._aliases[node.name] = qualname
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        self._scopes.append((qualname, kind == KIND_CLASS))
+        for child in node.body:
+            self.visit(child)
+        self._scopes.pop()
+        if kind == KIND_CLASS:
+            for base in node.bases:
+                self.visit(base)
+        else:
+            self.visit(node.args)
+            if node.returns:
+                self.visit(node.returns)
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self._visit_def(node, KIND_CLASS)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        in_class = self._scopes[-1][1]
+        self._visit_def(node, KIND_METHOD if in_class else KIND_FUNCTION)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            if alias.asname:
+                self._aliases[alias.asname] = alias.name
+            else:
+                top = alias.name.split(".")[0]
+                self._aliases[top] = top
+            self._add(KIND_IMPORT, alias.name, node)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        if node.level:
+            keep = len(self._package) - (node.level - 1)
+            parts = self._package[: max(keep, 0)]
+            if node.module:
+                parts = [*parts, node.module]
+            base = ".".join(parts)
+        else:
+            base = node.module or ""
+        for alias in node.names:
+            if alias.name == "*":
+                continue
+            qualname = f"{base}.{alias.name}" if base else alias.name
+            self._aliases[alias.asname or alias.name] = qualname
+            self._add(KIND_IMPORT, qualname, node)
+
+    def visit_Call(self, node: ast.Call) -> None:
+        name = self._dotted(node.func)
+        if name:
+            self._add(KIND_CALL, name, node)
+            self._visit_chain_base(node.func)
+        else:
+            self.visit(node.func)
+        for arg in node.args:
+            self.visit(arg)
+        for keyword in node.keywords:
+            self.visit(keyword.value)
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        self._add(KIND_ATTRIBUTE, self._dotted(node), node)
+        self._visit_chain_base(node)
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if isinstance(node.ctx, ast.Load) and node.id in self._aliases:
+            self._add(KIND_NAME, self._aliases[node.id], node)
+
+
+def extract_python_symbols(tree: ast.Module, relative_path: str) -> List:
+    """Definitions, imports, calls and attribute references in `tree`."""
+    visitor = _SymbolVisitor(relative_path)
+    visitor.visit(tree)
+    return visitor.symbols
+
+
+def _pages(items: List, size: int = _PAGE_SIZE) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+class SymbolIndex:
+    """
+    SQLite table of the symbols each file defines and references, keyed
+    by qualified name with line spans.
+
+    Updated per file by ingestion (`replace_file`), so incremental runs
+    only touch changed files. Safe to share between threads.
+    """
+
+    def __init__(self, path: Path):
+        self._lock = Lock()
+        self._synced_paths: Optional[Set[str]] = None
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS symbols (
+                path TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                name TEXT NOT NULL,
+                short_name TEXT NOT NULL,
+                scope TEXT NOT NULL,
+                line INTEGER NOT NULL,
+                end_line INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_symbols_short_name
+                ON symbols (short_name);
+            CREATE INDEX IF NOT EXISTS idx_symbols_path ON symbols (path);
+            """
+        )
+        self._conn.commit()
+
+    def replace_file(self, path: str, symbols: List[Symbol]) -> None:
+        """Swap in the symbols of one (re-)parsed file."""
+        with self._lock:
+            self._conn.execute("DELETE FROM symbols WHERE path = ?", (path,))
+            self._conn.executemany(
+                "INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        path,
+                        s.kind,
+                        s.name,
+                        s.name.rsplit(".", 1)[-1],
+                        s.scope,
+                        s.line,
+                        s.end_line,
+                    )
+                    for s in symbols
+                ),
+            )
+            self._conn.commit()
+            if self._synced_paths is not None:
+                self._synced_paths.add(path)
+
+    def delete_paths(self, paths: Iterable[str]) -> None:
+        with self._lock:
+            for page in _pages(sorted(paths)):
+                placeholders = ",".join("?" * len(page))
+                self._conn.execute(
+                    f"DELETE FROM symbols WHERE path IN ({placeholders})", page
+                )
+            self._conn.commit()
+
+    # Full-sync bookkeeping: files not replaced since `begin_sync` are gone
+    def begin_sync(self) -> None:
+        self._synced_paths = set()
+
+    def end_sync(self) -> None:
+        with self._lock:
+            synced, self._synced_paths = self._synced_paths or set(), None
+            stale = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT DISTINCT path FROM symbols"
+                )
+                if row[0] not in synced
+            ]
+        if stale:
+            logger.info("Dropping symbols of %d removed files", len(stale))
+            self.delete_paths(stale)
+
+    def lookup(
+        self,
+        symbol: str,
+        kinds: Iterable[str] = DEFINITION_KINDS + REFERENCE_KINDS,
+        limit: int = 200,
+    ) -> List[SymbolHit]:
+        """
+        Definitions/references of `symbol`: a bare name ("add") matches
+        any qualified name ending in it; a dotted one ("ChunkManifest.add")
+        must match the qualified name's tail.
+        """
+        kinds = list(kinds)
+        short_name = symbol.rsplit(".", 1)[-1]
+        kind_placeholders = ",".join("?" * len(kinds))
+        query = (
+            f"SELECT path, kind, name, scope, line, end_line FROM symbols "
+            f"WHERE short_name = ? AND kind IN ({kind_placeholders})"
+        )
+        params = [short_name, *kinds]
+        if "." in symbol:
+            query += " AND (name = ? OR name LIKE ? ESCAPE '\\')"
+            escaped = symbol.replace("_", "\\_").replace("%", "\\%")
+            params += [symbol, f"%.{escaped}"]
+        query += " ORDER BY path, line LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(query, [*params, limit]).fetchall()
+        return [SymbolHit(*row) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
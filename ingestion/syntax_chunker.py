@@ -0,0 +1,350 @@
+"""Syntax-aware chunking: cut files at definition boundaries, by line."""
+
+import ast
+import logging
+import re
+from functools import lru_cache
+from typing import Callable, List, NamedTuple, Optional
+
+import numpy as np
+import tiktoken
+
+try:
+    import tree_sitter
+    import tree_sitter_java
+    import tree_sitter_javascript
+    import tree_sitter_typescript
+except ImportError:  # optional: `poetry install -E syntax`
+    tree_sitter = None
+
+logger = logging.getLogger(__name__)
+
+# tree-sitter grammar per file language (extension without the dot)
+_TREE_SITTER_LANGUAGES = {
+    "js": lambda: tree_sitter_javascript.language(),
+    "ts": lambda: tree_sitter_typescript.language_typescript(),
+    "java": lambda: tree_sitter_java.language(),
+}
+_MARKDOWN_HEADING_RE = re.compile(r"(#{1,6})\s")
+_MARKDOWN_FENCE = "```"
+# Lines as `ast` and tree-sitter number them: ended by "\n" only
+_LINE_RE = re.compile(r"[^\n]*\n|[^\n]+")
+# Statement lists of compound Python statements, in source order
+_PYTHON_BODIES = ("body", "handlers", "orelse", "finalbody")
+
+
+class Chunk(NamedTuple):
+    text: str
+    # 1-based, inclusive
+    start_line: int
+    end_line: int
+    # Tokens of `text` as the file's single encoding pass cut them
+    tokens: int
+
+
+@lru_cache(maxsize=None)
+def _token_lengths(encoding_name: str) -> np.ndarray:
+    """Byte length of every token of the encoding, indexed by token id."""
+    encoding = tiktoken.get_encoding(encoding_name)
+    lengths = np.zeros(encoding.n_vocab, dtype=np.int64)
+    for token in range(encoding.n_vocab):
+        try:
+            lengths[token] = len(encoding.decode_single_token_bytes(token))
+        except KeyError:
+            # Unassigned ids between the ranks and the special tokens
+            continue
+    return lengths
+
+
+class _Unit(NamedTuple):
+    """A syntax node's line span; `node` is what `children` expands."""
+
+    start: int
+    end: int
+    node: object
+
+
+def _no_units(node) -> List[_Unit]:
+    return []
+
+
+def _python_units(node) -> List[_Unit]:
+    units = []
+    for field in _PYTHON_BODIES:
+        for child in getattr(node, field, None) or []:
+            if not hasattr(child, "lineno"):
+                continue
+            # Decorators belong to the definition they decorate
+            start = min(
+                [child.lineno]
+                + [d.lineno for d in getattr(child, "decorator_list", [])]
+            )
+            units.append(_Unit(start, child.end_lineno or child.lineno, child))
+    return units
+
+
+def _tree_sitter_units(node) -> List[_Unit]:
+    return [
+        _Unit(child.start_point[0] + 1, child.end_point[0] + 1, child)
+        for child in node.named_children
+    ]
+
+
+def _markdown_units(lines: List[str], start: int, end: int) -> List[_Unit]:
+    """
+    Sections under the shallowest heading level in lines `start..end`;
+    each unit's node is its own list of subsection units.
+    """
+    headings = []
+    in_fence = False
+    for number in range(start, end + 1):
+        line = lines[number - 1]
+        if line.lstrip().startswith(_MARKDOWN_FENCE):
+            in_fence = not in_fence
+        match = None if in_fence else _MARKDOWN_HEADING_RE.match(line)
+        if match and number > start:
+            headings.append((len(match.group(1)), number))
+    if not headings:
+        return []
+    level = min(level for level, _ in headings)
+    starts = [
+        number for heading_level, number in headings if heading_level == level
+    ]
+    ends = [number - 1 for number in starts[1:]] + [end]
+    return [
+        _Unit(s, e, _markdown_units(lines, s, e))
+        for s, e in zip(starts, ends, strict=True)
+    ]
+
+
+class _FileChunks:
+    """
+    One file, tokenized once: its lines, the byte span of every token
+    and of every line, packed into chunk spans.
+    """
+
+    def __init__(
+        self,
+        text: str,
+        lines: List[str],
+        encoding: tiktoken.Encoding,
+        chunk_tokens: int,
+        chunk_overlap: int,
+        children: Callable[[object], List[_Unit]],
+    ):
+        self._lines = lines
+        self._chunk_tokens = chunk_tokens
+        self._chunk_overlap = chunk_overlap
+        self._children = children
+        self._data = text.encode("utf-8")
+        ids = np.asarray(encoding.encode_ordinary(text), dtype=np.int64)
+        token_ends = np.cumsum(_token_lengths(encoding.name)[ids])
+        token_starts = np.concatenate(([0], token_ends[:-1]))
+        newlines = np.flatnonzero(np.frombuffer(self._data, np.uint8) == 10)
+        # Byte span of each line's text, without its newline
+        line_starts = np.concatenate(([0], newlines + 1))[: len(lines)]
+        line_ends = np.append(newlines, len(self._data))[: len(lines)]
+        # A span's tokens are those overlapping its text, so a token merging
+        # the newline at an edge with the next line's indent is left out:
+        # the ones ending after its first line starts, minus the ones
+        # starting after its last line's text ends
+        self._first = np.searchsorted(token_ends, line_starts, "right").tolist()
+        self._last = np.searchsorted(token_starts, line_ends, "left").tolist()
+        self._token_starts = token_starts.tolist()
+        self._token_ends = token_ends.tolist()
+        self._line_starts = line_starts.tolist()
+        self._line_ends = line_ends.tolist()
+
+    def _tokens(self, start: int, end: int) -> int:
+        return self._last[end - 1] - self._first[start - 1]
+
+    def _fits(self, start: int, end: int) -> bool:
+        return self._tokens(start, end) <= self._chunk_tokens
+
+    def pack(self, units: List[_Unit], start: int, end: int) -> List:
+        """
+        Line spans covering `start..end`: `units` and the gaps between
+        them, merged in order while they fit, oversized ones split.
+        """
+        segments = []
+        position = start
+        for unit in units:
+            # Siblings sharing a line: the later one starts after it
+            unit_start = max(unit.start, position)
+            unit_end = min(unit.end, end)
+            if unit_start > unit_end:
+                continue
+            if unit_start > position:
+                segments.append((position, unit_start - 1, None))
+            segments.append((unit_start, unit_end, unit.node))
+            position = unit_end + 1
+        if position <= end:
+            segments.append((position, end, None))
+
+        spans = []
+        current = None
+        for seg_start, seg_end, node in segments:
+            if current and self._fits(current[0], seg_end):
+                current = (current[0], seg_end)
+                continue
+            if self._fits(seg_start, seg_end):
+                if current:
+                    spans.append(current)
+                current = (seg_start, seg_end)
+                continue
+            child_units = self._children(node) if node is not None else []
+            if child_units:
+                pieces = self.pack(child_units, seg_start, seg_end)
+            else:
+                pieces = self._pack_lines(seg_start, seg_end)
+            # The lines before the split node join its first piece (its
+            # header), and its last piece stays open for what follows
+            if current and self._fits(current[0], pieces[0][1]):
+                pieces[0] = (current[0], pieces[0][1])
+            elif current:
+                spans.append(current)
+            current = None
+            if self._fits(*pieces[-1]):
+                current = pieces.pop()
+            spans.extend(pieces)
+        if current:
+            spans.append(current)
+        return spans
+
+    def _pack_lines(self, start: int, end: int) -> List:
+        spans = []
+        span_start = start
+        for number in range(start, end + 1):
+            if number > span_start and not self._fits(span_start, number):
+                spans.append((span_start, number - 1))
+                span_start = number
+        spans.append((span_start, end))
+        return spans
+
+    def emit(self, start: int, end: int) -> List[Chunk]:
+        # Blank lines at the edges are dropped, and the span shrunk to match
+        while start <= end and not self._lines[start - 1].strip():
+            start += 1
+        while end >= start and not self._lines[end - 1].strip():
+            end -= 1
+        if start > end:
+            return []
+        text = "".join(self._lines[start - 1 : end]).rstrip("\n")
+        if self._fits(start, end):
+            return [Chunk(text, start, end, self._tokens(start, end))]
+        return self._token_windows(start, end)
+
+    def _token_windows(self, start: int, end: int) -> List[Chunk]:
+        """
+        A single line over the budget (minified code, data), cut into
+        windows of `chunk_tokens` overlapping by `chunk_overlap`. Windows
+        are byte slices between token offsets, moved back to character
+        boundaries where a token ends inside a multi-byte character.
+        """
+        first, last = self._first[start - 1], self._last[end - 1]
+        text_start = self._line_starts[start - 1]
+        text_end = self._line_ends[end - 1]
+        step = max(1, self._chunk_tokens - self._chunk_overlap)
+        chunks = []
+        for i in range(first, last, step):
+            j = min(i + self._chunk_tokens, last)
+            piece = self._data[
+                self._char_start(max(self._token_starts[i], text_start)) : (
+                    self._char_start(min(self._token_ends[j - 1], text_end))
+                )
+            ].decode("utf-8")
+            if piece.strip():
+                chunks.append(Chunk(piece, start, end, j - i))
+            if j == last:
+                break
+        return chunks
+
+    def _char_start(self, offset: int) -> int:
+        """`offset`, or the start of the UTF-8 character it falls inside."""
+        while offset < len(self._data) and self._data[offset] & 0xC0 == 0x80:
+            offset -= 1
+        return offset
+
+
+class SyntaxChunker:
+    """
+    Split source files into chunks of at most `chunk_tokens` tokens that
+    start and end on syntax boundaries.
+
+    Top-level statements (definitions, imports, constants, module code)
+    and the lines between them are packed greedily, in order, into
+    chunks; a node too big for one chunk is split the same way over its
+    children (class members, function body statements), its header and
+    trailing lines riding along with the first and last of them. Only a
+    node without children, or a file with no syntax tree, is split by
+    lines; a single over-long line by tokens with `chunk_overlap`.
+
+    Each file is encoded once. Token counts of chunks come from the token
+    byte offsets, so no text is encoded or decoded again: a chunk counts
+    the tokens overlapping its text, which is what encoding the text
+    alone gives unless the file's encoding merged bytes across its edges
+    differently (a whitespace or punctuation run spanning the cut).
+
+    Python is parsed with `ast`; JavaScript, TypeScript and Java with
+    tree-sitter when installed (`poetry install -E syntax`); Markdown by
+    heading sections. Every line of the file lands in exactly one chunk,
+    except blank lines at chunk edges. Safe to share between threads.
+    """
+
+    def __init__(self, chunk_tokens: int, chunk_overlap: int, encoding: str):
+        self._chunk_tokens = chunk_tokens
+        self._chunk_overlap = chunk_overlap
+        self._encoding = tiktoken.get_encoding(encoding)
+        # Built once per process, then shared by every file
+        _token_lengths(encoding)
+        self._languages = {}
+
+    def _tree_sitter_root(self, text: str, lang: str):
+        if tree_sitter is None or lang not in _TREE_SITTER_LANGUAGES:
+            return None
+        if lang not in self._languages:
+            self._languages[lang] = tree_sitter.Language(
+                _TREE_SITTER_LANGUAGES[lang]()
+            )
+        # Parsers are cheap but not thread-safe: one per file
+        parser = tree_sitter.Parser(self._languages[lang])
+        return parser.parse(text.encode("utf-8")).root_node
+
+    def chunk(
+        self, text: str, lang: str, tree: Optional[ast.Module] = None
+    ) -> List[Chunk]:
+        """
+        Chunks of `text`, a file in `lang` (its extension without the
+        dot), in file order. Pass the parsed `tree` of a Python file to
+        avoid parsing it again.
+        """
+        lines = _LINE_RE.findall(text)
+        if not lines:
+            return []
+
+        units: List[_Unit] = []
+        children: Callable[[object], List[_Unit]] = _no_units
+        if lang == "py" and tree is not None:
+            units, children = _python_units(tree), _python_units
+        elif lang == "md":
+            # Markdown units carry their subsections as the node
+            units, children = _markdown_units(lines, 1, len(lines)), list
+        else:
+            root = self._tree_sitter_root(text, lang)
+            if root is not None:
+                units = _tree_sitter_units(root)
+                children = _tree_sitter_units
+
+        file_chunks = _FileChunks(
+            text,
+            lines,
+            self._encoding,
+            self._chunk_tokens,
+            self._chunk_overlap,
+            children,
+        )
+        return [
+            chunk
+            for span in file_chunks.pack(units, 1, len(lines))
+            for chunk in file_chunks.emit(*span)
+        ]
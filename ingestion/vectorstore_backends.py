@@ -0,0 +1,245 @@
+"""Pluggable vector store backends selected by `[vectorstore] type`."""
+
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from langchain.schema import Document
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+from ingestion.ingestion_util import (
+    get_persist_dir_and_collection_name_from_config,
+)
+from ingestion.manifest import PathScope
+from utils.constants import (
+    FILE_CHUNK_MANIFEST,
+    KEY_CHROMA,
+    KEY_FAISS,
+    KEY_TYPE,
+    KEY_VECTORSTORE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStoreBackend(ABC):
+    """
+    Minimal interface ingestion and retrieval need from a vector store.
+
+    Vectors are computed by the caller (see `ConcurrentEmbedder`); the
+    backend only embeds queries, with the `embeddings` it was opened with.
+    """
+
+    def __init__(self, embeddings: Embeddings):
+        self._embeddings = embeddings
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embeddings
+
+    @abstractmethod
+    def upsert(
+        self,
+        ids: List[str],
+        vectors: List[List[float]],
+        texts: List[str],
+        metadatas: List[Dict],
+    ) -> None:
+        """Insert or replace chunks with precomputed vectors."""
+
+    @abstractmethod
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]) -> None:
+        """Replace the metadata of stored chunks, keeping their vectors."""
+
+    @abstractmethod
+    def delete(self, ids: List[str]) -> None:
+        """Delete chunks by ID; unknown IDs are ignored."""
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Drop every chunk in the collection."""
+
+    @abstractmethod
+    def iter_metadata(
+        self, page_size: int
+    ) -> Iterator[Tuple[List[str], List[Dict]]]:
+        """Yield `(ids, metadatas)` pages, without documents or vectors."""
+
+    @abstractmethod
+    def similarity_search_by_vector(
+        self, vector: List[float], k: int, filter: Optional[Dict] = None
+    ) -> List[Document]:
+        """Return the `k` nearest chunks, optionally filtered on metadata."""
+
+    @abstractmethod
+    def get_vectors(self, ids: List[str]) -> Dict[str, List[float]]:
+        """Stored vectors by chunk ID; unknown IDs are left out."""
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[Dict] = None
+    ) -> List[Document]:
+        return self.similarity_search_by_vector(
+            self._embeddings.embed_query(query), k, filter
+        )
+
+    def similarity_search_by_vectors(
+        self,
+        vectors: List[List[float]],
+        k: int,
+        filter: Optional[Dict] = None,
+    ) -> List[List[Document]]:
+        """The `k` nearest chunks for each vector; backends may batch."""
+        return [
+            self.similarity_search_by_vector(vector, k, filter)
+            for vector in vectors
+        ]
+
+    def persist(self) -> None:  # noqa: B027 - optional hook
+        """Flush pending writes / rebuild derived indexes after ingestion."""
+
+    def close(self) -> None:  # noqa: B027 - optional hook
+        """Release file handles."""
+
+
+class ChromaBackend(VectorStoreBackend):
+    """`langchain_chroma.Chroma` persisted under `persist_dir`."""
+
+    def __init__(self, persist_dir, collection_name: str, embeddings):
+        super().__init__(embeddings)
+        self._store = Chroma(
+            persist_directory=str(persist_dir),
+            embedding_function=embeddings,
+            collection_name=collection_name,
+        )
+        # Chroma searches a list of IDs several times faster than it
+        # applies a metadata filter
+        self._scope = PathScope(Path(persist_dir) / FILE_CHUNK_MANIFEST)
+
+    @property
+    def collection(self):
+        return self._store._collection
+
+    def close(self) -> None:
+        self._scope.close()
+
+    def upsert(self, ids, vectors, texts, metadatas) -> None:
+        self.collection.upsert(
+            ids=ids, embeddings=vectors, metadatas=metadatas, documents=texts
+        )
+
+    def update_metadata(self, ids, metadatas) -> None:
+        if ids:
+            self.collection.update(ids=ids, metadatas=metadatas)
+
+    def delete(self, ids: List[str]) -> None:
+        if ids:
+            self._store.delete(ids=ids)
+
+    def reset(self) -> None:
+        self._store.reset_collection()
+
+    def iter_metadata(self, page_size: int):
+        offset = 0
+        while True:
+            page = self._store.get(
+                include=["metadatas"], limit=page_size, offset=offset
+            )
+            if not page["ids"]:
+                return
+            yield page["ids"], page["metadatas"]
+            offset += len(page["ids"])
+
+    def get_vectors(self, ids: List[str]) -> Dict[str, List[float]]:
+        if not ids:
+            return {}
+        found = self.collection.get(ids=ids, include=["embeddings"])
+        return dict(zip(found["ids"], found["embeddings"], strict=True))
+
+    def similarity_search(self, query, k=4, filter=None) -> List[Document]:
+        if filter:
+            return super().similarity_search(query, k, filter)
+        return self._store.similarity_search(query, k=k)
+
+    def similarity_search_by_vector(self, vector, k, filter=None):
+        if filter:
+            return self.similarity_search_by_vectors([vector], k, filter)[0]
+        return self._store.similarity_search_by_vector(vector, k=k)
+
+    def _query(self, vectors, k: int, filter: Optional[Dict]) -> Dict:
+        include = ["documents", "metadatas"]
+        ids = self._scope.ids(filter)
+        if ids == []:
+            return {key: [[] for _ in vectors] for key in ["ids", *include]}
+        if ids:
+            try:
+                return self.collection.query(
+                    query_embeddings=vectors,
+                    n_results=k,
+                    ids=ids,
+                    include=include,
+                )
+            except Exception as e:
+                # e.g. an ID the manifest has but the store lost
+                logger.warning("ID-scoped query failed (%s); filtering", e)
+        return self.collection.query(
+            query_embeddings=vectors,
+            n_results=k,
+            where=filter,
+            include=include,
+        )
+
+    def similarity_search_by_vectors(self, vectors, k, filter=None):
+        # One Chroma query for every vector
+        results = self._query(vectors, k, filter)
+        return [
+            [
+                Document(id=id_, page_content=text, metadata=metadata or {})
+                for id_, text, metadata in zip(
+                    ids, texts, metadatas, strict=True
+                )
+            ]
+            for ids, texts, metadatas in zip(
+                results["ids"],
+                results["documents"],
+                results["metadatas"],
+                strict=True,
+            )
+        ]
+
+
+def open_vectorstore_backend(
+    cfg: Dict, embeddings: Embeddings
+) -> VectorStoreBackend:
+    """
+    Open the backend named by `[vectorstore] type` ("chroma", the default,
+    or "faiss" for the local NumPy/FAISS index).
+
+    Raises:
+        ValueError: on an unknown backend type.
+    """
+    persist_dir, collection_name = (
+        get_persist_dir_and_collection_name_from_config(cfg)
+    )
+    store_cfg = cfg.get(KEY_VECTORSTORE, {})
+    backend_type = store_cfg.get(KEY_TYPE, KEY_CHROMA)
+    logger.info(
+        "Opening %s vectorstore '%s' at %s",
+        backend_type,
+        collection_name,
+        persist_dir,
+    )
+    if backend_type == KEY_CHROMA:
+        return ChromaBackend(persist_dir, collection_name, embeddings)
+    if backend_type == KEY_FAISS:
+        # Imported lazily: pulls in numpy and, if installed, faiss
+        from ingestion.local_vectorstore import LocalVectorStore
+
+        return LocalVectorStore(
+            persist_dir / collection_name,
+            embeddings,
+            store_cfg,
+            manifest_path=persist_dir / FILE_CHUNK_MANIFEST,
+        )
+    raise ValueError(f"Unknown vectorstore type: {backend_type}")
@@ -1,17 +1,17 @@
 """Base Agent Class that each Agent can inherit from."""
 
+import asyncio
 import logging
 from typing import Dict, Optional
 
-from langchain import PromptTemplate
-
 from langgraph_flow.models.assistant_state import AssistantState
 from langgraph_flow.models.openai_model import OpenAIModel
 from utils.agent_utils import (
-    get_agent_prompt_template,
+    PromptTemplateFile,
+    astream_llm,
     get_question_and_config_from_state,
     get_relevant_code_context_chunks_from_vectorstore,
-    run_llm,
+    stream_llm,
 )
 from utils.constants import KEY_CODE, KEY_QUESTION, KEY_RESPONSE
 
@@ -19,6 +19,11 @@ logger = logging.getLogger(__name__)
 
 
 class Agent:
+    """
+    Built once per graph (see `AgentRegistry`): the prompt file is read
+    and parsed here, and `infer` reuses the compiled prompt | llm runnable.
+    """
+
     def __init__(
         self,
         agent_type: str,
@@ -26,12 +31,19 @@ class Agent:
         default_top_k: int,
         is_input_code: bool,
         is_input_question: bool,
+        hot_reload_prompt: bool = False,
     ):
         self._agent_type = agent_type
         self._prompt_file = prompt_file
         self._default_top_k = default_top_k
         self._is_input_code = is_input_code
         self._is_input_question = is_input_question
+        self._prompt = None
+        if prompt_file and (is_input_code or is_input_question):
+            input_keys = list(self._create_llm_infer_params("", ""))
+            self._prompt = PromptTemplateFile(
+                prompt_file, input_keys, hot_reload_prompt
+            )
 
     def _create_llm_infer_params(self, question: str, code_context: str):
         input_params = {}
@@ -41,29 +53,33 @@ class Agent:
             input_params[KEY_CODE] = code_context
         return input_params
 
-    def _get_prompt_template(self, input_params: Dict):
-        input_keys = list(input_params.keys())
-        template_str = get_agent_prompt_template(self._prompt_file)
-        prompt_template = PromptTemplate(
-            input_variables=input_keys, template=template_str
+    def _llm_failed(self, ex: Exception, state: AssistantState) -> Dict:
+        logger.error(
+            "LLM %s generation failed: %s",
+            self._agent_type,
+            ex,
+            exc_info=True,
         )
-        return prompt_template
+        return {
+            **state.dict(),
+            KEY_RESPONSE: f"Error: failed to generate {self._agent_type} summary.",
+        }
 
     def _infer_llm(self, runnable, input_params, state):
         try:
             logger.info(f"Sending {self._agent_type} prompt to llm")
-            result = run_llm(runnable, input_params)
+            result = stream_llm(runnable, input_params)
         except Exception as ex:
-            logger.error(
-                "LLM %s generation failed: %s",
-                self._agent_type,
-                ex,
-                exc_info=True,
-            )
-            return {
-                **state,
-                KEY_RESPONSE: f"Error: failed to generate {self._agent_type} summary.",
-            }
+            return self._llm_failed(ex, state)
+        logger.info(f"Generated {self._agent_type} summary successfully")
+        return {**state.dict(), KEY_RESPONSE: result}
+
+    async def _ainfer_llm(self, runnable, input_params, state):
+        try:
+            logger.info(f"Sending {self._agent_type} prompt to llm")
+            result = await astream_llm(runnable, input_params)
+        except Exception as ex:
+            return self._llm_failed(ex, state)
         logger.info(f"Generated {self._agent_type} summary successfully")
         return {**state.dict(), KEY_RESPONSE: result}
 
@@ -72,18 +88,33 @@ class Agent:
         response = f"Here are the relevant code snippets:\n\n" + code_context
         return {**state.dict(), KEY_RESPONSE: response}
 
-    def infer(self, state: AssistantState):
-        question, cfg = get_question_and_config_from_state(state)
-        code_context = get_relevant_code_context_chunks_from_vectorstore(
+    def _get_code_context(self, cfg: Dict, question: str) -> str:
+        return get_relevant_code_context_chunks_from_vectorstore(
             cfg, question, self._agent_type, self._default_top_k
         )
+
+    def infer(self, state: AssistantState):
+        question, cfg = get_question_and_config_from_state(state)
+        code_context = self._get_code_context(cfg, question)
         # If there is a code to be sent and/or question to be asked to llm
-        if self._is_input_code or self._is_input_question:
+        if self._prompt is not None:
             llm = OpenAIModel(cfg).inference_model
             input_params = self._create_llm_infer_params(question, code_context)
-            prompt_template = self._get_prompt_template(input_params)
-            runnable = prompt_template | llm
+            runnable = self._prompt.runnable(llm)
             return self._infer_llm(runnable, input_params, state)
         # Else the task is just retrieval of code - llm is not needed
         else:
             return self._format_code_response(code_context, state)
+
+    async def ainfer(self, state: AssistantState):
+        """`infer` for async graph runs; retrieval runs in a worker thread."""
+        question, cfg = get_question_and_config_from_state(state)
+        code_context = await asyncio.to_thread(
+            self._get_code_context, cfg, question
+        )
+        if self._prompt is not None:
+            llm = OpenAIModel(cfg).inference_model
+            input_params = self._create_llm_infer_params(question, code_context)
+            runnable = self._prompt.runnable(llm)
+            return await self._ainfer_llm(runnable, input_params, state)
+        return self._format_code_response(code_context, state)
@@ -0,0 +1,63 @@
+"""Graph nodes that short-circuit repeated questions via the answer cache."""
+
+import logging
+import time
+from typing import Dict
+
+from langgraph_flow.models.assistant_state import AssistantState
+from utils.agent_utils import get_question_and_config_from_state
+from utils.answer_cache import load_answer_cache
+from utils.constants import (
+    KEY_CACHE_HIT,
+    KEY_RESPONSE,
+    KEY_STARTED_AT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Prefix of the fallback response agents return when the LLM call fails
+_ERROR_RESPONSE_PREFIX = "Error:"
+
+
+def lookup_answer(state: AssistantState) -> Dict:
+    """
+    Answer from the cache when the same or a near-identical question of
+    the classified intent was answered at the current commit; otherwise
+    just stamp the start time so `store_answer` can record how long the
+    answer took.
+    """
+    question, cfg = get_question_and_config_from_state(state)
+    update = {**state.dict(), KEY_STARTED_AT: time.perf_counter()}
+    cache = load_answer_cache(cfg)
+    if cache is None:
+        return update
+    try:
+        hit = cache.lookup(question, state.intent)
+    except Exception as e:
+        # The cache is an optimization; never fail the question over it
+        logger.warning("Answer cache lookup failed: %s", e, exc_info=True)
+        return update
+    if hit is None:
+        return update
+    return {**update, KEY_RESPONSE: hit.response, KEY_CACHE_HIT: True}
+
+
+def store_answer(state: AssistantState) -> Dict:
+    """Cache the agent's answer together with the time it took."""
+    question, cfg = get_question_and_config_from_state(state)
+    cache = load_answer_cache(cfg)
+    response = state.response
+    if (
+        cache is None
+        or not response
+        or response.startswith(_ERROR_RESPONSE_PREFIX)
+    ):
+        return state.dict()
+    latency_s = (
+        time.perf_counter() - state.started_at if state.started_at else 0.0
+    )
+    try:
+        cache.store(question, state.intent, response, latency_s)
+    except Exception as e:
+        logger.warning("Failed to cache answer: %s", e, exc_info=True)
+    return state.dict()
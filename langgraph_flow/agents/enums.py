@@ -8,3 +8,11 @@ class Intent(Enum):
     RETRIEVE = "retrieve"
     EXPLAIN = "explain"
     NAVIGATE = "navigate"
+
+
+class Node(Enum):
+    """Graph nodes that aren't intents."""
+
+    ANSWER_CACHE_LOOKUP = "answer_cache_lookup"
+    ANSWER_CACHE_STORE = "answer_cache_store"
+    CLARIFY = "clarify"
@@ -1,52 +1,127 @@
 import logging
+import time
+from typing import Dict, Optional
 
-from langchain import PromptTemplate
-
+from langgraph_flow.agents.enums import Node
+from langgraph_flow.agents.local_intent_classifier import (
+    load_local_intent_classifier,
+)
 from langgraph_flow.models.assistant_state import AssistantState
 from langgraph_flow.models.openai_model import OpenAIModel
 from utils.agent_utils import (
-    get_agent_prompt_template,
+    PromptTemplateFile,
+    arun_llm,
     get_question_and_config_from_state,
     run_llm,
 )
-from utils.constants import ALLOWED_INTENTS, KEY_INTENT, KEY_QUESTION
+from utils.constants import (
+    ALLOWED_INTENTS,
+    KEY_INTENT,
+    KEY_QUESTION,
+    KEY_RESPONSE,
+)
 
 logger = logging.getLogger(__name__)
 INTENT_PROMPT_TEMPLATE_TEXT = "intent_prompt.txt"
-template_str = get_agent_prompt_template(INTENT_PROMPT_TEMPLATE_TEXT)
-INTENT_PROMPT = PromptTemplate(
-    input_variables=[KEY_QUESTION],
-    template=template_str,
+
+
+CLARIFY_RESPONSE = (
+    "Sorry - the intent of your question was unclear. Please rephrase it "
+    "as a request to retrieve, explain or navigate code."
 )
 
 
-def classify_intent(state: AssistantState) -> dict:
-    """
-    Analyze the user’s question and classify it into one of:
-      - 'retrieve' (fetch relevant code snippets)
-      - 'explain'  (describe what a snippet does)
-      - 'navigate' (trace symbol usage across the repo)
+def _classify_locally(local_classifier, question: str) -> Optional[str]:
+    if local_classifier is None:
+        return None
+    start = time.perf_counter()
+    prediction = local_classifier.classify(question)
+    if not prediction:
+        return None
+    intent, source = prediction
+    logger.info(
+        "Intent classified locally as '%s' by %s in %.2f ms",
+        intent,
+        source,
+        1000 * (time.perf_counter() - start),
+    )
+    return intent
 
-    Adds 'intent' to the state for downstream routing.
-    """
-    question, cfg = get_question_and_config_from_state(state)
-    llm = OpenAIModel(cfg).inference_model
-    runnable = INTENT_PROMPT | llm
-
-    logger.debug("Dispatching intent-classification prompt to LLM")
-    try:
-        raw = run_llm(runnable, {KEY_QUESTION: question})
-        while raw not in ALLOWED_INTENTS:
-            logger.warning(
-                "Sorry - intent of question was unclear. Please rephrase question"
-            )
-            question = input("\n❓ Ask your codebase: ").strip()
-            raw = run_llm(runnable, {KEY_QUESTION: question})
-            state.question = question
-        intent = raw
-    except Exception as e:
-        logger.error("LLM intent classification failed: %s", e, exc_info=True)
-        raise e
+
+def _apply_llm_label(state: AssistantState, raw: str, local_classifier) -> Dict:
+    intent = raw.strip().strip(".'\"`").lower()
+    if intent not in ALLOWED_INTENTS:
+        # Ask the user to rephrase instead of blocking on input(), so the
+        # graph can run headless (server, benchmarks)
+        logger.warning("Intent of question was unclear (LLM said %r)", raw)
+        return {**state.dict(), KEY_INTENT: Node.CLARIFY.value}
 
     logger.info("Intent classified as '%s'", intent)
+    if local_classifier is not None:
+        local_classifier.record(state.question, intent)
     return {**state.dict(), KEY_INTENT: intent}
+
+
+class IntentClassifier:
+    """
+    The classify node. Built once per graph (see `AgentRegistry`), like
+    the agents, so its prompt is parsed once and hot reloaded with theirs.
+    """
+
+    def __init__(self, hot_reload_prompt: bool = False):
+        self._prompt = PromptTemplateFile(
+            INTENT_PROMPT_TEMPLATE_TEXT, [KEY_QUESTION], hot_reload_prompt
+        )
+
+    def classify(self, state: AssistantState) -> Dict:
+        """
+        Analyze the user’s question and classify it into one of:
+          - 'retrieve' (fetch relevant code snippets)
+          - 'explain'  (describe what a snippet does)
+          - 'navigate' (trace symbol usage across the repo)
+
+        Adds 'intent' to the state for downstream routing; 'clarify' when
+        the LLM can't tell. Confident cases are decided by the local
+        classifier (keyword rules, then a naive Bayes model trained on past
+        LLM labels) without an LLM call.
+        """
+        question, cfg = get_question_and_config_from_state(state)
+        local_classifier = load_local_intent_classifier(cfg)
+        intent = _classify_locally(local_classifier, question)
+        if intent:
+            return {**state.dict(), KEY_INTENT: intent}
+
+        runnable = self._prompt.runnable(OpenAIModel(cfg).inference_model)
+        logger.debug("Dispatching intent-classification prompt to LLM")
+        try:
+            raw = run_llm(runnable, {KEY_QUESTION: question})
+        except Exception as e:
+            logger.error(
+                "LLM intent classification failed: %s", e, exc_info=True
+            )
+            raise e
+        return _apply_llm_label(state, raw, local_classifier)
+
+    async def aclassify(self, state: AssistantState) -> Dict:
+        """`classify` for async graph runs."""
+        question, cfg = get_question_and_config_from_state(state)
+        local_classifier = load_local_intent_classifier(cfg)
+        intent = _classify_locally(local_classifier, question)
+        if intent:
+            return {**state.dict(), KEY_INTENT: intent}
+
+        runnable = self._prompt.runnable(OpenAIModel(cfg).inference_model)
+        logger.debug("Dispatching intent-classification prompt to LLM")
+        try:
+            raw = await arun_llm(runnable, {KEY_QUESTION: question})
+        except Exception as e:
+            logger.error(
+                "LLM intent classification failed: %s", e, exc_info=True
+            )
+            raise e
+        return _apply_llm_label(state, raw, local_classifier)
+
+
+def clarify(state: AssistantState) -> Dict:
+    """Answer with a request to rephrase the question."""
+    return {**state.dict(), KEY_RESPONSE: CLARIFY_RESPONSE}
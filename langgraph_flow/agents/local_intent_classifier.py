@@ -0,0 +1,280 @@
+"""Local intent classifier tier in front of the LLM classifier."""
+
+import json
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+from itertools import pairwise
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langgraph_flow.agents.enums import Intent
+from utils.constants import (
+    ALLOWED_INTENTS,
+    FILE_INTENT_LOG,
+    KEY_BASE_DIRECTORY,
+    KEY_ENABLED,
+    KEY_INTENT,
+    KEY_INTENT_CLASSIFIER,
+    KEY_LOG_QUESTIONS,
+    KEY_MAX_ENTRIES,
+    KEY_MIN_CONFIDENCE,
+    KEY_PATH,
+    KEY_QUESTION,
+    KEY_VECTORSTORE,
+    VALUES_UTF_8,
+)
+from utils.resource_pool import ResourcePool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_CONFIDENCE = 0.9
+# Labelled questions needed before the statistical model is trusted
+DEFAULT_MIN_EXAMPLES = 30
+# Logged questions kept; beyond that the oldest are dropped, down to 90%
+# so that the log isn't rewritten on every question
+DEFAULT_MAX_LOG_ENTRIES = 5000
+_LOG_TRIM_RATIO = 0.9
+SOURCE_RULES = "rules"
+SOURCE_MODEL = "model"
+
+# Phrases that, on their own, decide the intent. A question matching the
+# phrases of more than one intent is left to the model / LLM.
+_RULES = {
+    Intent.NAVIGATE.value: [
+        r"\bwhere\b.*\b(used|defined|called|declared|imported|set)\b",
+        r"\bwho (calls|uses|imports)\b",
+        r"\b(call sites?|callers|usages?|references?)\b",
+        r"\btrace\b",
+        r"\bfind (all )?(uses|usages|references)\b",
+    ],
+    Intent.EXPLAIN.value: [
+        r"^\s*(explain|describe|summari[sz]e)\b",
+        r"\bwhat (does|do|is the purpose of)\b",
+        r"\bhow does\b.*\bwork\b",
+        r"\bwhy (does|do|is)\b",
+        r"\bwalk me through\b",
+    ],
+    Intent.RETRIEVE.value: [
+        r"^\s*(show|give|get|fetch|list|find) me\b",
+        r"^\s*(show|fetch|list)\b",
+        r"\b(code|snippets?|source) (for|of)\b",
+    ],
+}
+_COMPILED_RULES = {
+    intent: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    for intent, patterns in _RULES.items()
+}
+_WORD_RE = re.compile(r"[a-z_][a-z0-9_]*")
+
+
+def rule_intent(question: str) -> Optional[str]:
+    """The intent whose phrases alone match `question`, if exactly one."""
+    matched = {
+        intent
+        for intent, patterns in _COMPILED_RULES.items()
+        if any(pattern.search(question) for pattern in patterns)
+    }
+    return matched.pop() if len(matched) == 1 else None
+
+
+def _features(question: str) -> List[str]:
+    words = _WORD_RE.findall(question.lower())
+    return words + [f"{a} {b}" for a, b in pairwise(words)]
+
+
+class NaiveBayesIntentModel:
+    """
+    Multinomial naive Bayes over question words and bigrams, trained
+    online from labelled questions. Prediction is a few dict lookups per
+    feature, so well under a millisecond.
+    """
+
+    def __init__(self, labels: Iterable[str], alpha: float = 1.0):
+        self._labels = sorted(labels)
+        self._alpha = alpha
+        self._label_counts: Counter = Counter()
+        self._feature_counts: Dict[str, Counter] = defaultdict(Counter)
+        self._feature_totals: Counter = Counter()
+        self._vocabulary = set()
+
+    @property
+    def n_examples(self) -> int:
+        return sum(self._label_counts.values())
+
+    def update(self, question: str, label: str) -> None:
+        if label not in self._labels:
+            return
+        features = _features(question)
+        self._label_counts[label] += 1
+        self._feature_counts[label].update(features)
+        self._feature_totals[label] += len(features)
+        self._vocabulary.update(features)
+
+    def predict(self, question: str) -> Tuple[Optional[str], float]:
+        """Most likely label and its posterior probability."""
+        n_examples = self.n_examples
+        if not n_examples:
+            return None, 0.0
+        features = _features(question)
+        vocabulary_size = len(self._vocabulary) + 1
+        log_scores = {}
+        for label in self._labels:
+            counts = self._feature_counts[label]
+            denominator = math.log(
+                self._feature_totals[label] + self._alpha * vocabulary_size
+            )
+            log_scores[label] = math.log(
+                (self._label_counts[label] + self._alpha)
+                / (n_examples + self._alpha * len(self._labels))
+            ) + sum(
+                math.log(counts[feature] + self._alpha) - denominator
+                for feature in features
+            )
+        best = max(log_scores, key=log_scores.get)
+        normalizer = sum(
+            math.exp(score - log_scores[best]) for score in log_scores.values()
+        )
+        return best, 1.0 / normalizer
+
+
+class LocalIntentClassifier:
+    """
+    Rules, then naive Bayes, for the questions they are confident about;
+    None otherwise so the caller asks the LLM and `record`s its label.
+
+    The model trains on the JSONL log at `log_path`, if there is one, on
+    start-up, then on LLM labels as they come. Only with `log_questions`
+    are those labelled questions (user text, verbatim) appended to the
+    log, which keeps the newest `max_log_entries` and also feeds
+    `benchmarks.intent_eval`.
+    """
+
+    def __init__(
+        self,
+        log_path: Path,
+        min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+        min_examples: int = DEFAULT_MIN_EXAMPLES,
+        *,
+        log_questions: bool = False,
+        max_log_entries: int = DEFAULT_MAX_LOG_ENTRIES,
+    ):
+        self._log_path = Path(log_path)
+        self._min_confidence = min_confidence
+        self._min_examples = min_examples
+        self._log_questions = log_questions
+        self._max_log_entries = max_log_entries
+        self._lock = Lock()
+        self.model = NaiveBayesIntentModel(ALLOWED_INTENTS)
+        logged = load_intent_log(self._log_path)
+        self._n_logged = len(logged)
+        for question, label in logged[-max_log_entries:]:
+            self.model.update(question, label)
+        logger.info(
+            "Local intent model trained on %d logged questions",
+            self.model.n_examples,
+        )
+
+    def classify(self, question: str) -> Optional[Tuple[str, str]]:
+        """`(intent, source)` when confident, else None."""
+        intent = rule_intent(question)
+        if intent:
+            return intent, SOURCE_RULES
+        with self._lock:
+            if self.model.n_examples < self._min_examples:
+                return None
+            intent, confidence = self.model.predict(question)
+        if intent and confidence >= self._min_confidence:
+            return intent, SOURCE_MODEL
+        return None
+
+    def record(self, question: str, intent: str) -> None:
+        """Learn from (and, if enabled, log) an LLM-labelled question."""
+        with self._lock:
+            self.model.update(question, intent)
+            if not self._log_questions:
+                return
+            self._log_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self._log_path, "a", encoding=VALUES_UTF_8) as f:
+                f.write(
+                    json.dumps({KEY_QUESTION: question, KEY_INTENT: intent})
+                    + "\n"
+                )
+            self._n_logged += 1
+            if self._n_logged > self._max_log_entries:
+                self._trim_log()
+
+    def _trim_log(self) -> None:
+        keep = load_intent_log(self._log_path)[
+            -int(self._max_log_entries * _LOG_TRIM_RATIO) :
+        ]
+        tmp_path = self._log_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding=VALUES_UTF_8) as f:
+            for question, intent in keep:
+                f.write(
+                    json.dumps({KEY_QUESTION: question, KEY_INTENT: intent})
+                    + "\n"
+                )
+        tmp_path.replace(self._log_path)
+        self._n_logged = len(keep)
+
+
+def load_intent_log(path: Path) -> List[Tuple[str, str]]:
+    """`(question, intent)` pairs from a JSONL intent log."""
+    pairs = []
+    if not Path(path).exists():
+        return pairs
+    with open(path, encoding=VALUES_UTF_8) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                pairs.append((entry[KEY_QUESTION], entry[KEY_INTENT]))
+            except (ValueError, KeyError):
+                continue  # torn write from a crashed session
+    return pairs
+
+
+def get_intent_log_path(cfg: Dict) -> Path:
+    """Shared by every repo: labels don't depend on the codebase."""
+    classifier_cfg = cfg.get(KEY_INTENT_CLASSIFIER, {})
+    return Path(
+        classifier_cfg.get(KEY_PATH)
+        or Path(cfg[KEY_VECTORSTORE][KEY_BASE_DIRECTORY]) / FILE_INTENT_LOG
+    )
+
+
+# Classifiers per (log, settings), like the other per-config singletons
+_MAX_CLASSIFIERS = 8
+_CLASSIFIERS = ResourcePool("local intent classifier", _MAX_CLASSIFIERS)
+
+
+def load_local_intent_classifier(
+    cfg: Dict,
+) -> Optional[LocalIntentClassifier]:
+    """
+    The process-wide local classifier, or None if disabled in config.
+    Questions are only written to the intent log with
+    `[intent_classifier] log_questions = true`.
+    """
+    classifier_cfg = cfg.get(KEY_INTENT_CLASSIFIER, {})
+    if not classifier_cfg.get(KEY_ENABLED, True):
+        return None
+    log_path = get_intent_log_path(cfg)
+    min_confidence = classifier_cfg.get(
+        KEY_MIN_CONFIDENCE, DEFAULT_MIN_CONFIDENCE
+    )
+    log_questions = classifier_cfg.get(KEY_LOG_QUESTIONS, False)
+    max_log_entries = classifier_cfg.get(
+        KEY_MAX_ENTRIES, DEFAULT_MAX_LOG_ENTRIES
+    )
+    return _CLASSIFIERS.get(
+        (log_path, min_confidence, log_questions, max_log_entries),
+        lambda: LocalIntentClassifier(
+            log_path,
+            min_confidence,
+            log_questions=log_questions,
+            max_log_entries=max_log_entries,
+        ),
+    )
@@ -1,19 +1,36 @@
+import logging
 from typing import Dict
 
 from langgraph_flow.agents.agent import Agent
 from langgraph_flow.agents.enums import Intent
-from langgraph_flow.models.assistant_state import AssistantState
 from utils.constants import DEFAULT_TOP_K_NAVIGATOR
+from utils.retrieval import get_symbol_context
+from utils.tracing import ATTR_CONTEXT_CHARS, SPAN_SYMBOL_LOOKUP, trace_span
+
+logger = logging.getLogger(__name__)
 
 NAVIGATOR_PROMPT_TEMPLATE_TEXT = "navigation_prompt.txt"
 
 
-def navigate_code(state: AssistantState) -> Dict:
-    agent = Agent(
+class NavigatorAgent(Agent):
+    """Answers from the symbol index when the question names symbols."""
+
+    def _get_code_context(self, cfg: Dict, question: str) -> str:
+        with trace_span(SPAN_SYMBOL_LOOKUP, agent=self._agent_type) as span:
+            code_context = get_symbol_context(cfg, question)
+            span[ATTR_CONTEXT_CHARS] = len(code_context or "")
+        if code_context:
+            return code_context
+        logger.info("No indexed symbols in question; using code search")
+        return super()._get_code_context(cfg, question)
+
+
+def create_navigator_agent(hot_reload_prompt: bool = False) -> Agent:
+    return NavigatorAgent(
         agent_type=Intent.NAVIGATE.value,
         prompt_file=NAVIGATOR_PROMPT_TEMPLATE_TEXT,
         default_top_k=DEFAULT_TOP_K_NAVIGATOR,
         is_input_code=True,
         is_input_question=False,
+        hot_reload_prompt=hot_reload_prompt,
     )
-    return agent.infer(state)
@@ -0,0 +1,47 @@
+"""Agents built once per graph, keyed by the intent they handle."""
+
+import logging
+from typing import Callable, Dict, Iterator, Tuple
+
+from langgraph_flow.agents.agent import Agent
+from langgraph_flow.agents.enums import Intent
+from langgraph_flow.agents.explainer_agent import create_explainer_agent
+from langgraph_flow.agents.intent_classifier import IntentClassifier
+from langgraph_flow.agents.navigator_agent import create_navigator_agent
+from langgraph_flow.agents.retriever_agent import create_retriever_agent
+
+logger = logging.getLogger(__name__)
+
+_AGENT_FACTORIES: Dict[str, Callable[[bool], Agent]] = {
+    Intent.RETRIEVE.value: create_retriever_agent,
+    Intent.EXPLAIN.value: create_explainer_agent,
+    Intent.NAVIGATE.value: create_navigator_agent,
+}
+
+
+class AgentRegistry:
+    """
+    One `Agent` per intent, and the `IntentClassifier` routing to them,
+    with their prompt templates read and parsed at construction, so
+    answering a question costs no file I/O or template parsing. With
+    `hot_reload_prompts`, edited prompt files are picked up on the next
+    question (checked by mtime).
+    """
+
+    def __init__(self, hot_reload_prompts: bool = False):
+        self.intent_classifier = IntentClassifier(hot_reload_prompts)
+        self._agents = {
+            intent: factory(hot_reload_prompts)
+            for intent, factory in _AGENT_FACTORIES.items()
+        }
+        logger.info(
+            "Registered agents: %s (prompt hot reload %s)",
+            ", ".join(self._agents),
+            "on" if hot_reload_prompts else "off",
+        )
+
+    def __getitem__(self, intent: str) -> Agent:
+        return self._agents[intent]
+
+    def items(self) -> Iterator[Tuple[str, Agent]]:
+        return iter(self._agents.items())
@@ -1,20 +1,18 @@
 import logging
-from typing import Dict
 
 from langgraph_flow.agents.agent import Agent
 from langgraph_flow.agents.enums import Intent
-from langgraph_flow.models.assistant_state import AssistantState
 from utils.constants import DEFAULT_TOK_K_RETRIEVER
 
 logger = logging.getLogger(__name__)
 
 
-def retrieve_code(state: AssistantState) -> Dict:
-    agent = Agent(
+def create_retriever_agent(hot_reload_prompt: bool = False) -> Agent:
+    return Agent(
         agent_type=Intent.RETRIEVE.value,
         prompt_file=None,
         default_top_k=DEFAULT_TOK_K_RETRIEVER,
         is_input_code=False,
         is_input_question=False,
+        hot_reload_prompt=hot_reload_prompt,
     )
-    return agent.infer(state)
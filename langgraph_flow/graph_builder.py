@@ -1,12 +1,16 @@
+import asyncio
 import logging
+from typing import Callable, Dict, Optional
 
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import END, StateGraph
 
-from .agents.enums import Intent
-from .agents.explainer_agent import explain_code
-from .agents.intent_classifier import classify_intent
-from .agents.navigator_agent import navigate_code
-from .agents.retriever_agent import retrieve_code
+from utils.constants import KEY_HOT_RELOAD, KEY_PROMPTS
+
+from .agents.answer_cache import lookup_answer, store_answer
+from .agents.enums import Intent, Node
+from .agents.intent_classifier import clarify
+from .agents.registry import AgentRegistry
 from .models.assistant_state import AssistantState
 
 logger = logging.getLogger(__name__)
@@ -19,33 +23,74 @@ def _route(state: AssistantState):
     return intent
 
 
-def build_graph():
+def _node(func: Callable, afunc: Optional[Callable] = None) -> RunnableLambda:
+    """
+    A node for both `invoke`/`stream` and `ainvoke`/`astream`. Without an
+    async implementation the blocking sync one runs in a worker thread,
+    so it never stalls the event loop.
+    """
+    if afunc is None:
+
+        async def afunc(state):
+            return await asyncio.to_thread(func, state)
+
+    return RunnableLambda(func, afunc=afunc)
+
+
+def _route_after_classify(state: AssistantState):
+    # Requests to rephrase aren't answers worth caching
+    if state.intent == Node.CLARIFY.value:
+        return Node.CLARIFY.value
+    return Node.ANSWER_CACHE_LOOKUP.value
+
+
+def _route_after_cache_lookup(state: AssistantState):
+    return END if state.cache_hit else _route(state)
+
+
+def build_graph(cfg: Optional[Dict] = None):
     """
     Build and compile the LangGraph StateGraph for the Codebase Assistant.
 
+    Agents and their prompt templates are created here once and reused by
+    every question.
+
     Args:
-        cfg: Configuration dict (will be passed through the state)
+        cfg: Configuration dict (will be passed through the state); only
+            `[prompts] hot_reload` is read at build time
 
     Returns:
         A compiled StateGraph instance ready to run.
     """
     logger.info("Initializing LangGraph flow")
     graph = StateGraph(state_schema=AssistantState)
+    hot_reload = (cfg or {}).get(KEY_PROMPTS, {}).get(KEY_HOT_RELOAD, False)
+    agents = AgentRegistry(hot_reload_prompts=hot_reload)
 
     # Add processing nodes
-    graph.add_node(Intent.CLASSIFY.value, classify_intent)
-    graph.add_node(Intent.RETRIEVE.value, retrieve_code)
-    graph.add_node(Intent.EXPLAIN.value, explain_code)
-    graph.add_node(Intent.NAVIGATE.value, navigate_code)
+    graph.add_node(Node.ANSWER_CACHE_LOOKUP.value, _node(lookup_answer))
+    graph.add_node(Node.ANSWER_CACHE_STORE.value, _node(store_answer))
+    classifier = agents.intent_classifier
+    graph.add_node(
+        Intent.CLASSIFY.value, _node(classifier.classify, classifier.aclassify)
+    )
+    graph.add_node(Node.CLARIFY.value, clarify)
+    for intent, agent in agents.items():
+        graph.add_node(intent, _node(agent.infer, agent.ainfer))
 
-    # Entry point: classify user intent first
+    # Entry point: classify user intent first, then answer repeated
+    # questions of that intent from the cache
     graph.set_entry_point(Intent.CLASSIFY.value)
-    graph.add_conditional_edges(Intent.CLASSIFY.value, _route)
+    graph.add_conditional_edges(Intent.CLASSIFY.value, _route_after_classify)
+    graph.add_conditional_edges(
+        Node.ANSWER_CACHE_LOOKUP.value, _route_after_cache_lookup
+    )
 
-    # Mark terminal nodes
-    graph.add_edge(Intent.RETRIEVE.value, END)
-    graph.add_edge(Intent.EXPLAIN.value, END)
-    graph.add_edge(Intent.NAVIGATE.value, END)
+    # Agents hand their answer to the cache, then finish
+    for intent, _ in agents.items():
+        graph.add_edge(intent, Node.ANSWER_CACHE_STORE.value)
+    graph.add_edge(Node.ANSWER_CACHE_STORE.value, END)
+    graph.add_edge(Node.CLARIFY.value, END)
 
     logger.info("LangGraph flow built successfully")
     return graph.compile()
@@ -12,3 +12,5 @@ class AssistantState(BaseModel):
     cfg: Dict[str, Any]  # required
     intent: Optional[str] = None  # optional, default None
     response: Optional[str] = None  # optional, default None
+    cache_hit: bool = False  # answered from the answer cache
+    started_at: Optional[float] = None  # perf_counter() at graph entry
@@ -1,62 +1,85 @@
+import hashlib
 import os
-from threading import Lock
 
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
 from utils.constants import (
     ENV_OPENAIAPI_KEY,
+    KEY_API_KEY,
     KEY_EMBEDDING_MODEL,
     KEY_INFERENCE_MODEL,
     KEY_OPENAI,
     MODEL_EMBEDDING_OPEN_AI,
     MODEL_INFERENCE_OPEN_AI,
+    VALUES_UTF_8,
 )
+from utils.resource_pool import ResourcePool
 
+# Clients are cheap to keep but hold HTTP connection pools worth reusing
+_MAX_CLIENTS = 32
+_INFERENCE_MODELS = ResourcePool("inference model", _MAX_CLIENTS)
+_EMBEDDING_MODELS = ResourcePool("embedding model", _MAX_CLIENTS)
 
-class SingletonMeta(type):
-    """
-    Thread-safe implementation of Singleton.
-    """
 
-    _instances = {}
-    _lock: Lock = Lock()
-
-    def __call__(cls, *args, **kwargs):
-        # Double-checked locking
-        if cls not in cls._instances:
-            with cls._lock:
-                if cls not in cls._instances:
-                    cls._instances[cls] = super().__call__(*args, **kwargs)
-        return cls._instances[cls]
+class OpenAIModel:
+    """
+    The chat and embedding clients for one config (`[openai]`
+    inference_model / embedding_model / api_key, the key defaulting to
+    the environment).
 
+    Clients are pooled process-wide by (model name, API key), so every
+    config naming the same model and key shares one client, while a
+    process serving several repos can use different models side by side.
+    """
 
-class OpenAIModel(metaclass=SingletonMeta):
     def __init__(self, cfg):
-        self.__openai_api_key = os.getenv(ENV_OPENAIAPI_KEY)
-        self.__cfg = cfg
-        self._inference_model = None
-        self._embedding_model = None
+        openai_cfg = cfg.get(KEY_OPENAI, {})
+        self.__openai_api_key = openai_cfg.get(KEY_API_KEY) or os.getenv(
+            ENV_OPENAIAPI_KEY
+        )
+        # Pool keys carry a digest rather than the key itself
+        key_digest = hashlib.sha256(
+            (self.__openai_api_key or "").encode(VALUES_UTF_8)
+        ).hexdigest()[:12]
+        self._inference_model_name = openai_cfg.get(
+            KEY_INFERENCE_MODEL, MODEL_INFERENCE_OPEN_AI
+        )
+        self._embedding_model_name = openai_cfg.get(
+            KEY_EMBEDDING_MODEL, MODEL_EMBEDDING_OPEN_AI
+        )
+        self._inference_key = (self._inference_model_name, key_digest)
+        self._embedding_key = (self._embedding_model_name, key_digest)
+
+    def use_models(self, inference_model=None, embedding_model=None):
+        """
+        Serve the given models for this config's model names and key
+        instead of creating OpenAI clients, e.g. offline stubs for
+        benchmarks and load tests.
+        """
+        if inference_model is not None:
+            _INFERENCE_MODELS.put(self._inference_key, inference_model)
+        if embedding_model is not None:
+            _EMBEDDING_MODELS.put(self._embedding_key, embedding_model)
 
     @property
     def inference_model(self):
-        if self._inference_model is None:
-            model_name = self.__cfg.get(KEY_OPENAI, {}).get(
-                KEY_INFERENCE_MODEL, MODEL_INFERENCE_OPEN_AI
-            )
-            self._inference_model = ChatOpenAI(
-                model=model_name,
+        return _INFERENCE_MODELS.get(
+            self._inference_key,
+            lambda: ChatOpenAI(
+                model=self._inference_model_name,
                 temperature=0,
                 openai_api_key=self.__openai_api_key,
-            )
-        return self._inference_model
+                # Token usage on streamed answers too, for tracing
+                stream_usage=True,
+            ),
+        )
 
     @property
     def embedding_model(self):
-        if self._embedding_model is None:
-            model_name = self.__cfg.get(KEY_OPENAI, {}).get(
-                KEY_EMBEDDING_MODEL, MODEL_EMBEDDING_OPEN_AI
-            )
-            self._embedding_model = OpenAIEmbeddings(
-                model=model_name, openai_api_key=self.__openai_api_key
-            )
-        return self._embedding_model
+        return _EMBEDDING_MODELS.get(
+            self._embedding_key,
+            lambda: OpenAIEmbeddings(
+                model=self._embedding_model_name,
+                openai_api_key=self.__openai_api_key,
+            ),
+        )
@@ -0,0 +1,305 @@
+"""
+Async HTTP/WebSocket server sharing one compiled graph across chat
+sessions.
+
+Endpoints:
+    POST /chat            {"question": ..., "session_id": ...} -> answer
+    GET  /chat/ws         WebSocket: send the same JSON per question and
+                          receive {"type": "token", "text": ...} messages,
+                          then {"type": "answer", ...}
+    GET  /sessions/{id}   the session's recent questions and answers
+    GET  /health
+
+Answers carry `"clarify": true` when the question's intent was unclear
+and the client should ask the user to rephrase. Omit `session_id` to
+start a new session; the answer returns its ID.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+from aiohttp import WSMsgType, web
+
+from ingestion.load_vectorstore import (
+    load_lexical_index,
+    load_symbol_index,
+    load_vectorstore,
+)
+from langgraph_flow.agents.enums import Node
+from langgraph_flow.agents.local_intent_classifier import (
+    load_local_intent_classifier,
+)
+from langgraph_flow.graph_builder import build_graph
+from langgraph_flow.models.openai_model import OpenAIModel
+from langgraph_flow.streaming import astream_answer
+from utils.answer_cache import load_answer_cache
+from utils.constants import (
+    KEY_CACHE_HIT,
+    KEY_CLARIFY,
+    KEY_CONFIG,
+    KEY_ERROR,
+    KEY_HOST,
+    KEY_INTENT,
+    KEY_MAX_CONCURRENCY,
+    KEY_MAX_PENDING,
+    KEY_MAX_SESSIONS,
+    KEY_PORT,
+    KEY_QUESTION,
+    KEY_RESPONSE,
+    KEY_SERVER,
+    KEY_SESSION_ID,
+    KEY_SESSION_TTL_MINUTES,
+    KEY_TYPE,
+)
+from utils.tracing import load_tracer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+# Graph runs in flight at once; each holds an LLM call and a retrieval
+DEFAULT_MAX_CONCURRENCY = 8
+# Questions allowed to wait for a slot before the server answers 503
+DEFAULT_MAX_PENDING = 64
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_SESSION_TTL_MINUTES = 60
+_HISTORY_TURNS = 20
+
+
+@dataclass
+class Session:
+    id: str
+    history: Deque[Dict] = field(
+        default_factory=lambda: deque(maxlen=_HISTORY_TURNS)
+    )
+    last_active: float = field(default_factory=time.monotonic)
+    # One question at a time per session keeps its history in order
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class SessionStore:
+    """Sessions by ID, dropped after `ttl_s` idle or beyond `max_sessions`."""
+
+    def __init__(self, ttl_s: float, max_sessions: int):
+        self._ttl_s = ttl_s
+        self._max_sessions = max_sessions
+        self._sessions: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        self._evict_idle()
+        return self._sessions.get(session_id)
+
+    def get_or_create(self, session_id: Optional[str]) -> Session:
+        session = self.get(session_id) if session_id else None
+        if session is None:
+            session = Session(session_id or uuid.uuid4().hex)
+            self._sessions[session.id] = session
+            while len(self._sessions) > self._max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session.id)
+        session.last_active = time.monotonic()
+        return session
+
+    def _evict_idle(self) -> None:
+        cutoff = time.monotonic() - self._ttl_s
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_active >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+
+
+def _warm_up(cfg: Dict) -> None:
+    """Open models and indexes before the first question needs them."""
+    OpenAIModel(cfg)
+    for load in (
+        load_vectorstore,
+        load_lexical_index,
+        load_symbol_index,
+        load_answer_cache,
+        load_local_intent_classifier,
+    ):
+        try:
+            load(cfg)
+        except Exception as e:
+            logger.warning("Warm-up of %s failed: %s", load.__name__, e)
+
+
+class ChatServer:
+    """Answers questions for many sessions with one compiled graph."""
+
+    def __init__(self, cfg: Dict):
+        server_cfg = cfg.get(KEY_SERVER, {})
+        self._cfg = cfg
+        self._graph = build_graph(cfg)
+        self._tracer = load_tracer(cfg)
+        self._sessions = SessionStore(
+            60
+            * server_cfg.get(
+                KEY_SESSION_TTL_MINUTES, DEFAULT_SESSION_TTL_MINUTES
+            ),
+            server_cfg.get(KEY_MAX_SESSIONS, DEFAULT_MAX_SESSIONS),
+        )
+        self._max_concurrency = server_cfg.get(
+            KEY_MAX_CONCURRENCY, DEFAULT_MAX_CONCURRENCY
+        )
+        self._max_pending = server_cfg.get(KEY_MAX_PENDING, DEFAULT_MAX_PENDING)
+        self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        # Questions admitted: running plus waiting for the semaphore
+        self._admitted = 0
+
+    async def answer(
+        self,
+        session_id: Optional[str],
+        question: str,
+        on_token: Optional[Callable[[str], Awaitable[None]]] = None,
+    ) -> Dict:
+        """
+        Run the graph for one question, streaming tokens to `on_token`
+        if given. Raises `HTTPServiceUnavailable` when too many questions
+        are already queued.
+        """
+        if self._admitted >= self._max_concurrency + self._max_pending:
+            raise web.HTTPServiceUnavailable(reason="Server busy, retry later")
+        session = self._sessions.get_or_create(session_id)
+        inputs = {KEY_QUESTION: question, KEY_CONFIG: self._cfg}
+        config = (
+            self._tracer.config(question, session.id) if self._tracer else None
+        )
+        self._admitted += 1
+        try:
+            async with session.lock, self._semaphore:
+                if on_token is None:
+                    state = await self._graph.ainvoke(inputs, config=config)
+                else:
+                    state = await astream_answer(
+                        self._graph, inputs, on_token, config
+                    )
+        finally:
+            self._admitted -= 1
+
+        intent = state.get(KEY_INTENT)
+        session.history.append(
+            {
+                KEY_QUESTION: question,
+                KEY_INTENT: intent,
+                KEY_RESPONSE: state.get(KEY_RESPONSE),
+            }
+        )
+        return {
+            KEY_SESSION_ID: session.id,
+            KEY_INTENT: intent,
+            KEY_RESPONSE: state.get(KEY_RESPONSE),
+            KEY_CACHE_HIT: state.get(KEY_CACHE_HIT, False),
+            KEY_CLARIFY: intent == Node.CLARIFY.value,
+        }
+
+    async def handle_chat(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+            question = body[KEY_QUESTION].strip()
+        except (ValueError, KeyError, AttributeError):
+            return _error(400, f"expected JSON with a '{KEY_QUESTION}'")
+        try:
+            return web.json_response(
+                await self.answer(body.get(KEY_SESSION_ID), question)
+            )
+        except web.HTTPServiceUnavailable as e:
+            return _error(503, e.reason)
+        except Exception:
+            logger.exception("Error during graph execution")
+            return _error(500, "failed to answer the question")
+
+    async def handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        async def send_token(text: str) -> None:
+            await ws.send_json({KEY_TYPE: "token", "text": text})
+
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            try:
+                body = msg.json()
+                question = body[KEY_QUESTION].strip()
+            except (ValueError, KeyError, AttributeError):
+                await ws.send_json(
+                    {KEY_TYPE: KEY_ERROR, KEY_ERROR: "invalid message"}
+                )
+                continue
+            try:
+                answer = await self.answer(
+                    body.get(KEY_SESSION_ID), question, send_token
+                )
+            except web.HTTPServiceUnavailable as e:
+                await ws.send_json({KEY_TYPE: KEY_ERROR, KEY_ERROR: e.reason})
+                continue
+            except Exception:
+                logger.exception("Error during graph execution")
+                await ws.send_json(
+                    {
+                        KEY_TYPE: KEY_ERROR,
+                        KEY_ERROR: "failed to answer the question",
+                    }
+                )
+                continue
+            await ws.send_json({KEY_TYPE: "answer", **answer})
+        return ws
+
+    async def handle_session(self, request: web.Request) -> web.Response:
+        session = self._sessions.get(request.match_info["session_id"])
+        if session is None:
+            return _error(404, "unknown session")
+        return web.json_response(
+            {KEY_SESSION_ID: session.id, "history": list(session.history)}
+        )
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "status": "ok",
+                "sessions": len(self._sessions),
+                "admitted": self._admitted,
+            }
+        )
+
+
+def _error(status: int, message: str) -> web.Response:
+    return web.json_response({KEY_ERROR: message}, status=status)
+
+
+def create_app(cfg: Dict) -> web.Application:
+    server = ChatServer(cfg)
+    app = web.Application()
+
+    async def on_startup(app: web.Application) -> None:
+        await asyncio.to_thread(_warm_up, cfg)
+
+    app.on_startup.append(on_startup)
+    app.add_routes(
+        [
+            web.post("/chat", server.handle_chat),
+            web.get("/chat/ws", server.handle_ws),
+            web.get("/sessions/{session_id}", server.handle_session),
+            web.get("/health", server.handle_health),
+        ]
+    )
+    return app
+
+
+def serve(cfg: Dict) -> None:
+    """Run the chat server until interrupted (`[server] host` / `port`)."""
+    server_cfg = cfg.get(KEY_SERVER, {})
+    host = server_cfg.get(KEY_HOST, DEFAULT_HOST)
+    port = server_cfg.get(KEY_PORT, DEFAULT_PORT)
+    logger.info("🌐 Serving the codebase assistant on http://%s:%d", host, port)
+    web.run_app(create_app(cfg), host=host, port=port, print=None)
@@ -0,0 +1,134 @@
+"""Stream agent answers token by token out of the compiled graph."""
+
+import logging
+import statistics
+import time
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from langgraph_flow.agents.enums import Intent
+from utils.constants import KEY_CACHE_HIT, KEY_INTENT, KEY_RESPONSE
+
+logger = logging.getLogger(__name__)
+
+# Nodes whose LLM tokens are the answer (the classifier's are not)
+_ANSWER_NODES = {
+    intent.value for intent in Intent if intent is not Intent.CLASSIFY
+}
+_STREAM_MODE_MESSAGES = "messages"
+_STREAM_MODE_VALUES = "values"
+STREAM_MODES = [_STREAM_MODE_MESSAGES, _STREAM_MODE_VALUES]
+# Recent time-to-first-token samples kept per intent for the logged median
+_TTFT_WINDOW = 100
+_ttft_by_intent: Dict[str, Deque[float]] = defaultdict(
+    lambda: deque(maxlen=_TTFT_WINDOW)
+)
+
+
+def _log_ttft(intent: str, ttft_s: float, total_s: float) -> None:
+    samples = _ttft_by_intent[intent]
+    samples.append(ttft_s)
+    logger.info(
+        "Time to first token for '%s': %.2fs of %.2fs total "
+        "(median %.2fs over last %d)",
+        intent,
+        ttft_s,
+        total_s,
+        statistics.median(samples),
+        len(samples),
+    )
+
+
+class _AnswerStream:
+    """Picks answer tokens out of a multi-mode graph stream."""
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._first_token_s: Optional[float] = None
+        self._streamed: List[str] = []
+        self.state: Dict = {}
+
+    def token(self, mode: str, chunk) -> Optional[str]:
+        """The answer text carried by one stream item, if any."""
+        if mode == _STREAM_MODE_VALUES:
+            self.state = chunk
+            return None
+        message, metadata = chunk
+        if metadata.get("langgraph_node") not in _ANSWER_NODES:
+            return None
+        if not message.content:
+            return None
+        if self._first_token_s is None:
+            self._first_token_s = time.perf_counter() - self._start
+        self._streamed.append(message.content)
+        return message.content
+
+    def finish(self) -> List[str]:
+        """
+        Text still to emit once the run is over: answers not generated by
+        an LLM (retrieval results, cache hits, clarifications) and error
+        responses. Logs time to first token.
+        """
+        remaining = []
+        response = self.state.get(KEY_RESPONSE)
+        if response and response != "".join(self._streamed):
+            # Nothing streamed, or the LLM failed part-way through
+            if self._streamed:
+                remaining.append("\n")
+            remaining.append(response)
+            if self._first_token_s is None:
+                self._first_token_s = time.perf_counter() - self._start
+        if self._first_token_s is not None:
+            intent = self.state.get(KEY_INTENT) or "unknown"
+            if self.state.get(KEY_CACHE_HIT):
+                intent = f"{intent} (cached)"
+            _log_ttft(
+                intent, self._first_token_s, time.perf_counter() - self._start
+            )
+        return remaining
+
+
+def stream_answer(
+    graph,
+    inputs: Dict,
+    on_token: Callable[[str], None],
+    config: Optional[Dict] = None,
+) -> Dict:
+    """
+    Run `graph` on `inputs` (with runnable `config`), calling `on_token` with each piece of the
+    answer as soon as an agent's LLM produces it, and return the final
+    state. Answers that are not generated by an LLM (retrieval results,
+    cache hits) and error responses are passed to `on_token` whole once
+    the run finishes.
+
+    Time to first token is logged per intent.
+    """
+    answer = _AnswerStream()
+    for mode, chunk in graph.stream(
+        inputs, config=config, stream_mode=STREAM_MODES
+    ):
+        text = answer.token(mode, chunk)
+        if text:
+            on_token(text)
+    for text in answer.finish():
+        on_token(text)
+    return answer.state
+
+
+async def astream_answer(
+    graph,
+    inputs: Dict,
+    on_token: Callable[[str], Awaitable[None]],
+    config: Optional[Dict] = None,
+) -> Dict:
+    """`stream_answer` for async graph runs, with an async `on_token`."""
+    answer = _AnswerStream()
+    async for mode, chunk in graph.astream(
+        inputs, config=config, stream_mode=STREAM_MODES
+    ):
+        text = answer.token(mode, chunk)
+        if text:
+            await on_token(text)
+    for text in answer.finish():
+        await on_token(text)
+    return answer.state
@@ -1,7 +1,7 @@
 import argparse
 import logging
 
-from utils.constants import KEY_CHAT, KEY_INGEST
+from utils.constants import KEY_CHAT, KEY_INGEST, KEY_SERVE
 from utils.util import chat_flow, ingest_flow, load_config, setup_logging
 
 
@@ -12,10 +12,10 @@ def main():
     )
     parser.add_argument(
         "command",
-        choices=[KEY_INGEST, KEY_CHAT],
+        choices=[KEY_INGEST, KEY_CHAT, KEY_SERVE],
         nargs="?",
         default=KEY_CHAT,
-        help=f"Mode: '{KEY_INGEST}' to build embeddings, '{KEY_CHAT}' to start interactive Q&A",
+        help=f"Mode: '{KEY_INGEST}' to build embeddings, '{KEY_CHAT}' to start interactive Q&A, '{KEY_SERVE}' to serve Q&A over HTTP/WebSocket",
     )
     parser.add_argument(
         "-c",
@@ -43,6 +43,11 @@ def main():
     # Dispatch based on command
     if args.command == KEY_INGEST:
         ingest_flow(cfg)
+    elif args.command == KEY_SERVE:
+        # Only the server needs aiohttp and the server stack
+        from langgraph_flow.server import serve
+
+        serve(cfg)
     else:
         chat_flow(cfg)
 
@@ -0,0 +1,54 @@
+import pytest
+import tiktoken
+import tiktoken.registry
+
+# cl100k_base's pre-tokenizer; the vocabularies below stay offline
+_CL100K_PATTERN = (
+    r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}+|\p{N}{1,3}|"""
+    r""" ?[^\s\p{L}\p{N}]++[\r\n]*|\s*[\r\n]|\s+(?!\S)|\s+"""
+)
+# Merged tokens of the BPE encoding, on top of every single byte
+_MERGES = [
+    b"  ",
+    b"    ",
+    b"\n\n",
+    b"):",
+    b"):\n",
+    b"de",
+    b"def",
+    b" def",
+    b"re",
+    b"ret",
+    b"retu",
+    b"retur",
+    b"return",
+    b" return",
+    b"se",
+    b"sel",
+    b"self",
+    b"(self",
+]
+
+
+def _encoding(name: str, merges) -> tiktoken.Encoding:
+    ranks = {bytes([i]): i for i in range(256)}
+    ranks.update((token, 256 + i) for i, token in enumerate(merges))
+    return tiktoken.Encoding(
+        name=name,
+        pat_str=_CL100K_PATTERN,
+        mergeable_ranks=ranks,
+        special_tokens={},
+    )
+
+
+@pytest.fixture(params=[[], _MERGES], ids=["bytes", "bpe"])
+def encoding_name(request, monkeypatch) -> str:
+    """
+    The name of a registered test encoding: one token per byte, or a
+    small BPE whose merges cross line ends and join indentation.
+    """
+    name = f"test_{request.param_index}"
+    monkeypatch.setitem(
+        tiktoken.registry.ENCODINGS, name, _encoding(name, request.param)
+    )
+    return name
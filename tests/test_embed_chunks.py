@@ -0,0 +1,73 @@
+from benchmarks.fakes import FakeEmbeddings
+from ingestion.embed_chunks_into_vectorstore import embed_documents
+from ingestion.ingestion_util import get_chunk_manifest_path
+from ingestion.manifest import ChunkManifest
+from ingestion.vectorstore_backends import open_vectorstore_backend
+
+_LICENSE = "# Copyright Example Corp. Licensed under the Apache License 2.0."
+
+
+def _config(tmp_path):
+    return {
+        "repo": {"project_name": "repo"},
+        "vectorstore": {
+            "type": "faiss",
+            "collection": "chunks",
+            "base_directory": str(tmp_path),
+            "subpath": "store",
+        },
+    }
+
+
+def _doc(path, text, chunk_index=0):
+    return {
+        "content": text,
+        "meta": {
+            "relative_path": path,
+            "chunk_index": chunk_index,
+            "start_line": 1,
+            "end_line": 1,
+        },
+    }
+
+
+def _stored_texts(cfg, embeddings):
+    store = open_vectorstore_backend(cfg, embeddings)
+    try:
+        return sorted(
+            doc.page_content for doc in store.similarity_search("code", k=10)
+        )
+    finally:
+        store.close()
+
+
+def test_shared_chunk_is_deleted_with_the_last_file_that_has_it(tmp_path):
+    cfg = _config(tmp_path)
+    embeddings = FakeEmbeddings(dim=16)
+    embed_documents(
+        [
+            _doc("a.py", _LICENSE),
+            _doc("a.py", "def a(): pass", 1),
+            _doc("b.py", _LICENSE),
+        ],
+        cfg,
+        embeddings=embeddings,
+    )
+
+    # a.py drops the header; b.py still has it
+    embed_documents(
+        [_doc("a.py", "def a(): return 1")],
+        cfg,
+        embeddings=embeddings,
+        stale_paths={"a.py"},
+    )
+    assert _stored_texts(cfg, embeddings) == [_LICENSE, "def a(): return 1"]
+
+    # Full sync without b.py: the header has no file left
+    embed_documents(
+        [_doc("a.py", "def a(): return 1")], cfg, embeddings=embeddings
+    )
+    assert _stored_texts(cfg, embeddings) == ["def a(): return 1"]
+    manifest = ChunkManifest(get_chunk_manifest_path(cfg), read_only=True)
+    assert manifest.paths() == ["a.py"]
+    manifest.close()
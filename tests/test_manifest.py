@@ -0,0 +1,63 @@
+from ingestion.manifest import ChunkManifest
+
+
+def _meta(path, start_line, chunk_index=0):
+    return {
+        "relative_path": path,
+        "start_line": start_line,
+        "end_line": start_line + 1,
+        "chunk_index": chunk_index,
+    }
+
+
+def test_update_reports_moved_stored_chunks(tmp_path):
+    manifest = ChunkManifest(tmp_path / "manifest.sqlite")
+    manifest.record([("x", "a.py", _meta("a.py", 1))], stored=True)
+    manifest.record([("x", "b.py", _meta("b.py", 1))])
+
+    # Unmoved, or moved in a file the store's metadata doesn't name
+    assert manifest.update([("x", "a.py", _meta("a.py", 1))]) == []
+    assert manifest.update([("x", "b.py", _meta("b.py", 7))]) == []
+    assert manifest.update([("x", "a.py", _meta("a.py", 4, 2))]) == [
+        ("x", _meta("a.py", 4, 2))
+    ]
+    assert manifest.update([("x", "a.py", _meta("a.py", 4, 2))]) == []
+    manifest.close()
+
+
+def test_removed_stored_pair_is_repointed(tmp_path):
+    manifest = ChunkManifest(tmp_path / "manifest.sqlite")
+    manifest.record([("x", "a.py", _meta("a.py", 1))], stored=True)
+    manifest.record([("x", "c.py", _meta("c.py", 9))])
+    manifest.record([("x", "b.py", _meta("b.py", 5))])
+
+    assert manifest.remove_paths(["a.py"]) == []
+    assert manifest.repoint_stored() == [("x", _meta("b.py", 5))]
+    assert manifest.repoint_stored() == []
+    # b.py's pair is now the stored one
+    assert manifest.update([("x", "b.py", _meta("b.py", 6))]) == [
+        ("x", _meta("b.py", 6))
+    ]
+    manifest.close()
+
+
+def test_remove_paths_keeps_chunks_other_files_share(tmp_path):
+    manifest = ChunkManifest(tmp_path / "manifest.sqlite")
+    manifest.add([("shared", "a.py"), ("shared", "b.py"), ("own", "a.py")])
+
+    assert manifest.remove_paths(["a.py"]) == ["own"]
+    assert manifest.ids_for_paths(["a.py", "b.py"]) == ["shared"]
+    assert manifest.remove_paths(["b.py"]) == ["shared"]
+    assert manifest.paths() == []
+    manifest.close()
+
+
+def test_remove_unseen_deletes_only_chunks_left_without_files(tmp_path):
+    manifest = ChunkManifest(tmp_path / "manifest.sqlite")
+    manifest.add([("shared", "a.py"), ("shared", "b.py"), ("gone", "b.py")])
+
+    manifest.begin_sync()
+    manifest.mark_seen([("shared", "a.py")])
+    assert manifest.remove_unseen() == ["gone"]
+    assert manifest.paths() == ["a.py"]
+    manifest.close()
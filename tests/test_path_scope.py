@@ -0,0 +1,78 @@
+import pytest
+
+from ingestion.manifest import ChunkManifest, PathScope
+from ingestion.metadata_filter import scoped_paths
+from ingestion.path_index import PathIndex
+from utils.query_scope import parse_scope, scope_filter
+
+_PATHS = [
+    "ingestion/chunk_code.py",
+    "ingestion/manifest.py",
+    "utils/retrieval.py",
+    "web/app.ts",
+    "README.md",
+]
+
+
+@pytest.mark.parametrize(
+    "filter, paths",
+    [
+        ({"relative_path": "a.py"}, ["a.py"]),
+        ({"relative_path": {"$eq": "a.py"}}, ["a.py"]),
+        ({"relative_path": {"$in": ["a.py", "b.py"]}}, ["a.py", "b.py"]),
+        ({"relative_path": {"$ne": "a.py"}}, None),
+        ({"language": "py"}, None),
+        ({"relative_path": "a.py", "language": "py"}, None),
+        (None, None),
+    ],
+)
+def test_scoped_paths(filter, paths):
+    assert scoped_paths(filter) == paths
+
+
+def test_path_index_resolves_trailing_components():
+    index = PathIndex(_PATHS)
+    assert index.resolve("ingestion") == ["ingestion/"]
+    assert index.resolve("./ingestion/") == ["ingestion/"]
+    assert index.resolve("retrieval.py") == ["utils/retrieval.py"]
+    assert index.resolve("gestion") == []
+    assert index.files_under(["ingestion/"]) == [
+        "ingestion/chunk_code.py",
+        "ingestion/manifest.py",
+    ]
+    # A file prefix matches that file only
+    assert index.files_under(["utils/retrieval.py", "web/app"]) == [
+        "utils/retrieval.py"
+    ]
+
+
+def test_question_scope_becomes_a_path_filter():
+    index = PathIndex(_PATHS)
+    scope = parse_scope("how are chunks stored in ingestion?", index)
+    assert scope_filter(scope, index) == {
+        "relative_path": {
+            "$in": ["ingestion/chunk_code.py", "ingestion/manifest.py"]
+        }
+    }
+    scope = parse_scope("which typescript files render the page?", index)
+    assert scope_filter(scope, index) == {"language": {"$in": ["ts"]}}
+    assert scope_filter(parse_scope("what does it do?", index), index) is None
+
+
+def test_path_scope_resolves_path_filters_to_chunk_ids(tmp_path):
+    manifest_path = tmp_path / "manifest.sqlite"
+    scope = PathScope(manifest_path)
+    # No manifest yet: callers fall back to filtering on metadata
+    assert scope.ids({"relative_path": "a.py"}) is None
+
+    manifest = ChunkManifest(manifest_path)
+    manifest.add([("shared", "a.py"), ("shared", "b.py"), ("own", "b.py")])
+    manifest.close()
+    assert scope.ids({"relative_path": "a.py"}) == ["shared"]
+    assert scope.ids({"relative_path": {"$in": ["a.py", "b.py"]}}) == [
+        "own",
+        "shared",
+    ]
+    assert scope.ids({"relative_path": "c.py"}) == []
+    assert scope.ids({"language": "py"}) is None
+    scope.close()
@@ -0,0 +1,29 @@
+from utils.retrieval import is_symbol_query, reciprocal_rank_fusion
+
+
+def test_rrf_ranks_ids_found_by_both_retrievers_first():
+    vector = ["a", "b", "c"]
+    lexical = ["c", "d", "a"]
+
+    fused = reciprocal_rank_fusion([vector, lexical])
+
+    assert fused[:2] == ["a", "c"]
+    assert sorted(fused) == ["a", "b", "c", "d"]
+
+
+def test_rrf_prefers_agreement_over_a_single_top_rank():
+    rankings = [["solo", "shared"], ["other", "shared"]]
+
+    assert reciprocal_rank_fusion(rankings)[0] == "shared"
+    assert reciprocal_rank_fusion(rankings, rrf_k=1) == [
+        "shared",
+        "solo",
+        "other",
+    ]
+
+
+def test_symbol_queries_are_identifier_lookups():
+    assert is_symbol_query("where is get_changed_paths defined?")
+    assert is_symbol_query("`RepoChanges.changed`")
+    assert not is_symbol_query("how does ingestion handle deleted files?")
+    assert not is_symbol_query("where is main defined?")
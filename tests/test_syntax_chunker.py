@@ -0,0 +1,71 @@
+import ast
+
+import tiktoken
+
+from ingestion.syntax_chunker import SyntaxChunker
+
+_SOURCE = '''"""A module."""
+
+import os
+
+
+class Walker:
+    """Walks a tree."""
+
+    def __init__(self, root):
+        self.root = root
+        self.seen = set()
+
+    def walk(self):
+        for path, _, files in os.walk(self.root):
+            for name in files:
+                self.seen.add(os.path.join(path, name))
+        return self.seen
+
+
+def main():
+    return Walker(".").walk()
+'''
+
+
+def _chunks(encoding_name, text, lang, chunk_tokens, chunk_overlap=10):
+    chunker = SyntaxChunker(chunk_tokens, chunk_overlap, encoding_name)
+    tree = ast.parse(text) if lang == "py" else None
+    return chunker.chunk(text, lang, tree)
+
+
+def test_chunk_tokens_match_encoding_the_chunk_text(encoding_name):
+    encoding = tiktoken.get_encoding(encoding_name)
+    for lang, chunk_tokens in [("py", 80), ("py", 1000), ("txt", 40)]:
+        chunks = _chunks(encoding_name, _SOURCE, lang, chunk_tokens)
+        assert len(chunks) > 1 or chunk_tokens == 1000
+        for chunk in chunks:
+            assert chunk.tokens == len(encoding.encode(chunk.text))
+            assert chunk.tokens <= chunk_tokens
+
+
+def test_chunks_cover_every_non_blank_line(encoding_name):
+    chunks = _chunks(encoding_name, _SOURCE, "py", 80)
+    lines = _SOURCE.splitlines()
+    covered = [
+        line
+        for chunk in chunks
+        for line in lines[chunk.start_line - 1 : chunk.end_line]
+    ]
+    assert [line for line in covered if line.strip()] == [
+        line for line in lines if line.strip()
+    ]
+
+
+def test_long_line_windows_cut_on_character_boundaries(encoding_name):
+    # Distinct 3-byte characters, so each window's position is unambiguous
+    line = "".join(chr(0x4E00 + i) for i in range(100))
+    for chunk_overlap in (0, 5):
+        chunks = _chunks(encoding_name, f"{line}\n", "txt", 25, chunk_overlap)
+        assert len(chunks) > 1
+        covered = set()
+        for chunk in chunks:
+            assert (chunk.start_line, chunk.end_line) == (1, 1)
+            start = line.index(chunk.text)
+            covered.update(range(start, start + len(chunk.text)))
+        assert covered == set(range(len(line)))
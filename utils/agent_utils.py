@@ -2,20 +2,41 @@
 
 import logging
 import os
-from typing import List
+from threading import Lock
+from typing import Dict, List, Tuple
 
+from langchain import PromptTemplate
 from langchain.schema import Document
 
-from ingestion.load_vectorstore import load_vectorstore
 from langgraph_flow.models.assistant_state import AssistantState
 from utils.constants import (
-    KEY_CHUNK_INDEX,
-    KEY_CODE_LANGUAGE,
     KEY_CONFIG_TOP_K,
-    KEY_RELATIVE_PATH,
-    KEY_UNKNOWN,
+    KEY_MAX_CONTEXT_TOKENS,
     VALUES_UTF_8,
 )
+from utils.context_packer import (
+    DEFAULT_MAX_CONTEXT_TOKENS,
+    count_tokens,
+    format_chunk,
+    pack_context,
+)
+from utils.query_scope import get_scope_filter
+from utils.reranker import RERANK_NONE, get_rerank_settings, rerank
+from utils.retrieval import search
+from utils.summary_retrieval import (
+    MIN_CODE_CONTEXT_TOKENS,
+    get_summary_context,
+    get_summary_filter,
+)
+from utils.tracing import (
+    ATTR_CHUNKS,
+    ATTR_CONTEXT_CHARS,
+    ATTR_CONTEXT_TOKENS,
+    ATTR_SAVED_TOKENS,
+    ATTR_SCOPED,
+    SPAN_RETRIEVAL,
+    trace_span,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -29,65 +50,191 @@ def run_llm(runnable, input_params: dict) -> str:
     return runnable.invoke(input_params).content
 
 
-def get_agent_prompt_template(prompt_template_file: str):
-    # Load prompt template
-    tmpl_path = os.path.join(
+def stream_llm(runnable, input_params: dict) -> str:
+    """
+    Stream the LLM response and return the full text. Inside a graph run
+    with `stream_mode="messages"`, each token reaches the consumer as it
+    is generated.
+    """
+    return "".join(chunk.content for chunk in runnable.stream(input_params))
+
+
+async def arun_llm(runnable, input_params: dict) -> str:
+    """Async `run_llm`."""
+    return (await runnable.ainvoke(input_params)).content
+
+
+async def astream_llm(runnable, input_params: dict) -> str:
+    """Async `stream_llm`."""
+    chunks = [chunk.content async for chunk in runnable.astream(input_params)]
+    return "".join(chunks)
+
+
+def _get_prompt_template_path(prompt_template_file: str) -> str:
+    return os.path.join(
         os.path.dirname(__file__),
         "..",
         "langgraph_flow",
         "prompts",
         prompt_template_file,
     )
+
+
+def get_agent_prompt_template(prompt_template_file: str):
+    # Load prompt template
+    tmpl_path = _get_prompt_template_path(prompt_template_file)
     with open(tmpl_path, "r", encoding=VALUES_UTF_8) as f:
         template = f.read()
     return template.strip()
 
 
-def get_combined_text_from_docs(docs: list) -> str:
-    """Unpacks the documents, join the data and returns as a single str."""
-    combined = []
-    for doc in docs:
-        meta = doc.metadata or {}
-        path = meta.get(KEY_RELATIVE_PATH, KEY_UNKNOWN)
-        idx = meta.get(KEY_CHUNK_INDEX, "?")
-        lang = meta.get(KEY_CODE_LANGUAGE)
-        snippet = doc.page_content.strip()
-        combined.append(
-            f"''' {KEY_CODE_LANGUAGE}: {lang}, {KEY_RELATIVE_PATH}: {path}, ({KEY_CHUNK_INDEX} {idx})\n{snippet} '''"
+class PromptTemplateFile:
+    """
+    A prompt from `langgraph_flow/prompts`, parsed once, with its
+    `prompt | llm` runnables cached per model.
+
+    With `hot_reload`, each use compares the file's mtime (one stat call)
+    and re-reads the template when it changed.
+    """
+
+    def __init__(
+        self,
+        prompt_template_file: str,
+        input_variables: List[str],
+        hot_reload: bool = False,
+    ):
+        self._file = prompt_template_file
+        self._path = _get_prompt_template_path(prompt_template_file)
+        self._input_variables = input_variables
+        self._hot_reload = hot_reload
+        self._lock = Lock()
+        self._load()
+
+    def _load(self) -> None:
+        self._mtime = os.stat(self._path).st_mtime_ns
+        self._template = PromptTemplate(
+            input_variables=self._input_variables,
+            template=get_agent_prompt_template(self._file),
         )
+        # (client class, model name) -> (llm, runnable): one entry per
+        # model however often its pooled client is closed and recreated
+        self._runnables: Dict[Tuple, Tuple] = {}
+
+    def _reload_if_changed(self) -> None:
+        if not self._hot_reload:
+            return
+        mtime = os.stat(self._path).st_mtime_ns
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._load()
+                    logger.info("Reloaded prompt template %s", self._file)
+
+    @property
+    def template(self) -> PromptTemplate:
+        self._reload_if_changed()
+        return self._template
+
+    def runnable(self, llm):
+        """`template | llm`, rebuilt when the model's client changes."""
+        self._reload_if_changed()
+        key = (type(llm), getattr(llm, "model_name", None))
+        cached = self._runnables.get(key)
+        if cached is None or cached[0] is not llm:
+            cached = (llm, self._template | llm)
+            with self._lock:
+                self._runnables[key] = cached
+        return cached[1]
 
-    combined_code_context = "\n\n".join(combined)
-    return combined_code_context
+
+def get_combined_text_from_docs(docs: list) -> str:
+    """Unpacks the documents, join the data and returns as a single str."""
+    return "\n\n".join(format_chunk(doc) for doc in docs)
 
 
 def get_relevant_code_context_chunks_from_vectorstore(
     cfg: dict, question: str, agent_name: str, default_top_k
 ):
-    # Determine how many snippets to explain
-    top_k = cfg.get(agent_name, {}).get(KEY_CONFIG_TOP_K, default_top_k)
-
-    # Load vectorstore
-    store = load_vectorstore(cfg)
-
-    # Perform similarity search
-    try:
+    # Determine how many snippets to explain, in how many tokens
+    agent_cfg = cfg.get(agent_name, {})
+    top_k = agent_cfg.get(KEY_CONFIG_TOP_K, default_top_k)
+    max_tokens = agent_cfg.get(
+        KEY_MAX_CONTEXT_TOKENS, DEFAULT_MAX_CONTEXT_TOKENS
+    )
+    rerank_settings = get_rerank_settings(cfg, agent_name)
+    fetch_k = top_k
+    if rerank_settings.method != RERANK_NONE:
+        fetch_k = max(top_k, rerank_settings.fetch_k)
+
+    # Perform hybrid lexical + similarity search, then rerank to top_k
+    with trace_span(
+        SPAN_RETRIEVAL,
+        agent=agent_name,
+        top_k=top_k,
+        rerank=rerank_settings.method,
+    ) as span:
+        try:
+            logger.info(
+                "Retrieving top %d of %d snippets for %s with question: %s",
+                top_k,
+                fetch_k,
+                agent_name,
+                question,
+            )
+            # Only the paths / languages the question names, else the
+            # files whose summaries match it best (large repos)
+            scope = get_scope_filter(cfg, question) or get_summary_filter(
+                cfg, question
+            )
+            docs: List[Document] = search(cfg, question, fetch_k, filter=scope)
+            if scope and not docs:
+                logger.info("Nothing in the question's scope; searching all")
+                docs = search(cfg, question, fetch_k)
+            span[ATTR_SCOPED] = scope is not None
+        except Exception as e:
+            logger.error(
+                "Similarity search failed in %s: %s",
+                agent_name,
+                e,
+                exc_info=True,
+            )
+            raise Exception
+
+        if not docs:
+            logger.error(
+                "No snippets found for %s query: %s", agent_name, question
+            )
+            raise Exception
+
+        # Keep top_k relevant, mutually distinct chunks
+        docs = rerank(cfg, question, docs, top_k, rerank_settings)
+
+        # What the retrieved files are for, ahead of their chunks
+        summaries = get_summary_context(cfg, agent_name, docs, max_tokens)
+        summary_tokens = count_tokens(summaries) if summaries else 0
+
+        # Merge, dedupe and fit the docs to the rest of the agent's token
+        # budget, never to less than the share reserved for code
+        code_tokens = max(
+            max_tokens - summary_tokens,
+            min(max_tokens, MIN_CODE_CONTEXT_TOKENS),
+        )
+        packed = pack_context(docs, code_tokens)
         logger.info(
-            "Retrieving top %d snippets for %s with question: %s",
-            top_k,
+            "Packed %d of %d snippets for %s into %d tokens (%d saved)",
+            packed.n_chunks,
+            len(docs),
             agent_name,
-            question,
+            packed.tokens,
+            packed.saved_tokens,
         )
-        docs: List[Document] = store.similarity_search(question, k=top_k)
-    except Exception as e:
-        logger.error(
-            "Similarity search failed in %s: %s", agent_name, e, exc_info=True
+        text = f"{summaries}\n\n{packed.text}" if summaries else packed.text
+        span.update(
+            {
+                ATTR_CHUNKS: len(docs),
+                ATTR_CONTEXT_CHARS: len(text),
+                ATTR_CONTEXT_TOKENS: packed.tokens + summary_tokens,
+                ATTR_SAVED_TOKENS: packed.saved_tokens,
+            }
         )
-        raise Exception
-
-    if not docs:
-        logger.error("No snippets found for %s query: %s", agent_name, question)
-        raise Exception
-
-    # Combine docs
-    code_context = get_combined_text_from_docs(docs)
-    return code_context
+    return text
@@ -0,0 +1,331 @@
+"""Persistent semantic cache of final answers, per collection and commit."""
+
+import hashlib
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ingestion.embedding_cache import get_query_embedding_model
+from ingestion.ingestion_util import (
+    get_persist_dir_and_collection_name_from_config,
+    load_last_ingested_commit,
+)
+from utils.constants import (
+    FILE_ANSWER_CACHE,
+    KEY_ANSWER_CACHE,
+    KEY_BASE_DIRECTORY,
+    KEY_ENABLED,
+    KEY_MAX_ENTRIES,
+    KEY_PATH,
+    KEY_SIMILARITY_THRESHOLD,
+    KEY_TTL_HOURS,
+    KEY_VECTORSTORE,
+    VALUES_UTF_8,
+)
+from utils.resource_pool import ResourcePool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.97
+DEFAULT_TTL_HOURS = 7 * 24
+DEFAULT_MAX_ENTRIES = 1000
+# Question embeddings kept in memory so storing an answer doesn't embed
+# the question a second time
+_RECENT_VECTORS = 64
+
+
+@dataclass
+class CachedAnswer:
+    intent: str
+    response: str
+    similarity: float  # 1.0 for an exact match
+    saved_s: float  # how long the answer originally took
+
+
+def _normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+def _question_hash(question: str, intent: str) -> str:
+    return hashlib.sha256(
+        f"{intent}\n{_normalize_question(question)}".encode(VALUES_UTF_8)
+    ).hexdigest()
+
+
+class AnswerCache:
+    """
+    SQLite store of answered questions with their embedding, intent and
+    response, scoped to `collection` at the currently ingested commit.
+
+    Lookups hit on the exact (normalized) question, or on the most similar
+    cached question with cosine similarity >= `threshold`, in both cases
+    only among answers for the same intent: "where is X used" and
+    "explain X" embed close but want different answers. Entries expire
+    after `ttl_s` and the least recently used are evicted beyond
+    `max_entries`. Entries for any other commit are dropped as soon as a
+    lookup sees that ingestion moved on. Safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        embed: Callable[[str], List[float]],
+        collection: str,
+        commit_fn: Callable[[], Optional[str]],
+        *,
+        threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        ttl_s: float = DEFAULT_TTL_HOURS * 3600,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self._embed = embed
+        self._collection = collection
+        self._commit_fn = commit_fn
+        self._threshold = threshold
+        self._ttl_s = ttl_s
+        self._max_entries = max_entries
+        self._lock = Lock()
+        self._recent_vectors: OrderedDict = OrderedDict()
+        self._commit: Optional[str] = None
+        # Intent -> (row ids, normalized vectors) of the questions cached
+        # for it at _commit
+        self._matrices: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.saved_s = 0.0
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY,
+                collection TEXT NOT NULL,
+                commit_hash TEXT NOT NULL,
+                question_hash TEXT NOT NULL,
+                question TEXT NOT NULL,
+                intent TEXT NOT NULL,
+                response TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                latency_s REAL NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                UNIQUE (collection, commit_hash, question_hash)
+            );
+            CREATE INDEX IF NOT EXISTS idx_answers_last_used
+                ON answers (last_used);
+            """
+        )
+        self._conn.commit()
+
+    def _question_vector(self, question: str) -> np.ndarray:
+        key = _normalize_question(question)
+        with self._lock:
+            vector = self._recent_vectors.get(key)
+            if vector is not None:
+                self._recent_vectors.move_to_end(key)
+                return vector
+        vector = np.asarray(self._embed(question), dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        with self._lock:
+            self._recent_vectors[key] = vector
+            if len(self._recent_vectors) > _RECENT_VECTORS:
+                self._recent_vectors.popitem(last=False)
+        return vector
+
+    def _current_commit(self) -> str:
+        commit = self._commit_fn() or ""
+        if commit != self._commit:
+            # New session or re-ingested: forget answers for other commits
+            deleted = self._conn.execute(
+                "DELETE FROM answers WHERE collection = ? AND commit_hash != ?",
+                (self._collection, commit),
+            ).rowcount
+            self._conn.commit()
+            if deleted:
+                logger.info(
+                    "Invalidated %d cached answers from older commits", deleted
+                )
+            self._commit = commit
+            self._matrices = {}
+        return commit
+
+    def _load_matrix(
+        self, commit: str, intent: str
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if intent not in self._matrices:
+            rows = self._conn.execute(
+                "SELECT id, vector FROM answers "
+                "WHERE collection = ? AND commit_hash = ? AND intent = ? "
+                "AND created > ?",
+                (self._collection, commit, intent, time.time() - self._ttl_s),
+            ).fetchall()
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            vectors = (
+                np.stack([np.frombuffer(row[1], np.float32) for row in rows])
+                if rows
+                else np.empty((0, 0), np.float32)
+            )
+            self._matrices[intent] = (ids, vectors)
+        return self._matrices[intent]
+
+    def lookup(self, question: str, intent: str) -> Optional[CachedAnswer]:
+        """
+        Cached answer for `question`, classified as `intent`, at the
+        current commit, if any.
+        """
+        with self._lock:
+            commit = self._current_commit()
+            row = self._conn.execute(
+                "SELECT id, intent, response, latency_s FROM answers "
+                "WHERE collection = ? AND commit_hash = ? "
+                "AND question_hash = ? AND created > ?",
+                (
+                    self._collection,
+                    commit,
+                    _question_hash(question, intent),
+                    time.time() - self._ttl_s,
+                ),
+            ).fetchone()
+            similarity = 1.0
+        if row is None:
+            vector = self._question_vector(question)
+            with self._lock:
+                ids, vectors = self._load_matrix(commit, intent)
+                if len(ids) and vectors.shape[1] == len(vector):
+                    scores = vectors @ vector
+                    best = int(np.argmax(scores))
+                    similarity = float(scores[best])
+                    if similarity >= self._threshold:
+                        row = self._conn.execute(
+                            "SELECT id, intent, response, latency_s "
+                            "FROM answers WHERE id = ?",
+                            (int(ids[best]),),
+                        ).fetchone()
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                self._log_stats("miss")
+                return None
+            entry_id, intent, response, latency_s = row
+            self._conn.execute(
+                "UPDATE answers SET last_used = ? WHERE id = ?",
+                (time.time(), entry_id),
+            )
+            self._conn.commit()
+            self.hits += 1
+            self.saved_s += latency_s
+            self._log_stats(f"hit (similarity {similarity:.3f})")
+        return CachedAnswer(intent, response, similarity, latency_s)
+
+    def store(
+        self, question: str, intent: str, response: str, latency_s: float
+    ) -> None:
+        """Cache the answer to `question`, computed in `latency_s`."""
+        vector = self._question_vector(question)
+        now = time.time()
+        with self._lock:
+            commit = self._current_commit()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (collection, commit_hash, "
+                "question_hash, question, intent, response, vector, "
+                "latency_s, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self._collection,
+                    commit,
+                    _question_hash(question, intent),
+                    question,
+                    intent,
+                    response,
+                    vector.tobytes(),
+                    latency_s,
+                    now,
+                    now,
+                ),
+            )
+            self._evict(now)
+            self._conn.commit()
+            self._matrices = {}
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute(
+            "DELETE FROM answers WHERE created <= ?", (now - self._ttl_s,)
+        )
+        self._conn.execute(
+            "DELETE FROM answers WHERE id NOT IN "
+            "(SELECT id FROM answers ORDER BY last_used DESC LIMIT ?)",
+            (self._max_entries,),
+        )
+
+    def _log_stats(self, outcome: str) -> None:
+        total = self.hits + self.misses
+        logger.info(
+            "Answer cache %s: %d hits / %d lookups (%.1f%% hit rate), "
+            "%.1fs saved",
+            outcome,
+            self.hits,
+            total,
+            100.0 * self.hits / total if total else 0.0,
+            self.saved_s,
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# Open caches per (file, collection), kept like the loaded vectorstores
+MAX_OPEN_CACHES = 16
+_ANSWER_CACHES = ResourcePool(
+    "answer cache", MAX_OPEN_CACHES, close=lambda cache: cache.close()
+)
+
+
+def load_answer_cache(cfg: Dict) -> Optional[AnswerCache]:
+    """
+    The answer cache for the configured collection, or None unless
+    `[answer_cache] enabled = true`.
+
+    Off by default: questions that differ in a single identifier ("where
+    is `load_config` defined" / "where is `save_config` defined") can
+    embed close enough to clear the similarity threshold, and would get
+    each other's answers. Enable it for traffic that repeats questions
+    verbatim, or raise `similarity_threshold`.
+
+    Lives under the vector store's base directory by default so that
+    it persists across sessions.
+    """
+    cache_cfg = cfg.get(KEY_ANSWER_CACHE, {})
+    if not cache_cfg.get(KEY_ENABLED, False):
+        return None
+
+    _, collection_name = get_persist_dir_and_collection_name_from_config(cfg)
+    path = cache_cfg.get(KEY_PATH) or (
+        Path(cfg[KEY_VECTORSTORE][KEY_BASE_DIRECTORY]) / FILE_ANSWER_CACHE
+    )
+
+    def open_cache():
+        logger.info("Using answer cache at %s", path)
+        return AnswerCache(
+            path,
+            get_query_embedding_model(cfg).embed_query,
+            collection_name,
+            lambda: load_last_ingested_commit(cfg),
+            threshold=cache_cfg.get(
+                KEY_SIMILARITY_THRESHOLD, DEFAULT_SIMILARITY_THRESHOLD
+            ),
+            ttl_s=cache_cfg.get(KEY_TTL_HOURS, DEFAULT_TTL_HOURS) * 3600,
+            max_entries=cache_cfg.get(KEY_MAX_ENTRIES, DEFAULT_MAX_ENTRIES),
+        )
+
+    return _ANSWER_CACHES.get((str(path), collection_name), open_cache)
@@ -25,12 +25,17 @@ KEY_CONFIG_TOP_K = "top_k"
 KEY_SOURCE = "source"
 KEY_UNKNOWN = "unknown"
 KEY_CHUNK_INDEX = "chunk_index"
+KEY_START_LINE = "start_line"
+KEY_END_LINE = "end_line"
+KEY_TOKEN_COUNT = "token_count"
 KEY_CODE_LANGUAGE = "language"
 KEY_OPENAI = "openai"
 KEY_INFERENCE_MODEL = "inference_model"
 KEY_EMBEDDING_MODEL = "embedding_model"
+KEY_API_KEY = "api_key"
 KEY_INTENT = "intent"
 KEY_CONTENT = "content"
+KEY_ID = "id"
 KEY_META = "meta"
 KEY_VECTORSTORE = "vectorstore"
 KEY_TYPE = "type"
@@ -40,6 +45,65 @@ KEY_PROJECT_NAME = "project_name"
 KEY_CHROMA = "chroma"
 KEY_FAISS = "faiss"
 KEY_RELATIVE_PATH = "relative_path"
+KEY_INDEX = "index"
+KEY_ANN_THRESHOLD = "ann_threshold"
+KEY_NPROBE = "nprobe"
+KEY_EF_SEARCH = "ef_search"
+KEY_INGESTION = "ingestion"
+KEY_INCREMENTAL = "incremental"
+KEY_LAST_COMMIT = "last_commit"
+KEY_EMBEDDING_CACHE = "embedding_cache"
+KEY_ENABLED = "enabled"
+KEY_PATH = "path"
+KEY_MAX_SIZE_MB = "max_size_mb"
+KEY_EXECUTOR = "executor"
+KEY_MAX_WORKERS = "max_workers"
+KEY_EMBEDDING_CONCURRENCY = "embedding_concurrency"
+KEY_RETRIEVAL = "retrieval"
+KEY_HYBRID = "hybrid"
+KEY_RRF_K = "rrf_k"
+KEY_QUERY_VARIANTS = "query_variants"
+KEY_ANSWER_CACHE = "answer_cache"
+KEY_SIMILARITY_THRESHOLD = "similarity_threshold"
+KEY_TTL_HOURS = "ttl_hours"
+KEY_MAX_ENTRIES = "max_entries"
+KEY_CACHE_HIT = "cache_hit"
+KEY_STARTED_AT = "started_at"
+KEY_INTENT_CLASSIFIER = "intent_classifier"
+KEY_MIN_CONFIDENCE = "min_confidence"
+KEY_LOG_QUESTIONS = "log_questions"
+KEY_PROMPTS = "prompts"
+KEY_HOT_RELOAD = "hot_reload"
+KEY_STREAM = "stream"
+KEY_SERVE = "serve"
+KEY_SERVER = "server"
+KEY_HOST = "host"
+KEY_PORT = "port"
+KEY_MAX_CONCURRENCY = "max_concurrency"
+KEY_MAX_PENDING = "max_pending"
+KEY_MAX_SESSIONS = "max_sessions"
+KEY_SESSION_TTL_MINUTES = "session_ttl_minutes"
+KEY_SESSION_ID = "session_id"
+KEY_CLARIFY = "clarify"
+KEY_ERROR = "error"
+KEY_TRACING = "tracing"
+KEY_EXPORTER = "exporter"
+KEY_PRICES = "prices"
+KEY_MAX_CONTEXT_TOKENS = "max_context_tokens"
+KEY_RERANK = "rerank"
+KEY_FETCH_K = "fetch_k"
+KEY_MMR_LAMBDA = "mmr_lambda"
+KEY_CROSS_ENCODER_MODEL = "cross_encoder_model"
+KEY_QUERY_CACHE_SIZE = "query_cache_size"
+KEY_SCOPE_FILTERS = "scope_filters"
+KEY_SUMMARIES = "summaries"
+KEY_MODEL = "model"
+KEY_CONCURRENCY = "concurrency"
+KEY_MAX_FILE_TOKENS = "max_file_tokens"
+KEY_MIN_FILES = "min_files"
+KEY_TOP_FILES = "top_files"
+KEY_TOP_DIRECTORIES = "top_directories"
+KEY_CONTEXT_AGENTS = "context_agents"
 
 # Values
 DEFAULT_TOP_K_EXPLAINER = 3
@@ -54,6 +118,16 @@ ALLOWED_INTENTS = {
     Intent.EXPLAIN.value,
 }
 COLLECTION_NAME = "code_chunks"
+FILE_INGEST_STATE = "ingest_state.json"
+FILE_CHUNK_MANIFEST = "chunk_manifest.sqlite"
+FILE_EMBEDDING_CACHE = "embedding_cache.sqlite"
+FILE_LEXICAL_INDEX = "lexical_index.sqlite"
+FILE_SYMBOL_INDEX = "symbol_index.sqlite"
+FILE_SUMMARY_INDEX = "summary_index.sqlite"
+FILE_ANSWER_CACHE = "answer_cache.sqlite"
+FILE_INTENT_LOG = "intent_log.jsonl"
+FILE_TRACES = "traces.jsonl"
+DEFAULT_EMBEDDING_CACHE_MAX_MB = 1024
 
 # Env variables
 ENV_OPENAIAPI_KEY = "OPENAPI_KEY"
@@ -0,0 +1,235 @@
+"""Pack retrieved chunks into a token-budgeted prompt context."""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import tiktoken
+from langchain.schema import Document
+
+from ingestion.chunk_code import DEFAULT_ENCODING
+from utils.constants import (
+    KEY_CHUNK_INDEX,
+    KEY_CODE_LANGUAGE,
+    KEY_RELATIVE_PATH,
+    KEY_TOKEN_COUNT,
+    KEY_UNKNOWN,
+)
+
+logger = logging.getLogger(__name__)
+
+# Enough for the default top_k chunks (500 tokens each) of any agent
+DEFAULT_MAX_CONTEXT_TOKENS = 3000
+# Shortest suffix/prefix match treated as chunk overlap, not coincidence
+_MIN_OVERLAP_CHARS = 16
+# A block cut to fit the budget keeps at least this many tokens
+_MIN_TRUNCATED_TOKENS = 64
+_GAP = "\n...\n"
+# Allowance per chunk for what joins it to the block (gap marks, quotes)
+_JOIN_TOKENS = 2
+
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int
+    # Tokens the chunks would take formatted one by one
+    raw_tokens: int
+    n_chunks: int
+    n_dropped: int
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.raw_tokens - self.tokens
+
+
+@dataclass
+class _Block:
+    """Chunks of one file, merged, ranked by their most relevant chunk."""
+
+    path: str
+    language: Optional[str]
+    rank: int
+    # (chunk index, text, stored token count or None) in retrieval order
+    chunks: List[Tuple]
+
+
+def _encoding():
+    return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def count_tokens(text: str) -> int:
+    """Tokens of `text` as `pack_context` counts them."""
+    return len(_encoding().encode_ordinary(text))
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right`."""
+    probe = right[:_MIN_OVERLAP_CHARS]
+    if len(probe) < _MIN_OVERLAP_CHARS:
+        return 0
+    start = left.find(probe, max(0, len(left) - len(right)))
+    while start != -1:
+        if right.startswith(left[start:]):
+            return len(left) - start
+        start = left.find(probe, start + 1)
+    return 0
+
+
+def _line_overlap(left: List[str], right: List[str]) -> int:
+    """
+    Most lines `right` starts with that `left` ends with; the first may be
+    the tail of a line cut mid-way.
+    """
+    for k in range(min(len(left), len(right)), 0, -1):
+        if (
+            left[-k].endswith(right[0])
+            and left[len(left) - k + 1 :] == right[1:k]
+        ):
+            return k
+    return 0
+
+
+def _merge(chunks: List[Tuple]) -> str:
+    """
+    Join a file's `(chunk index, text, tokens)` chunks in index order, dropping
+    the text each shares with the previous one (the splitter's overlap)
+    and any lines repeated from its end; consecutive chunks continue each
+    other, others are marked as a gap.
+    """
+    previous, merged, _ = chunks[0]
+    for idx, text, _ in chunks[1:]:
+        consecutive, previous = idx == previous + 1, idx
+        if text in merged:
+            continue
+        overlap = _overlap(merged, text)
+        if overlap:
+            merged += text[overlap:]
+            continue
+        if consecutive:
+            # Syntax-aligned chunks meet at a line boundary
+            merged += "\n" + text
+            continue
+        lines = text.splitlines()
+        lines = lines[_line_overlap(merged.splitlines(), lines) :]
+        if lines:
+            merged += _GAP + "\n".join(lines)
+    return merged
+
+
+def format_chunk(doc: Document) -> str:
+    """One retrieved chunk with its file, language and index header."""
+    meta = doc.metadata or {}
+    path = meta.get(KEY_RELATIVE_PATH, KEY_UNKNOWN)
+    idx = meta.get(KEY_CHUNK_INDEX, "?")
+    lang = meta.get(KEY_CODE_LANGUAGE)
+    snippet = doc.page_content.strip()
+    return f"''' {KEY_CODE_LANGUAGE}: {lang}, {KEY_RELATIVE_PATH}: {path}, ({KEY_CHUNK_INDEX} {idx})\n{snippet} '''"
+
+
+def _format_block(block: _Block, chunks: List[Tuple]) -> str:
+    chunks = sorted(chunks, key=lambda chunk: chunk[0])
+    indices = ", ".join(str(chunk[0]) for chunk in chunks)
+    text = _merge(chunks)
+    return (
+        f"''' {KEY_CODE_LANGUAGE}: {block.language}, "
+        f"{KEY_RELATIVE_PATH}: {block.path}, ({KEY_CHUNK_INDEX} {indices})\n"
+        f"{text.strip()} '''"
+    )
+
+
+def _blocks(docs: List[Document]) -> List[_Block]:
+    blocks: Dict[str, _Block] = {}
+    seen_texts = set()
+    for rank, doc in enumerate(docs):
+        meta = doc.metadata or {}
+        text = doc.page_content.strip()
+        if not text or text in seen_texts:
+            continue
+        seen_texts.add(text)
+        path = meta.get(KEY_RELATIVE_PATH, KEY_UNKNOWN)
+        block = blocks.setdefault(
+            path, _Block(path, meta.get(KEY_CODE_LANGUAGE), rank, [])
+        )
+        block.chunks.append(
+            (meta.get(KEY_CHUNK_INDEX, 0), text, meta.get(KEY_TOKEN_COUNT))
+        )
+    return sorted(blocks.values(), key=lambda block: block.rank)
+
+
+def _block_tokens(encoding, part: str, chunks: List[Tuple]) -> int:
+    """
+    Tokens of a formatted block: its header plus the chunks' stored
+    counts when they all have one (an upper bound, as merging only drops
+    text), else the whole block encoded.
+    """
+    counts = [chunk[2] for chunk in chunks]
+    if None in counts:
+        return len(encoding.encode_ordinary(part))
+    header = part.partition("\n")[0]
+    return (
+        len(encoding.encode_ordinary(header))
+        + sum(counts)
+        + _JOIN_TOKENS * len(counts)
+    )
+
+
+def _raw_tokens(encoding, docs: List[Document]) -> int:
+    """Tokens of `docs` formatted one by one, from stored counts if any."""
+    texts, stored = [], 0
+    for doc in docs:
+        formatted = format_chunk(doc)
+        count = (doc.metadata or {}).get(KEY_TOKEN_COUNT)
+        if count is None:
+            texts.append(formatted)
+        else:
+            texts.append(formatted.partition("\n")[0])
+            stored += count + _JOIN_TOKENS
+    return stored + sum(
+        len(ids) for ids in encoding.encode_ordinary_batch(texts)
+    )
+
+
+def pack_context(
+    docs: List[Document], max_tokens: int = DEFAULT_MAX_CONTEXT_TOKENS
+) -> PackedContext:
+    """
+    Format `docs` (most relevant first) as prompt context of at most
+    about `max_tokens` tiktoken tokens.
+
+    Chunks of the same file are merged in `chunk_index` order into one
+    block with a single header, without the overlap between consecutive
+    chunks or lines repeated across a chunk boundary; identical chunks
+    are kept once. Blocks are added by relevance while they fit. A block
+    that doesn't is tried with just its most relevant chunk, and the most
+    relevant content is truncated rather than dropped if it alone exceeds
+    the budget.
+
+    Chunks carrying a `token_count` from ingestion are budgeted by it
+    rather than tokenized again; only headers and truncation are encoded.
+    """
+    encoding = _encoding()
+    parts: List[str] = []
+    tokens = n_chunks = 0
+    for block in _blocks(docs):
+        remaining = max_tokens - tokens
+        # The whole block, else only its most relevant chunk
+        for chunks in (block.chunks, block.chunks[:1]):
+            part = _format_block(block, chunks)
+            part_tokens = _block_tokens(encoding, part, chunks)
+            if part_tokens <= remaining:
+                break
+        if part_tokens > remaining:
+            if parts or remaining < _MIN_TRUNCATED_TOKENS:
+                continue
+            part_ids = encoding.encode_ordinary(part)[: remaining - 2]
+            part = encoding.decode(part_ids) + " '''"
+            part_tokens = remaining
+        parts.append(part)
+        tokens += part_tokens
+        n_chunks += len(chunks)
+
+    raw_tokens = _raw_tokens(encoding, docs)
+    return PackedContext(
+        "\n\n".join(parts), tokens, raw_tokens, n_chunks, len(docs) - n_chunks
+    )
@@ -0,0 +1,108 @@
+"""Path, directory and language hints in questions, as retrieval filters."""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from ingestion.load_vectorstore import load_path_index
+from ingestion.path_index import PathIndex, path_language
+from utils.constants import (
+    KEY_CODE_LANGUAGE,
+    KEY_RELATIVE_PATH,
+    KEY_RETRIEVAL,
+    KEY_SCOPE_FILTERS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Beyond this many files a path filter barely narrows the search but
+# makes every query carry a long `$in` list
+MAX_SCOPE_FILES = 2000
+# Language names and extensions -> the `language` metadata value
+_LANGUAGE_WORDS = {
+    "python": "py",
+    "py": "py",
+    "javascript": "js",
+    "js": "js",
+    "typescript": "ts",
+    "ts": "ts",
+    "java": "java",
+    "markdown": "md",
+    "md": "md",
+}
+# A bare name right after these ("in ingestion", "under the api") is
+# looked up as a directory or file
+_SCOPE_WORDS = {"in", "under", "inside", "within", "from"}
+_SKIPPED_WORDS = {"the", "a", "our", "this"}
+_PUNCTUATION = "`'\"?,;:!()[]{}"
+
+
+@dataclass
+class QueryScope:
+    # Directories (ending in "/") and files the question names
+    paths: List[str] = field(default_factory=list)
+    languages: Set[str] = field(default_factory=set)
+
+
+def _after_scope_word(words: List[str], i: int) -> bool:
+    j = i - 1
+    while j >= 0 and words[j].lower() in _SKIPPED_WORDS:
+        j -= 1
+    return j >= 0 and words[j].lower() in _SCOPE_WORDS
+
+
+def parse_scope(question: str, index: PathIndex) -> QueryScope:
+    """
+    Pick out the paths and languages `question` restricts itself to:
+
+    - paths: words with a "/" ("src/api", "utils/"), file names with an
+      indexed extension ("retrieval.py") and bare names after "in",
+      "under", ... ("in ingestion"), each matched against `index` on
+      whole trailing path components; unknown ones are ignored
+    - languages: names and extensions ("python", "TypeScript", "*.java")
+      of languages the repo has
+    """
+    scope = QueryScope()
+    words = [word.strip(_PUNCTUATION).rstrip(".") for word in question.split()]
+    for i, word in enumerate(words):
+        lower = word.lower()
+        extension = lower.lstrip("*.") if lower.startswith((".", "*.")) else ""
+        language = extension or _LANGUAGE_WORDS.get(lower)
+        if language in index.languages:
+            scope.languages.add(language)
+        elif (
+            "/" in word
+            or path_language(word) in index.languages
+            or _after_scope_word(words, i)
+        ):
+            scope.paths.extend(index.resolve(word))
+    return scope
+
+
+def scope_filter(scope: QueryScope, index: PathIndex) -> Optional[Dict]:
+    """
+    Chroma-style metadata filter for `scope`: the files under its paths
+    (in its languages, if any), else just its languages. None when it
+    would not narrow the search.
+    """
+    if scope.paths:
+        files = index.files_under(scope.paths, scope.languages)
+        if files and len(files) <= MAX_SCOPE_FILES:
+            return {KEY_RELATIVE_PATH: {"$in": files}}
+        logger.info("Ignoring path scope %s: %d files", scope.paths, len(files))
+    if scope.languages and scope.languages < index.languages:
+        return {KEY_CODE_LANGUAGE: {"$in": sorted(scope.languages)}}
+    return None
+
+
+def get_scope_filter(cfg: Dict, question: str) -> Optional[Dict]:
+    """
+    Metadata filter for the paths and languages `question` mentions, or
+    None. Disabled with `[retrieval] scope_filters = false`.
+    """
+    if not cfg.get(KEY_RETRIEVAL, {}).get(KEY_SCOPE_FILTERS, True):
+        return None
+    index = load_path_index(cfg)
+    if index is None:
+        return None
+    return scope_filter(parse_scope(question, index), index)
@@ -0,0 +1,173 @@
+"""Second retrieval stage: rerank over-fetched chunks before the top_k cut."""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+from langchain.schema import Document
+
+from ingestion.load_vectorstore import load_vectorstore
+from utils.constants import (
+    KEY_CROSS_ENCODER_MODEL,
+    KEY_FETCH_K,
+    KEY_MMR_LAMBDA,
+    KEY_RERANK,
+)
+from utils.resource_pool import ResourcePool
+from utils.retrieval import doc_id
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:  # optional: `poetry install -E rerank`
+    CrossEncoder = None
+
+logger = logging.getLogger(__name__)
+
+RERANK_NONE = "none"
+RERANK_MMR = "mmr"
+RERANK_CROSS_ENCODER = "cross_encoder"
+DEFAULT_RERANK = RERANK_MMR
+# Candidates retrieved before reranking cuts them to top_k
+DEFAULT_FETCH_K = 50
+# Weight of relevance against novelty; 1.0 ranks by relevance alone
+DEFAULT_MMR_LAMBDA = 0.7
+# ~22M parameters: tens of ms for 50 chunks on a laptop CPU
+DEFAULT_CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+_CROSS_ENCODER_BATCH_SIZE = 16
+_CROSS_ENCODERS = ResourcePool("cross-encoder", max_size=2)
+
+
+@dataclass
+class RerankSettings:
+    method: str = DEFAULT_RERANK
+    fetch_k: int = DEFAULT_FETCH_K
+    mmr_lambda: float = DEFAULT_MMR_LAMBDA
+    model: str = DEFAULT_CROSS_ENCODER_MODEL
+
+
+def get_rerank_settings(cfg: Dict, agent_name: str) -> RerankSettings:
+    """
+    Reranking for an agent, from `[<agent>] rerank` ("mmr", the default,
+    "cross_encoder" or "none"), `fetch_k`, `mmr_lambda` and
+    `cross_encoder_model`.
+
+    Raises:
+        ValueError: on an unknown rerank method.
+    """
+    agent_cfg = cfg.get(agent_name, {})
+    settings = RerankSettings(
+        agent_cfg.get(KEY_RERANK, DEFAULT_RERANK),
+        agent_cfg.get(KEY_FETCH_K, DEFAULT_FETCH_K),
+        agent_cfg.get(KEY_MMR_LAMBDA, DEFAULT_MMR_LAMBDA),
+        agent_cfg.get(KEY_CROSS_ENCODER_MODEL, DEFAULT_CROSS_ENCODER_MODEL),
+    )
+    if settings.method not in (RERANK_NONE, RERANK_MMR, RERANK_CROSS_ENCODER):
+        raise ValueError(
+            f"Unknown [{agent_name}] {KEY_RERANK}: {settings.method}"
+        )
+    return settings
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def mmr(
+    relevance: np.ndarray, vectors: np.ndarray, k: int, mmr_lambda: float
+) -> List[int]:
+    """
+    Maximal marginal relevance (Carbonell & Goldstein, 1998): greedily
+    pick the candidate maximizing `mmr_lambda * relevance - (1 -
+    mmr_lambda) * (max cosine similarity to those already picked)`.
+
+    Args:
+        relevance: Score per candidate, higher is better.
+        vectors:   L2-normalized candidate vectors, one row each.
+
+    Returns:
+        Indices of the `k` picks, in pick order.
+    """
+    similarity = vectors @ vectors.T
+    redundancy = np.zeros(len(relevance))
+    available = np.ones(len(relevance), dtype=bool)
+    picks: List[int] = []
+    for _ in range(min(k, len(relevance))):
+        scores = mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+        pick = int(np.argmax(np.where(available, scores, -np.inf)))
+        picks.append(pick)
+        available[pick] = False
+        redundancy = np.maximum(redundancy, similarity[pick])
+    return picks
+
+
+def _cross_encoder(model_name: str):
+    if CrossEncoder is None:
+        raise ImportError(
+            "Cross-encoder reranking needs sentence-transformers: "
+            "poetry install -E rerank"
+        )
+    return _CROSS_ENCODERS.get(
+        model_name, lambda: CrossEncoder(model_name, device="cpu")
+    )
+
+
+def _cross_encoder_relevance(
+    model_name: str, question: str, docs: List[Document]
+) -> np.ndarray:
+    scores = _cross_encoder(model_name).predict(
+        [(question, doc.page_content) for doc in docs],
+        batch_size=_CROSS_ENCODER_BATCH_SIZE,
+        show_progress_bar=False,
+    )
+    # Logits to (0, 1), on the same scale as the MMR redundancy term
+    return 1 / (1 + np.exp(-np.asarray(scores, dtype=np.float64)))
+
+
+def rerank(
+    cfg: Dict,
+    question: str,
+    docs: List[Document],
+    top_k: int,
+    settings: RerankSettings,
+) -> List[Document]:
+    """
+    Cut over-fetched `docs` for `question` down to `top_k` with `settings`.
+
+    Both methods select with MMR over the stored chunk vectors, so near
+    duplicates (copied files, overlapping chunks) don't take several
+    slots. "mmr" takes relevance from the order of `docs` (the hybrid
+    ranking, which cosine similarity to the question alone would lose);
+    "cross_encoder" scores each (question, chunk) pair with a local
+    cross-encoder.
+    """
+    if settings.method == RERANK_NONE or len(docs) <= 1:
+        return docs[:top_k]
+
+    start = time.perf_counter()
+    store = load_vectorstore(cfg)
+    ids = [doc_id(doc) for doc in docs]
+    stored = store.get_vectors(ids)
+    dim = len(next(iter(stored.values()))) if stored else 0
+    # Chunks without a stored vector are never seen as redundant
+    vectors = _normalize(
+        np.array(
+            [stored.get(id_, np.zeros(dim)) for id_ in ids], dtype=np.float32
+        )
+    )
+    if settings.method == RERANK_CROSS_ENCODER:
+        relevance = _cross_encoder_relevance(settings.model, question, docs)
+    else:
+        # First-stage order, linear from 1 down, keeps the BM25 signal
+        relevance = 1 - np.arange(len(docs)) / len(docs)
+    picks = mmr(relevance, vectors, top_k, settings.mmr_lambda)
+    logger.info(
+        "Reranked %d candidates to %d with %s in %.2f ms",
+        len(docs),
+        len(picks),
+        settings.method,
+        1000 * (time.perf_counter() - start),
+    )
+    return [docs[i] for i in picks]
@@ -0,0 +1,141 @@
+"""Thread-safe keyed pool of lazily opened, LRU-evicted resources."""
+
+import logging
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Generic, Hashable, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Resources used more recently than this are never closed by eviction, so
+# a request that just fetched one can finish with it
+DEFAULT_MIN_IDLE_S = 30.0
+
+
+class _Entry(Generic[T]):
+    __slots__ = ("value", "last_used")
+
+    def __init__(self, value: T, last_used: float):
+        self.value = value
+        self.last_used = last_used
+
+
+class ResourcePool(Generic[T]):
+    """
+    Process-wide cache of expensive resources (model clients, open
+    stores) by key, opened on first use.
+
+    Concurrent first requests for one key open it once, without blocking
+    requests for other keys. Beyond `max_size` entries the least recently
+    used are evicted, and with `idle_ttl_s` anything unused that long is
+    too; evicted and replaced resources are passed to `close`. Entries
+    used within `min_idle_s` are never evicted, so the pool may briefly
+    exceed `max_size` while all of them are busy.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int,
+        *,
+        idle_ttl_s: Optional[float] = None,
+        close: Optional[Callable[[T], None]] = None,
+        min_idle_s: float = DEFAULT_MIN_IDLE_S,
+    ):
+        self._name = name
+        self._max_size = max_size
+        self._idle_ttl_s = idle_ttl_s
+        self._close = close
+        self._min_idle_s = min_idle_s
+        self._lock = Lock()
+        self._entries: OrderedDict = OrderedDict()
+        # Per-key locks held while a key is being opened
+        self._opening: Dict[Hashable, Lock] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def _hit(self, key: Hashable, now: float) -> Optional[T]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry.last_used = now
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def get(self, key: Hashable, open_fn: Callable[[], T]) -> T:
+        """The resource for `key`, calling `open_fn` to create it if needed."""
+        now = time.monotonic()
+        with self._lock:
+            value = self._hit(key, now)
+            if value is not None:
+                evicted = self._evict(now)
+            else:
+                key_lock = self._opening.setdefault(key, Lock())
+        if value is not None:
+            self._close_all(evicted)
+            return value
+
+        with key_lock:
+            with self._lock:
+                value = self._hit(key, time.monotonic())
+            if value is not None:
+                return value
+            try:
+                value = open_fn()
+                self.put(key, value)
+            finally:
+                with self._lock:
+                    self._opening.pop(key, None)
+        return value
+
+    def put(self, key: Hashable, value: T) -> None:
+        """Add or replace the resource for `key`; a replaced one is closed."""
+        now = time.monotonic()
+        with self._lock:
+            old = self._entries.get(key)
+            self._entries[key] = _Entry(value, now)
+            self._entries.move_to_end(key)
+            evicted = self._evict(now)
+        if old is not None and old.value is not value:
+            evicted.insert(0, (key, old.value))
+        self._close_all(evicted)
+
+    def _evict(self, now: float) -> List:
+        evicted = []
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            idle_s = now - entry.last_used
+            over_size = len(self._entries) > self._max_size
+            expired = self._idle_ttl_s is not None and idle_s > self._idle_ttl_s
+            # Oldest first: once one entry stays, all newer ones do too
+            if idle_s < self._min_idle_s or not (over_size or expired):
+                break
+            del self._entries[key]
+            evicted.append((key, entry.value))
+        return evicted
+
+    def _close_all(self, evicted: List) -> None:
+        for key, value in evicted:
+            logger.info("Closing %s entry %s", self._name, key)
+            if self._close is None:
+                continue
+            try:
+                self._close(value)
+            except Exception as e:
+                logger.warning(
+                    "Failed to close %s entry %s: %s", self._name, key, e
+                )
+
+    def clear(self) -> None:
+        """Close and drop every resource."""
+        with self._lock:
+            evicted = [(k, e.value) for k, e in self._entries.items()]
+            self._entries.clear()
+        self._close_all(evicted)
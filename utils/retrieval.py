@@ -0,0 +1,339 @@
+"""Hybrid lexical (BM25) + vector retrieval, and symbol-index lookups."""
+
+import hashlib
+import logging
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain.schema import Document
+
+from ingestion.load_vectorstore import (
+    load_lexical_index,
+    load_symbol_index,
+    load_vectorstore,
+)
+from ingestion.symbol_index import DEFINITION_KINDS, REFERENCE_KINDS
+from utils.constants import (
+    KEY_HYBRID,
+    KEY_LOCAL_PATH,
+    KEY_PROJECT_NAME,
+    KEY_QUERY_VARIANTS,
+    KEY_RELATIVE_PATH,
+    KEY_REPO,
+    KEY_RETRIEVAL,
+    KEY_RRF_K,
+    VALUES_UTF_8,
+)
+
+logger = logging.getLogger(__name__)
+
+# Rank offset from the reciprocal rank fusion paper (Cormack et al., 2009)
+DEFAULT_RRF_K = 60
+# Candidates pulled from each retriever per requested result before fusion
+_CANDIDATES_PER_RESULT = 4
+# Words allowed around the symbol(s) in a pure-symbol question
+_QUESTION_WORDS = set(
+    "a all an and are call called calls class def defined definition does "
+    "find for function in is me method of show the to usage usages used "
+    "where which who".split()
+)
+_SYMBOL_RE = re.compile(r"[A-Za-z_][\w.]*(\(\))?")
+# snake_case, camelCase, dotted.name or call()
+_CODE_LIKE_RE = re.compile(r"_|\.|\(\)|[a-z][A-Z]")
+_MAX_SYMBOLS = 3
+# Per looked-up symbol, in the navigator's symbol-index context
+_MAX_DEFINITIONS = 5
+_MAX_REFERENCES = 30
+_MAX_DEFINITION_LINES = 60
+_PUNCTUATION = "`'\"?.,:;!"
+
+
+def _non_question_words(question: str) -> List[str]:
+    words = (word.strip(_PUNCTUATION) for word in question.split())
+    return [
+        word for word in words if word and word.lower() not in _QUESTION_WORDS
+    ]
+
+
+def is_symbol_query(question: str) -> bool:
+    """
+    True for identifier lookups such as "where is get_changed_paths
+    defined?" or "`RepoChanges`": once question words are dropped, only
+    a few identifiers remain and each is clearly code (snake_case,
+    camelCase, dotted or a call).
+    """
+    words = _non_question_words(question)
+    return 0 < len(words) <= _MAX_SYMBOLS and all(
+        _SYMBOL_RE.fullmatch(word) and _CODE_LIKE_RE.search(word)
+        for word in words
+    )
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[str]], rrf_k: int = DEFAULT_RRF_K
+) -> List[str]:
+    """Merge ranked ID lists by summing 1 / (rrf_k + rank) per list."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking, start=1):
+            scores[id_] = scores.get(id_, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def doc_id(doc: Document) -> str:
+    """A retrieved chunk's ID: the content hash ingestion stores it under."""
+    return (
+        getattr(doc, "id", None)
+        or hashlib.sha256(doc.page_content.encode(VALUES_UTF_8)).hexdigest()
+    )
+
+
+def _fuse(
+    rankings: List[List[str]],
+    docs_by_id: Dict[str, Document],
+    lexical,
+    top_k: int,
+    rrf_k: int,
+) -> List[Document]:
+    """RRF-merge ID rankings; chunks only BM25 found come from `lexical`."""
+    fused = reciprocal_rank_fusion(rankings, rrf_k)[:top_k]
+    missing = [id_ for id_ in fused if id_ not in docs_by_id]
+    if missing and lexical is not None:
+        docs_by_id.update(
+            (doc.id, doc) for doc in lexical.get_documents(missing)
+        )
+    return [docs_by_id[id_] for id_ in fused if id_ in docs_by_id]
+
+
+def _lexical_ids(
+    lexical, question: str, n_candidates: int, filter: Optional[Dict] = None
+) -> List[str]:
+    start = time.perf_counter()
+    ids = [id_ for id_, _ in lexical.search(question, n_candidates, filter)]
+    logger.info(
+        "Lexical search: %d hits in %.2f ms",
+        len(ids),
+        1000 * (time.perf_counter() - start),
+    )
+    return ids
+
+
+def _load_lexical(cfg: Dict):
+    if not cfg.get(KEY_RETRIEVAL, {}).get(KEY_HYBRID, True):
+        return None
+    return load_lexical_index(cfg)
+
+
+def hybrid_search(
+    cfg: Dict, question: str, top_k: int, filter: Optional[Dict] = None
+) -> List[Document]:
+    """
+    Retrieve `top_k` chunks for `question`, fusing BM25 and vector
+    rankings with reciprocal rank fusion; both only search chunks
+    matching the Chroma-style metadata `filter`, if given.
+
+    Pure-symbol questions with lexical hits are answered from the BM25
+    index alone, skipping the query embedding call. Falls back to vector
+    search when `[retrieval] hybrid = false` or no lexical index exists.
+    """
+    lexical = _load_lexical(cfg)
+    if lexical is None:
+        return load_vectorstore(cfg).similarity_search(
+            question, k=top_k, filter=filter
+        )
+
+    n_candidates = top_k * _CANDIDATES_PER_RESULT
+    lexical_ids = _lexical_ids(lexical, question, n_candidates, filter)
+    if lexical_ids and is_symbol_query(question):
+        logger.info("Symbol lookup; skipping vector search")
+        return lexical.get_documents(lexical_ids[:top_k])
+
+    vector_docs = load_vectorstore(cfg).similarity_search(
+        question, k=n_candidates, filter=filter
+    )
+    if not lexical_ids:
+        return vector_docs[:top_k]
+
+    docs_by_id = {doc_id(doc): doc for doc in vector_docs}
+    return _fuse(
+        [lexical_ids, list(docs_by_id)],
+        docs_by_id,
+        lexical,
+        top_k,
+        cfg.get(KEY_RETRIEVAL, {}).get(KEY_RRF_K, DEFAULT_RRF_K),
+    )
+
+
+def _embed_queries(embeddings, queries: List[str]) -> List[List[float]]:
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(queries)
+    return embeddings.embed_documents(queries)
+
+
+def multi_query_search(
+    cfg: Dict, queries: List[str], top_k: int, filter: Optional[Dict] = None
+) -> List[Document]:
+    """
+    Retrieve `top_k` chunks for several variants of one question (e.g.
+    rephrasings or sub-questions), fusing the vector ranking of every
+    variant, and its BM25 ranking unless `[retrieval] hybrid = false`,
+    with reciprocal rank fusion. `filter` restricts both as in
+    `hybrid_search`.
+
+    Uncached variants are embedded in one request and the store is
+    searched with all their vectors at once.
+    """
+    queries = list(dict.fromkeys(queries))
+    store = load_vectorstore(cfg)
+    n_candidates = top_k * _CANDIDATES_PER_RESULT
+    start = time.perf_counter()
+    vectors = _embed_queries(store.embeddings, queries)
+    results = store.similarity_search_by_vectors(vectors, n_candidates, filter)
+    logger.info(
+        "Vector search for %d query variants in %.2f ms",
+        len(queries),
+        1000 * (time.perf_counter() - start),
+    )
+
+    docs_by_id: Dict[str, Document] = {}
+    rankings = []
+    for docs in results:
+        ranking = []
+        for doc in docs:
+            id_ = doc_id(doc)
+            docs_by_id.setdefault(id_, doc)
+            ranking.append(id_)
+        rankings.append(ranking)
+    lexical = _load_lexical(cfg)
+    if lexical is not None:
+        rankings += [
+            _lexical_ids(lexical, q, n_candidates, filter) for q in queries
+        ]
+    return _fuse(
+        rankings,
+        docs_by_id,
+        lexical,
+        top_k,
+        cfg.get(KEY_RETRIEVAL, {}).get(KEY_RRF_K, DEFAULT_RRF_K),
+    )
+
+
+def query_variants(question: str) -> List[str]:
+    """
+    The question, then each code identifier it names (snake_case,
+    camelCase, dotted or a call), so chunks about e.g. `get_changed_paths`
+    rank even when the rest of a long question pulls the question's own
+    embedding elsewhere. Pure-symbol questions are left as they are:
+    `hybrid_search` already answers them from BM25 alone.
+    """
+    if is_symbol_query(question):
+        return [question]
+    identifiers = [
+        word.removesuffix("()")
+        for word in _non_question_words(question)
+        if _SYMBOL_RE.fullmatch(word) and _CODE_LIKE_RE.search(word)
+    ]
+    return list(dict.fromkeys([question, *identifiers[:_MAX_SYMBOLS]]))
+
+
+def search(
+    cfg: Dict, question: str, top_k: int, filter: Optional[Dict] = None
+) -> List[Document]:
+    """
+    Retrieve `top_k` chunks for `question`: `multi_query_search` over its
+    `query_variants` when it names identifiers, `hybrid_search` otherwise
+    or with `[retrieval] query_variants = false`.
+    """
+    variants = [question]
+    if cfg.get(KEY_RETRIEVAL, {}).get(KEY_QUERY_VARIANTS, True):
+        variants = query_variants(question)
+    if len(variants) == 1:
+        return hybrid_search(cfg, question, top_k, filter)
+    return multi_query_search(cfg, variants, top_k, filter)
+
+
+def _read_lines(path: Path, cache: Dict[Path, List[str]]) -> List[str]:
+    if path not in cache:
+        try:
+            cache[path] = path.read_text(
+                encoding=VALUES_UTF_8, errors="ignore"
+            ).splitlines()
+        except OSError:
+            cache[path] = []
+    return cache[path]
+
+
+def get_symbol_context(cfg: Dict, question: str) -> Optional[str]:
+    """
+    Resolve the identifiers in `question` against the symbol index and
+    return their definitions (source read from the ingested checkout) and
+    reference sites, formatted as code context. None if nothing resolves,
+    so callers can fall back to `hybrid_search`.
+
+    A plain word only counts if something is defined under that name;
+    snake_case / camelCase / dotted words also match on references alone.
+    """
+    index = load_symbol_index(cfg)
+    if index is None:
+        return None
+
+    start = time.perf_counter()
+    repo_cfg = cfg.get(KEY_REPO, {})
+    repo_root = Path(repo_cfg.get(KEY_LOCAL_PATH, ".")) / repo_cfg.get(
+        KEY_PROJECT_NAME, ""
+    )
+    lines_cache: Dict[Path, List[str]] = {}
+    sections = []
+    n_definitions = n_references = 0
+    symbols = [
+        word.removesuffix("()")
+        for word in _non_question_words(question)
+        if _SYMBOL_RE.fullmatch(word)
+    ]
+    for symbol in symbols[:_MAX_SYMBOLS]:
+        definitions = index.lookup(symbol, DEFINITION_KINDS, _MAX_DEFINITIONS)
+        if not definitions and not _CODE_LIKE_RE.search(symbol):
+            continue
+        references = index.lookup(symbol, REFERENCE_KINDS, _MAX_REFERENCES)
+        n_definitions += len(definitions)
+        n_references += len(references)
+
+        for hit in definitions:
+            lines = _read_lines(repo_root / hit.path, lines_cache)
+            end_line = min(hit.end_line, hit.line + _MAX_DEFINITION_LINES - 1)
+            snippet = "\n".join(lines[hit.line - 1 : end_line])
+            sections.append(
+                f"''' {hit.kind} {hit.name}, {KEY_RELATIVE_PATH}: {hit.path}, "
+                f"lines {hit.line}-{hit.end_line}\n{snippet} '''"
+            )
+        if references:
+            ref_lines = [f"References to {symbol}:"]
+            seen = set()
+            for hit in references:
+                if (hit.path, hit.line) in seen:
+                    continue
+                seen.add((hit.path, hit.line))
+                lines = _read_lines(repo_root / hit.path, lines_cache)
+                source = (
+                    lines[hit.line - 1].strip()
+                    if hit.line <= len(lines)
+                    else ""
+                )
+                ref_lines.append(
+                    f"- {hit.path}:{hit.line} in {hit.scope} ({hit.kind}): "
+                    f"{source}"
+                )
+            sections.append("\n".join(ref_lines))
+
+    if not sections:
+        return None
+    logger.info(
+        "Resolved %d definitions and %d references from the symbol index "
+        "in %.2f ms",
+        n_definitions,
+        n_references,
+        1000 * (time.perf_counter() - start),
+    )
+    return "\n\n".join(sections)
@@ -0,0 +1,137 @@
+"""Coarse-to-fine retrieval through the file and directory summary tier."""
+
+import logging
+import time
+from typing import Dict, List, Optional
+
+from langchain.schema import Document
+
+from ingestion.load_vectorstore import (
+    load_path_index,
+    load_summary_index,
+    load_vectorstore,
+)
+from ingestion.summary_index import KIND_DIRECTORY, KIND_FILE
+from langgraph_flow.agents.enums import Intent
+from utils.constants import (
+    KEY_CONTEXT_AGENTS,
+    KEY_HYBRID,
+    KEY_MIN_FILES,
+    KEY_RELATIVE_PATH,
+    KEY_RETRIEVAL,
+    KEY_SUMMARIES,
+    KEY_TOP_DIRECTORIES,
+    KEY_TOP_FILES,
+)
+from utils.context_packer import count_tokens
+from utils.query_scope import MAX_SCOPE_FILES
+from utils.retrieval import reciprocal_rank_fusion
+
+logger = logging.getLogger(__name__)
+
+# Below this many files flat chunk search is fast already, and narrowing
+# it to a few files would only cost recall
+DEFAULT_MIN_FILES = 500
+DEFAULT_TOP_FILES = 50
+DEFAULT_TOP_DIRECTORIES = 2
+# Agents whose context starts with the summaries of the retrieved files
+DEFAULT_CONTEXT_AGENTS = [Intent.EXPLAIN.value]
+# Share of an agent's token budget the summaries may take, and the tokens
+# they always leave for code
+_MAX_CONTEXT_SHARE = 0.25
+MIN_CODE_CONTEXT_TOKENS = 1000
+
+
+def get_summary_filter(cfg: Dict, question: str) -> Optional[Dict]:
+    """
+    Coarse stage of retrieval: a `relative_path` filter on the files whose
+    summaries best match `question`, plus the files under the best
+    matching directories, for the chunk search to drill into. Summaries
+    are ranked like chunks in `hybrid_search`: by vector and BM25, fused.
+
+    None when the repo has no summaries or fewer than `[summaries]
+    min_files` files. The question is embedded through the query cache,
+    so the chunk search that follows reuses the vector.
+    """
+    summaries_cfg = cfg.get(KEY_SUMMARIES, {})
+    index = load_summary_index(cfg)
+    paths = load_path_index(cfg)
+    if index is None or paths is None:
+        return None
+    if len(paths) < summaries_cfg.get(KEY_MIN_FILES, DEFAULT_MIN_FILES):
+        return None
+
+    start = time.perf_counter()
+    top_files = summaries_cfg.get(KEY_TOP_FILES, DEFAULT_TOP_FILES)
+    top_directories = summaries_cfg.get(
+        KEY_TOP_DIRECTORIES, DEFAULT_TOP_DIRECTORIES
+    )
+    vector = load_vectorstore(cfg).embeddings.embed_query(question)
+    # Summaries name identifiers verbatim, so BM25 helps here as it does
+    # for chunks; fuse both rankings the same way
+    rankings = []
+    for kind, k in ((KIND_FILE, top_files), (KIND_DIRECTORY, top_directories)):
+        hits = [index.search(vector, k, kind)]
+        if cfg.get(KEY_RETRIEVAL, {}).get(KEY_HYBRID, True):
+            hits.append(index.lexical_search(question, k, kind))
+        ranking = reciprocal_rank_fusion(
+            [[hit.path for hit in kind_hits] for kind_hits in hits]
+        )
+        rankings.append(ranking[:k])
+    file_hits, directory_hits = rankings
+    files = dict.fromkeys(file_hits)
+    files.update(
+        dict.fromkeys(paths.files_under([f"{d}/" for d in directory_hits]))
+    )
+    logger.info(
+        "Summary search: %d files from %d file and %d directory hits "
+        "in %.2f ms",
+        len(files),
+        len(file_hits),
+        len(directory_hits),
+        1000 * (time.perf_counter() - start),
+    )
+    if not files:
+        return None
+    return {KEY_RELATIVE_PATH: {"$in": list(files)[:MAX_SCOPE_FILES]}}
+
+
+def get_summary_context(
+    cfg: Dict, agent_name: str, docs: List[Document], max_tokens: int
+) -> str:
+    """
+    Summaries of the files `docs` come from, most relevant first, for
+    agents in `[summaries] context_agents` (the explainer by default).
+    Takes at most a quarter of the agent's `max_tokens`, and none of the
+    last `MIN_CODE_CONTEXT_TOKENS`; empty when there is nothing to add.
+    """
+    agents = cfg.get(KEY_SUMMARIES, {}).get(
+        KEY_CONTEXT_AGENTS, DEFAULT_CONTEXT_AGENTS
+    )
+    if agent_name not in agents:
+        return ""
+    index = load_summary_index(cfg)
+    if index is None:
+        return ""
+
+    paths = list(
+        dict.fromkeys(doc.metadata.get(KEY_RELATIVE_PATH) for doc in docs)
+    )
+    summaries = index.summaries(path for path in paths if path)
+    budget = min(
+        int(max_tokens * _MAX_CONTEXT_SHARE),
+        max_tokens - MIN_CODE_CONTEXT_TOKENS,
+    )
+    lines = ["File summaries:"]
+    tokens = count_tokens(lines[0])
+    for path in paths:
+        if path not in summaries:
+            continue
+        line = f"- {path}: {summaries[path]}"
+        # With the newline joining it to the previous line
+        line_tokens = count_tokens(f"\n{line}")
+        if tokens + line_tokens > budget:
+            break
+        lines.append(line)
+        tokens += line_tokens
+    return "\n".join(lines) if len(lines) > 1 else ""
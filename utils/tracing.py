@@ -0,0 +1,484 @@
+"""
+Per-question traces of graph nodes, retrieval and LLM calls.
+
+With `[tracing] enabled = true`, every graph run passed a `Tracer.config`
+records one span per node, per chat model call (tokens and estimated
+cost) and per retrieval (`trace_span`; chunks and context length), and
+exports them when the run ends: as JSON lines (`exporter = "jsonl"`, the
+default, to `[tracing] path`) or as OpenTelemetry spans through the
+globally configured tracer provider (`exporter = "otel"`). Sessions
+accumulate a summary of the same numbers.
+
+Disabled, no callback is attached to the graph and `trace_span` only
+looks up the current runnable config.
+"""
+
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import tiktoken
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables.config import var_child_runnable_config
+
+from utils.constants import (
+    FILE_TRACES,
+    KEY_BASE_DIRECTORY,
+    KEY_CACHE_HIT,
+    KEY_ENABLED,
+    KEY_EXPORTER,
+    KEY_INTENT,
+    KEY_PATH,
+    KEY_PRICES,
+    KEY_TRACING,
+    KEY_VECTORSTORE,
+    VALUES_UTF_8,
+)
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # optional: `poetry install -E otel`
+    otel_trace = None
+
+logger = logging.getLogger(__name__)
+
+EXPORTER_JSONL = "jsonl"
+EXPORTER_OTEL = "otel"
+SPAN_GRAPH = "graph"
+SPAN_LLM = "llm"
+SPAN_RETRIEVAL = "retrieval"
+SPAN_SYMBOL_LOOKUP = "symbol_lookup"
+ATTR_CHUNKS = "chunks"
+ATTR_CONTEXT_CHARS = "context_chars"
+ATTR_CONTEXT_TOKENS = "context_tokens"
+ATTR_SAVED_TOKENS = "saved_tokens"
+ATTR_SCOPED = "scoped"
+# USD per million (prompt, completion) tokens; `[tracing.prices]` entries
+# override or extend these. Versioned model names match by prefix.
+DEFAULT_PRICES = {
+    "gpt-4": (30.0, 60.0),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-3.5-turbo": (0.5, 1.5),
+}
+_TOKEN_ENCODING = "cl100k_base"
+_MAX_SESSIONS = 1000
+
+_TRACERS: Dict[str, Optional["Tracer"]] = {}
+_TRACERS_LOCK = Lock()
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float  # epoch seconds
+    duration_ms: float = 0.0
+    attributes: Dict = field(default_factory=dict)
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def _count_tokens(text: str) -> int:
+    return len(tiktoken.get_encoding(_TOKEN_ENCODING).encode(text))
+
+
+def _token_usage(response, prompt: str) -> Tuple[int, int, bool]:
+    """`(prompt, completion, estimated)` tokens of an LLM response."""
+    generation = response.generations[0][0] if response.generations else None
+    usage = getattr(
+        getattr(generation, "message", None), "usage_metadata", None
+    )
+    if usage:
+        return usage["input_tokens"], usage["output_tokens"], False
+    usage = (response.llm_output or {}).get("token_usage")
+    if usage:
+        return usage["prompt_tokens"], usage["completion_tokens"], False
+    # Not reported (e.g. streamed without usage): count locally
+    completion = generation.text if generation is not None else ""
+    return _count_tokens(prompt), _count_tokens(completion), True
+
+
+class QuestionTrace(BaseCallbackHandler):
+    """
+    Callback handler collecting the spans of one graph run; exported
+    through its `Tracer` when the run ends.
+    """
+
+    def __init__(self, tracer: "Tracer", question: str, session_id: str):
+        self._tracer = tracer
+        self.session_id = session_id
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Span] = []
+        self._question = question
+        self._lock = Lock()
+        # run_id -> (span, perf_counter start)
+        self._open: Dict = {}
+        self._root: Optional[Span] = None
+        # Latest span per graph node, the parent of spans inside it
+        self._nodes: Dict[str, Span] = {}
+        self._prompts: Dict = {}
+
+    def _start(self, run_id, name: str, parent: Optional[Span], **attrs):
+        span = Span(
+            name,
+            self.trace_id,
+            _new_id(),
+            parent.span_id if parent else None,
+            time.time(),
+            attributes=attrs,
+        )
+        with self._lock:
+            self.spans.append(span)
+            self._open[run_id] = (span, time.perf_counter())
+        return span
+
+    def _end(self, run_id, error: Optional[BaseException] = None):
+        with self._lock:
+            span, start = self._open.pop(run_id, (None, 0.0))
+        if span is None:
+            return None
+        span.duration_ms = round(1000 * (time.perf_counter() - start), 3)
+        if error is not None:
+            span.attributes["error"] = repr(error)
+        return span
+
+    def add_span(
+        self, name: str, node: Optional[str], start: float, attributes: Dict
+    ) -> None:
+        """Record a finished span that started at perf_counter `start`."""
+        parent = self._nodes.get(node) or self._root
+        duration_s = time.perf_counter() - start
+        span = Span(
+            name,
+            self.trace_id,
+            _new_id(),
+            parent.span_id if parent else None,
+            time.time() - duration_s,
+            round(1000 * duration_s, 3),
+            attributes,
+        )
+        with self._lock:
+            self.spans.append(span)
+
+    def on_chain_start(
+        self,
+        serialized,
+        inputs,
+        *,
+        run_id,
+        parent_run_id=None,
+        metadata=None,
+        **kwargs,
+    ):
+        if parent_run_id is None and self._root is None:
+            self._root = self._start(
+                run_id,
+                SPAN_GRAPH,
+                None,
+                question=self._question,
+                session_id=self.session_id,
+            )
+            return
+        node = (metadata or {}).get("langgraph_node")
+        if node is not None and kwargs.get("name") == node:
+            self._nodes[node] = self._start(run_id, node, self._root)
+
+    def _finish_chain(self, run_id, error=None) -> None:
+        span = self._end(run_id, error)
+        if span is not None and span is self._root:
+            self._tracer.export(self)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        span = self._open.get(run_id, (None,))[0]
+        if span is self._root and isinstance(outputs, dict):
+            span.attributes[KEY_INTENT] = outputs.get(KEY_INTENT)
+            span.attributes[KEY_CACHE_HIT] = outputs.get(KEY_CACHE_HIT, False)
+        self._finish_chain(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish_chain(run_id, error)
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id, metadata=None, **kwargs
+    ):
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        params = kwargs.get("invocation_params") or {}
+        model = (
+            metadata.get("ls_model_name")
+            or params.get("model_name")
+            or params.get("model")
+        )
+        self._prompts[run_id] = "\n".join(
+            str(message.content) for batch in messages for message in batch
+        )
+        self._start(
+            run_id,
+            SPAN_LLM,
+            self._nodes.get(node) or self._root,
+            node=node,
+            model=model,
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt = self._prompts.pop(run_id, "")
+        span = self._end(run_id)
+        if span is None:
+            return
+        try:
+            prompt_tokens, completion_tokens, estimated = _token_usage(
+                response, prompt
+            )
+        except Exception as e:
+            logger.debug("No token usage for LLM span: %s", e)
+            return
+        span.attributes.update(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            tokens_estimated=estimated,
+            cost_usd=self._tracer.cost(
+                span.attributes.get("model"), prompt_tokens, completion_tokens
+            ),
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._prompts.pop(run_id, None)
+        self._end(run_id, error)
+
+
+def _current_trace() -> Tuple[Optional[QuestionTrace], Optional[str]]:
+    """The trace and graph node of the runnable being executed, if any."""
+    config = var_child_runnable_config.get()
+    if not config:
+        return None, None
+    handlers = getattr(config.get("callbacks"), "handlers", None) or ()
+    for handler in handlers:
+        if isinstance(handler, QuestionTrace):
+            return handler, config.get("metadata", {}).get("langgraph_node")
+    return None, None
+
+
+@contextmanager
+def trace_span(name: str, **attributes) -> Iterator[Dict]:
+    """
+    Time the enclosed block as a span of the current question's trace,
+    under the graph node it runs in. Yields the span's attribute dict for
+    the block to add results to; outside a traced run nothing is recorded.
+    """
+    trace, node = _current_trace()
+    if trace is None:
+        yield attributes
+        return
+    start = time.perf_counter()
+    try:
+        yield attributes
+    except Exception as e:
+        attributes["error"] = repr(e)
+        raise
+    finally:
+        trace.add_span(name, node, start, attributes)
+
+
+class _SessionSummary:
+    def __init__(self):
+        self.questions = 0
+        self.seconds = 0.0
+        # span name -> [count, total ms]
+        self.spans: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+        self.totals: Dict[str, float] = defaultdict(float)
+
+    def add(self, spans: List[Span]) -> None:
+        for span in spans:
+            if span.name == SPAN_GRAPH:
+                self.questions += 1
+                self.seconds += span.duration_ms / 1000
+                continue
+            stats = self.spans[span.name]
+            stats[0] += 1
+            stats[1] += span.duration_ms
+            for key in (
+                "prompt_tokens",
+                "completion_tokens",
+                "cost_usd",
+                ATTR_CHUNKS,
+                ATTR_CONTEXT_TOKENS,
+                ATTR_SAVED_TOKENS,
+            ):
+                self.totals[key] += span.attributes.get(key) or 0
+
+    def format(self) -> str:
+        lines = [
+            f"Session summary: {self.questions} questions in "
+            f"{self.seconds:.1f} s",
+            f"{'span':<22}{'calls':>7}{'total s':>10}{'mean ms':>10}",
+        ]
+        for name, (count, total_ms) in sorted(
+            self.spans.items(), key=lambda item: -item[1][1]
+        ):
+            lines.append(
+                f"{name:<22}{count:>7}{total_ms / 1000:>10.2f}"
+                f"{total_ms / count:>10.1f}"
+            )
+        lines.append(
+            f"LLM tokens: {self.totals['prompt_tokens']:.0f} prompt + "
+            f"{self.totals['completion_tokens']:.0f} completion, "
+            f"~${self.totals['cost_usd']:.4f}"
+        )
+        lines.append(
+            f"Retrieved {self.totals[ATTR_CHUNKS]:.0f} chunks, "
+            f"{self.totals[ATTR_CONTEXT_TOKENS]:.0f} context tokens "
+            f"({self.totals[ATTR_SAVED_TOKENS]:.0f} saved by packing)"
+        )
+        return "\n".join(lines)
+
+
+class _JsonlExporter:
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._path = path
+        self._lock = Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        lines = "".join(
+            json.dumps(asdict(span), default=str) + "\n" for span in spans
+        )
+        with self._lock, open(self._path, "a", encoding=VALUES_UTF_8) as f:
+            f.write(lines)
+
+
+class _OtelExporter:
+    def __init__(self):
+        self._tracer = otel_trace.get_tracer("codebase-assistant")
+
+    def export(self, spans: List[Span]) -> None:
+        started = {}
+        # Parents start no later than their children
+        for span in sorted(spans, key=lambda s: s.start):
+            parent = started.get(span.parent_id)
+            otel_span = self._tracer.start_span(
+                span.name,
+                context=otel_trace.set_span_in_context(parent)
+                if parent
+                else None,
+                start_time=int(span.start * 1e9),
+                attributes={
+                    k: v
+                    for k, v in span.attributes.items()
+                    if isinstance(v, (str, bool, int, float))
+                },
+            )
+            started[span.span_id] = otel_span
+        for span in spans:
+            started[span.span_id].end(
+                end_time=int((span.start + span.duration_ms / 1000) * 1e9)
+            )
+
+
+class Tracer:
+    """Exports question traces and keeps per-session summaries."""
+
+    def __init__(self, exporter, prices: Dict[str, Tuple[float, float]]):
+        self._exporter = exporter
+        # Longest prefix first, so "gpt-4o-mini" wins over "gpt-4"
+        self._prices = sorted(
+            prices.items(), key=lambda item: len(item[0]), reverse=True
+        )
+        self._lock = Lock()
+        self._sessions: OrderedDict = OrderedDict()
+
+    def config(self, question: str, session_id: str) -> Dict:
+        """Runnable config that traces one graph run for `question`."""
+        return {"callbacks": [QuestionTrace(self, question, session_id)]}
+
+    def cost(
+        self, model: Optional[str], prompt_tokens: int, completion_tokens: int
+    ) -> Optional[float]:
+        for prefix, (prompt_price, completion_price) in self._prices:
+            if model and model.startswith(prefix):
+                return round(
+                    (
+                        prompt_tokens * prompt_price
+                        + completion_tokens * completion_price
+                    )
+                    / 1e6,
+                    6,
+                )
+        return None
+
+    def export(self, trace: QuestionTrace) -> None:
+        try:
+            self._exporter.export(trace.spans)
+        except Exception as e:
+            # Tracing must never fail a question
+            logger.warning("Failed to export trace: %s", e)
+        with self._lock:
+            summary = self._sessions.pop(trace.session_id, None)
+            summary = summary or _SessionSummary()
+            summary.add(trace.spans)
+            self._sessions[trace.session_id] = summary
+            while len(self._sessions) > _MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+
+    def summary(self, session_id: str) -> Optional[str]:
+        """Printable totals of the session's traced questions."""
+        with self._lock:
+            summary = self._sessions.get(session_id)
+            return summary.format() if summary else None
+
+
+def _create_tracer(
+    tracing_cfg: Dict, exporter_name: str, path: Path
+) -> Optional[Tracer]:
+    if exporter_name == EXPORTER_OTEL:
+        if otel_trace is None:
+            logger.error(
+                "Tracing exporter '%s' needs opentelemetry-api; tracing is off",
+                EXPORTER_OTEL,
+            )
+            return None
+        exporter = _OtelExporter()
+    else:
+        exporter = _JsonlExporter(path)
+        logger.info("Writing traces to %s", path)
+    prices = {
+        **DEFAULT_PRICES,
+        **{
+            model: tuple(price)
+            for model, price in tracing_cfg.get(KEY_PRICES, {}).items()
+        },
+    }
+    return Tracer(exporter, prices)
+
+
+def load_tracer(cfg: Dict) -> Optional[Tracer]:
+    """
+    The tracer configured by `[tracing]`, shared per exporter and path,
+    or None when tracing is disabled (the default).
+    """
+    tracing_cfg = cfg.get(KEY_TRACING, {})
+    if not tracing_cfg.get(KEY_ENABLED, False):
+        return None
+
+    exporter_name = tracing_cfg.get(KEY_EXPORTER, EXPORTER_JSONL)
+    path = Path(
+        tracing_cfg.get(KEY_PATH)
+        or Path(cfg[KEY_VECTORSTORE][KEY_BASE_DIRECTORY]) / FILE_TRACES
+    )
+    key = f"{exporter_name}:{path}"
+    with _TRACERS_LOCK:
+        if key not in _TRACERS:
+            _TRACERS[key] = _create_tracer(tracing_cfg, exporter_name, path)
+        return _TRACERS[key]
@@ -1,20 +1,42 @@
 import logging
 import sys
+import uuid
 
 import toml
 
-from ingestion.chunk_code import chunk_repository
+from ingestion.chunk_code import EXECUTOR_PROCESS, iter_repository_chunks
 from ingestion.embed_chunks_into_vectorstore import embed_documents
-from ingestion.ingest_repo import clone_or_update_repo
+from ingestion.ingest_repo import (
+    clone_or_update_repo,
+    get_changed_paths,
+    get_head_commit,
+)
+from ingestion.ingestion_util import (
+    get_persist_dir_and_collection_name_from_config,
+    get_symbol_index_path,
+    load_last_ingested_commit,
+    save_last_ingested_commit,
+)
+from ingestion.summarize import summaries_enabled, update_summaries
+from ingestion.symbol_index import SymbolIndex
 from langgraph_flow.graph_builder import build_graph
+from langgraph_flow.streaming import stream_answer
 from utils.constants import (
+    KEY_CHAT,
     KEY_CONFIG,
+    KEY_EXECUTOR,
     KEY_EXIT,
+    KEY_INCREMENTAL,
     KEY_INFO,
+    KEY_INGESTION,
+    KEY_MAX_WORKERS,
     KEY_QUESTION,
     KEY_QUIT,
+    KEY_RESPONSE,
+    KEY_STREAM,
     LOG_FORMAT_STYLE,
 )
+from utils.tracing import load_tracer
 
 logger = logging.getLogger(__name__)
 
@@ -57,13 +79,70 @@ def ingest_flow(cfg: dict):
     """
     Ingestion pipeline:
       1. Clone the repository
-      2. Chunk source files
-      3. Embed chunks into the vector store
+      2. Stream chunks of source files (only files changed since the last
+         ingested commit when `[ingestion] incremental` is on, the default)
+      3. Embed and upsert each batch of chunks into the vector store, and
+         refresh the symbol index of every chunked Python file
+      4. With `[summaries] enabled`, summarize new and changed files and
+         their directories for coarse-to-fine retrieval
+      5. Record the ingested commit
     """
     logger.info("🔄 Starting ingestion pipeline")
     repo_path = clone_or_update_repo(cfg)
-    docs = chunk_repository(repo_path)
-    embed_documents(docs, cfg)
+
+    ingestion_cfg = cfg.get(KEY_INGESTION, {})
+    chunk_kwargs = {
+        "executor": ingestion_cfg.get(KEY_EXECUTOR, EXECUTOR_PROCESS),
+        "max_workers": ingestion_cfg.get(KEY_MAX_WORKERS),
+    }
+
+    changes = None
+    if ingestion_cfg.get(KEY_INCREMENTAL, True):
+        last_commit = load_last_ingested_commit(cfg)
+        if last_commit:
+            changes = get_changed_paths(repo_path, last_commit)
+
+    symbol_index_path = get_symbol_index_path(cfg)
+    if changes is not None and not symbol_index_path.exists():
+        # Chunk every file once to build it; the chunk manifest still
+        # keeps unchanged chunks from being re-embedded.
+        logger.info("No symbol index yet; chunking the whole repo")
+        changes = None
+
+    persist_dir, _ = get_persist_dir_and_collection_name_from_config(cfg)
+    persist_dir.mkdir(parents=True, exist_ok=True)
+    symbol_index = SymbolIndex(symbol_index_path)
+    chunk_kwargs["on_symbols"] = symbol_index.replace_file
+    # Every file's copy of a shared chunk, so the manifest lists them all
+    chunk_kwargs["dedup"] = False
+    try:
+        if changes is None:
+            head_commit = get_head_commit(repo_path)
+            symbol_index.begin_sync()
+            docs = iter_repository_chunks(repo_path, **chunk_kwargs)
+            embed_documents(docs, cfg)
+            symbol_index.end_sync()
+        else:
+            logger.info("Incremental ingestion up to %s", changes.head_commit)
+            head_commit = changes.head_commit
+            stale_paths = changes.changed | changes.deleted
+            symbol_index.delete_paths(stale_paths)
+            docs = iter_repository_chunks(
+                repo_path, paths=changes.changed, **chunk_kwargs
+            )
+            embed_documents(docs, cfg, stale_paths=stale_paths)
+    finally:
+        symbol_index.close()
+
+    if summaries_enabled(cfg):
+        update_summaries(
+            cfg,
+            repo_path,
+            changed=None if changes is None else changes.changed,
+        )
+
+    if head_commit:
+        save_last_ingested_commit(cfg, head_commit)
     logger.info("✅ Ingestion pipeline completed")
 
 
@@ -72,10 +151,16 @@ def chat_flow(cfg: dict):
     Interactive chat loop:
       - Builds the LangGraph flow
       - Prompts the user for questions
-      - Routes through agents and prints responses
+      - Routes through agents and prints responses, token by token
+        unless `[chat] stream = false`
+      - With `[tracing] enabled`, traces each question and prints the
+        session's summary on exit
     """
     logger.info("🔧 Building LangGraph flow")
-    graph = build_graph()
+    graph = build_graph(cfg)
+    stream = cfg.get(KEY_CHAT, {}).get(KEY_STREAM, True)
+    tracer = load_tracer(cfg)
+    session_id = uuid.uuid4().hex
     logger.info(
         f"💬 Entering interactive chat (type {KEY_EXIT} or {KEY_QUIT} to stop)"
     )
@@ -89,10 +174,28 @@ def chat_flow(cfg: dict):
 
             try:
                 # Pass both the question and the full config into the graph state
-                state = graph.invoke({KEY_QUESTION: question, KEY_CONFIG: cfg})
-                response = state.get("response", "No answer available.")
+                inputs = {KEY_QUESTION: question, KEY_CONFIG: cfg}
+                config = tracer.config(question, session_id) if tracer else None
+                if stream:
+                    print("\n💡 ", end="", flush=True)
+                    state = stream_answer(
+                        graph,
+                        inputs,
+                        lambda token: print(token, end="", flush=True),
+                        config,
+                    )
+                    if not state.get(KEY_RESPONSE):
+                        print("No answer available.", end="")
+                    print("\n")
+                    continue
+                state = graph.invoke(inputs, config=config)
+                response = state.get(KEY_RESPONSE, "No answer available.")
                 logger.info(f"\n💡 {response}\n")
             except Exception:
                 logger.exception("Error during graph execution")
     except KeyboardInterrupt:
         logger.info("⚡ Chat interrupted by user")
+    finally:
+        summary = tracer.summary(session_id) if tracer else None
+        if summary:
+            print(f"\n{summary}")